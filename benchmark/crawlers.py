@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import upstream_crawler
+
+from benchmark.fake_servers import FakeGerrit
+from benchmark.fake_servers import FakeGithub
+from benchmark.fake_servers import FakePatchwork
+from depot_tools import gerrit_util
+from upstream_gerrit import GerritCrawler
+from upstream_github import GithubCrawler
+from upstream_patchwork import PatchworkCrawler
+
+# run the gerrit, github and patchwork crawlers against local fake servers,
+# run from the top directory: python3 -m benchmark.crawlers -u 10 -n 1000
+
+def write_config(cfg_path, users, servers):
+	with open(cfg_path, 'w') as cfg_file:
+		for idx in range(users):
+			cfg_file.write('[user %d]\n' % (idx))
+			cfg_file.write('name = user %d\n' % (idx))
+			cfg_file.write('email1 = user%d@example.com\n' % (idx))
+			cfg_file.write('email2 =\n')
+			cfg_file.write('function = %s\n' % (['audio', 'display/graphic'][idx % 2]))
+			cfg_file.write('github username = user%d\n' % (idx))
+			cfg_file.write('disable = false\n\n')
+
+		cfg_file.write('[gerrit fake]\n')
+		cfg_file.write('name = fake\n')
+		cfg_file.write('url = %s\n' % (servers['gerrit'].get_url()))
+		cfg_file.write('disable = false\n\n')
+
+		cfg_file.write('[github fake]\n')
+		cfg_file.write('name = fake\n')
+		cfg_file.write('owner/repo = fake/repo\n')
+		cfg_file.write('api url = %s\n' % (servers['github'].get_url()))
+		cfg_file.write('disable = false\n\n')
+
+		cfg_file.write('[patchwork fake]\n')
+		cfg_file.write('name = fake\n')
+		cfg_file.write('url = %s\n' % (servers['patchwork'].get_url()))
+		cfg_file.write('disable = false\n\n')
+
+	return
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-u', '--users', type = int, default = 10, help = 'number of users')
+	parser.add_argument('-n', '--rows', type = int, default = 1000, help = 'changes and patches per user, pulls per repo')
+	parser.add_argument('-l', '--latency', type = float, default = 0.0, help = 'latency of each request in ms')
+	parser.add_argument('-j', '--jitter', type = float, default = 0.0, help = 'random +/- latency in ms')
+	parser.add_argument('-e', '--error_rate', type = float, default = 0.0, help = 'ratio of requests answered with 500')
+	parser.add_argument('-r', '--retry_sleep', type = float, default = 0.1, help = 'first sleep before a retry in s')
+	parser.add_argument('-a', '--actions', default = 'gerrit,github,patchwork', help = 'crawlers to run')
+	parser.add_argument('-v', '--verbose', action = 'store_true', help = 'show the crawler output')
+
+	args = parser.parse_args()
+
+	# no gce metadata probe from depot_tools, the servers are local
+	os.environ['SKIP_GCE_AUTH_FOR_GIT'] = '1'
+
+	# the default retry sleeps are sized for real servers
+	gerrit_util.SLEEP_TIME = args.retry_sleep
+	upstream_crawler.HTTP_SLEEP_TIME = args.retry_sleep
+
+	emails = ['user%d@example.com' % (idx) for idx in range(args.users)]
+	logins = ['user%d' % (idx) for idx in range(args.users)]
+	options = {'latency': args.latency / 1000,
+		   'jitter': args.jitter / 1000,
+		   'error_rate': args.error_rate,
+		  }
+
+	start = time.monotonic()
+	servers = {'gerrit': FakeGerrit(emails, args.rows, **options).start(),
+		   'github': FakeGithub('fake/repo', logins, args.rows, **options).start(),
+		   'patchwork': FakePatchwork(emails, args.rows, **options).start(),
+		  }
+	print('servers ready in %.2fs' % (time.monotonic() - start))
+
+	crawlers = {'gerrit': lambda cfg_path: GerritCrawler(cfg_path).get_changes(),
+		    'github': lambda cfg_path: GithubCrawler(cfg_path, ('bench', 'token')).get_pulls(),
+		    'patchwork': lambda cfg_path: PatchworkCrawler(cfg_path).get_patches(),
+		   }
+
+	with tempfile.TemporaryDirectory() as directory:
+		cfg_path = os.path.join(directory, 'bench.cfg')
+		write_config(cfg_path, args.users, servers)
+
+		for action in args.actions.split(','):
+			servers[action].reset_counts()
+
+			output = io.StringIO()
+			if args.verbose == True:
+				output = None
+
+			start = time.monotonic()
+			with contextlib.redirect_stdout(output):
+				rows = crawlers[action](cfg_path)
+			elapsed = time.monotonic() - start
+
+			requests, errors = servers[action].get_counts()
+
+			print('%-9s: %d row(s), %d request(s) (%d error(s)), %.2fs, %.0f rows/s' % (action, len(rows), requests, errors, elapsed, len(rows) / elapsed))
+
+	for server in servers.values():
+		server.stop()
+
+	return
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from upstream_crawler import BaseCrawler
+from upstream_gerrit import GerritCrawler
+from upstream_record import RecordStore
+
+# compare the excel engines on generated gerrit rows, run from the top
+# directory: python3 -m benchmark.excel_writer -n 100000
+
+def write_config(cfg_path, users):
+	with open(cfg_path, 'w') as cfg_file:
+		for idx in range(users):
+			cfg_file.write('[user %d]\n' % (idx))
+			cfg_file.write('name = user %d\n' % (idx))
+			cfg_file.write('email1 = user%d@example.com\n' % (idx))
+			cfg_file.write('email2 =\n')
+			cfg_file.write('function = %s\n' % (['audio', 'display/graphic'][idx % 2]))
+			cfg_file.write('github username = user%d\n' % (idx))
+			cfg_file.write('disable = false\n\n')
+
+	return
+
+def generate_rows(count, users):
+	schema = GerritCrawler.get_schema()
+	rows = RecordStore(schema['fields'], schema['categories'], schema['integers'])
+
+	for idx in range(count):
+		user = random.randrange(users)
+		created = '%d-%02d-%02d 07:16:18.000000000' % (2015 + idx * 8 // count, random.randint(1, 12), random.randint(1, 28))
+
+		rows.append({'user_name': 'user %d' % (user),
+			     'user_function': ['audio', 'display/graphic'][user % 2],
+			     'repo_name': 'chromium',
+			     'repo_url': 'chromium-review.googlesource.com',
+			     'project': random.choice(['chromiumos/platform/ec', 'chromiumos/third_party/kernel', 'chromium/src']),
+			     'branch': 'main',
+			     'change_id': 'I%040x' % (random.getrandbits(160)),
+			     'subject': 'subsystem: change number %d' % (idx),
+			     'status': random.choice(['MERGED', 'NEW', 'ABANDONED']),
+			     'created': created,
+			     'updated': created,
+			     'submitted': created,
+			     'insertions': random.randint(0, 500),
+			     'deletions': random.randint(0, 500),
+			     'owner': 'user%d@example.com' % (user),
+			    })
+
+	return rows
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-n', '--rows', type = int, default = 100000, help = 'number of rows')
+	parser.add_argument('-u', '--users', type = int, default = 50, help = 'number of users')
+	parser.add_argument('-m', '--memory', action = 'store_true', help = 'trace the peak memory (slow)')
+
+	args = parser.parse_args()
+
+	rows = generate_rows(args.rows, args.users)
+	csv_fields = GerritCrawler.get_schema()['fields']
+
+	with tempfile.TemporaryDirectory() as directory:
+		cfg_path = os.path.join(directory, 'bench.cfg')
+		write_config(cfg_path, args.users)
+
+		crawler = BaseCrawler(cfg_path)
+
+		for engine in ['openpyxl', 'native']:
+			crawler.set_excel_engine(engine)
+
+			if args.memory == True:
+				tracemalloc.start()
+
+			start = time.monotonic()
+			crawler.export_excel_file(directory, engine, csv_fields, 'created', rows)
+			elapsed = time.monotonic() - start
+
+			peak = 0
+			if args.memory == True:
+				peak = tracemalloc.get_traced_memory()[1]
+				tracemalloc.stop()
+
+			size = os.path.getsize(os.path.join(directory, '%s.xlsx' % (engine)))
+
+			print('%-8s: %.2fs, peak %.1f MiB, %.1f MiB file' % (engine, elapsed, peak / 1048576, size / 1048576))
+
+	return
+
+if __name__ == '__main__':
+	main()
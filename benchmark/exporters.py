@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+from benchmark.excel_writer import write_config
+from upstream_aggregate import SummaryCube
+from upstream_crawler import BaseCrawler
+from upstream_export import exporters
+from upstream_gerrit import GerritCrawler
+from upstream_git import GitCrawler
+from upstream_github import GithubCrawler
+from upstream_patchwork import PatchworkCrawler
+from upstream_record import RecordStore
+
+# time and peak RSS of each exporter on generated rows of each crawler
+# schema, run from the top directory:
+# python3 -m benchmark.exporters -s 10000,100000 -b exporters-baseline.json
+# each measure runs in its own process so the peak RSS is its own
+
+# schema: the crawler class
+schemas = {'gerrit': GerritCrawler,
+	   'git': GitCrawler,
+	   'github': GithubCrawler,
+	   'patchwork': PatchworkCrawler,
+	  }
+
+support_exporters = ['csv', 'xlsx', 'xlsx-openpyxl', 'summary'] + list(exporters.keys())
+
+def get_schema(name):
+	return schemas[name].get_schema()
+
+def generate_value(rng, field, idx, user, date):
+	# a plausible value of each field of the crawler schemas
+	if field == 'user_name':
+		return 'user %d' % (user)
+	if field == 'user_function':
+		return ['audio', 'display/graphic'][user % 2]
+	if field in ['repo_name', 'project']:
+		return rng.choice(['chromium', 'linux', 'sof', 'alsa-devel'])
+	if field == 'repo_url':
+		return rng.choice(['chromium-review.googlesource.com', 'github.com/thesofproject/linux', 'patchwork.kernel.org'])
+	if field in ['branch', 'base', 'head']:
+		return rng.choice(['main', 'master', 'for-next', 'chromeos-5.15'])
+	if field == 'change_id':
+		return 'I%040x' % (rng.getrandbits(160))
+	if field == 'commit_hash':
+		return '%040x' % (rng.getrandbits(160))
+	if field in ['subject', 'title', 'name']:
+		return 'subsystem%d: change number %d of a generated report' % (idx % 97, idx)
+	if field in ['status', 'state']:
+		return rng.choice(['MERGED', 'NEW', 'ABANDONED', 'open', 'closed', 'accepted'])
+	if field in ['created', 'updated', 'submitted']:
+		return '%s.000000000' % (date.replace('T', ' '))
+	if field in ['author_date', 'committer_date']:
+		return '%s+02:00' % (date)
+	if field in ['created_at', 'updated_at', 'closed_at', 'merged_at']:
+		return '%sZ' % (date)
+	if field == 'date':
+		return date
+	if field in ['author_email', 'committer_email', 'owner', 'submitter']:
+		return 'user%d@example.com' % (user)
+	if field == 'user':
+		return 'user%d' % (user)
+	if field == 'reviewed_by':
+		return 'Maintainer <maintainer@example.com>'
+	if field == 'number':
+		return idx + 1
+
+	# insertions, deletions, commits, additions, changed_files
+	return rng.randint(0, 500)
+
+def generate_rows(schema, count, users):
+	rng = random.Random(1)
+
+	rows = RecordStore(schema['fields'], schema['categories'], schema['integers'], schema['timestamps'])
+
+	for idx in range(count):
+		user = rng.randrange(users)
+		date = '%d-%02d-%02dT%02d:%02d:%02d' % (2015 + idx * 8 // count, rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+
+		rows.append({field: generate_value(rng, field, idx, user, date) for field in schema['fields']})
+
+	rows.end_run()
+	rows.sort(schema['date_field'])
+
+	return rows
+
+def get_peak_rss():
+	# KiB on linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def measure(schema_name, exporter, count, users, directory, verbose, results):
+	# runs in a child process
+	if verbose == False:
+		contextlib.redirect_stdout(io.StringIO()).__enter__()
+
+	schema = get_schema(schema_name)
+	rows = generate_rows(schema, count, users)
+
+	cfg_path = os.path.join(directory, 'bench.cfg')
+	crawler = BaseCrawler(cfg_path)
+	crawler.set_summary(schema['dimensions'], schema['measures'])
+
+	name = '%s-%s-%d' % (schema_name, exporter, count)
+	fields = schema['fields']
+
+	rss_before = get_peak_rss()
+	start = time.monotonic()
+
+	if exporter == 'summary':
+		cube = SummaryCube(['user_name', 'year', 'quarter'] + schema['dimensions'], schema['measures'])
+		cube.add_store(rows, schema['date_field'], schema['report_name'])
+
+		years = cube.get_labels('year')
+		names, _, table = cube.get_table('user_name', 'year', None, [user.name for user in crawler.get_users()], years)
+		crawler.export_summary_file(directory, name, years, dict(zip(names, table)))
+	elif exporter == 'xlsx-openpyxl':
+		crawler.set_excel_engine('openpyxl')
+		crawler.export_file(directory, name, fields, schema['date_field'], rows, 'xlsx')
+	else:
+		crawler.export_file(directory, name, fields, schema['date_field'], rows, exporter)
+
+	elapsed = time.monotonic() - start
+	rss_after = get_peak_rss()
+
+	results.put({'seconds': elapsed, 'peak_rss': rss_after, 'export_rss': max(0, rss_after - rss_before)})
+
+	return
+
+def run_measure(schema_name, exporter, count, users, directory, verbose):
+	results = multiprocessing.Queue()
+
+	process = multiprocessing.Process(target = measure, args = (schema_name, exporter, count, users, directory, verbose, results))
+	process.start()
+	result = results.get()
+	process.join()
+
+	return result
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-s', '--scales', default = '10000,100000', help = 'row counts, ex. 10000,100000,1000000')
+	parser.add_argument('-c', '--schemas', default = ','.join(schemas.keys()), help = 'crawler schemas')
+	parser.add_argument('-e', '--exporters', default = 'csv,xlsx,summary', help = 'exporters: %s' % (','.join(support_exporters)))
+	parser.add_argument('-u', '--users', type = int, default = 50, help = 'number of users')
+	parser.add_argument('-b', '--baseline', help = 'baseline json file to compare with')
+	parser.add_argument('-t', '--tolerance', type = float, default = 0.2, help = 'slowdown or growth flagged as a regression')
+	parser.add_argument('-m', '--min_seconds', type = float, default = 0.1, help = 'slowdown in s below which time is not flagged')
+	parser.add_argument('-w', '--write_baseline', action = 'store_true', help = 'save the results as the baseline')
+	parser.add_argument('-v', '--verbose', action = 'store_true', help = 'show the exporter output')
+
+	args = parser.parse_args()
+
+	baseline = {}
+	if args.baseline != None and os.path.isfile(args.baseline) == True:
+		with open(args.baseline) as baseline_file:
+			baseline = json.load(baseline_file)
+
+	results = {}
+	regressions = 0
+
+	with tempfile.TemporaryDirectory() as directory:
+		write_config(os.path.join(directory, 'bench.cfg'), args.users)
+
+		for schema_name in args.schemas.split(','):
+			for exporter in args.exporters.split(','):
+				for count in [int(scale) for scale in args.scales.split(',')]:
+					key = '%s/%s/%d' % (schema_name, exporter, count)
+					result = run_measure(schema_name, exporter, count, args.users, directory, args.verbose)
+					results[key] = result
+
+					line = '%-32s %8.2fs  peak %7.1f MiB  export %7.1f MiB' % (key, result['seconds'], result['peak_rss'] / 1048576, result['export_rss'] / 1048576)
+
+					if key in baseline:
+						before = baseline[key]
+						flags = []
+
+						# tiny timings are noise, the slowdown must be measurable too
+						if result['seconds'] > before['seconds'] * (1 + args.tolerance) and result['seconds'] - before['seconds'] > args.min_seconds:
+							flags.append('time %+.0f%%' % ((result['seconds'] / before['seconds'] - 1) * 100))
+						if result['peak_rss'] > before['peak_rss'] * (1 + args.tolerance):
+							flags.append('rss %+.0f%%' % ((result['peak_rss'] / before['peak_rss'] - 1) * 100))
+
+						if len(flags) != 0:
+							regressions += 1
+							line += '  REGRESSION: %s' % (', '.join(flags))
+
+					print(line)
+
+					# the exported file is not needed any more
+					for file_name in os.listdir(directory):
+						if file_name != 'bench.cfg':
+							os.remove(os.path.join(directory, file_name))
+
+	if args.write_baseline == True and args.baseline != None:
+		baseline.update(results)
+
+		with open(args.baseline, 'w') as baseline_file:
+			json.dump(baseline, baseline_file, indent = 1, sort_keys = True)
+
+		print('baseline saved to %s' % (args.baseline))
+
+	if regressions != 0:
+		print('%d regression(s) against %s' % (regressions, args.baseline))
+		return 1
+
+	return 0
+
+if __name__ == '__main__':
+	exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/python3
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+# local stand-ins of the gerrit, github and patchwork REST endpoints used by
+# the crawlers, with generated data, latency, jitter and injected errors
+
+class FakeHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		server = self.server
+		server.count_request()
+
+		delay = server.latency + random.uniform(-server.jitter, server.jitter)
+		if delay > 0:
+			time.sleep(delay)
+
+		url = urllib.parse.urlsplit(self.path)
+		query = dict(urllib.parse.parse_qsl(url.query))
+
+		if random.random() < server.error_rate:
+			server.count_error()
+			status, headers, body = 500, {}, b'injected error'
+		else:
+			status, headers, body = server.route(url.path, query)
+
+		self.send_response(status)
+		for key, value in headers.items():
+			self.send_header(key, value)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+		return
+
+	def log_message(self, format, *args):
+		return
+
+class FakeServer(ThreadingHTTPServer):
+	# serves on 127.0.0.1 from a thread, port 0 picks a free port
+	daemon_threads = True
+
+	def __init__(self, latency = 0.0, jitter = 0.0, error_rate = 0.0):
+		super().__init__(('127.0.0.1', 0), FakeHandler)
+
+		self.latency = latency
+		self.jitter = jitter
+		self.error_rate = error_rate
+
+		self.__lock = threading.Lock()
+		self.__requests = 0
+		self.__errors = 0
+		self.__thread = None
+
+		return
+
+	def get_url(self):
+		return 'http://127.0.0.1:%d' % (self.server_address[1])
+
+	def count_request(self):
+		with self.__lock:
+			self.__requests += 1
+
+		return
+
+	def count_error(self):
+		with self.__lock:
+			self.__errors += 1
+
+		return
+
+	def get_counts(self):
+		return self.__requests, self.__errors
+
+	def reset_counts(self):
+		self.__requests = self.__errors = 0
+
+		return
+
+	def start(self):
+		self.__thread = threading.Thread(target = self.serve_forever, daemon = True)
+		self.__thread.start()
+
+		return self
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+
+		return
+
+	def route(self, path, query):
+		# (status, headers, body) of a request
+		return 404, {}, b'not found'
+
+	def json_response(self, data, headers = {}, prefix = b''):
+		return 200, dict({'Content-Type': 'application/json'}, **headers), prefix + json.dumps(data).encode()
+
+	def get_next_link(self, path, query, page):
+		query = dict(query, page = str(page))
+
+		return '<%s%s?%s>; rel="next"' % (self.get_url(), path, urllib.parse.urlencode(query))
+
+def generate_date(rng, year_from = 2015, year_to = 2024):
+	return (rng.randint(year_from, year_to), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+
+class FakeGerrit(FakeServer):
+	# GET /changes/?q=owner:<email>&start=<n>, a page of ChangeInfo with a
+	# ")]}'" line first and '_more_changes' set on the last change of a page
+	def __init__(self, emails, count, page_size = 500, seed = 1, **kwargs):
+		super().__init__(**kwargs)
+
+		self.__page_size = page_size
+		self.__changes = {}
+
+		rng = random.Random(seed)
+
+		for email in emails:
+			changes = []
+
+			for idx in range(count):
+				date = '%04d-%02d-%02d %02d:%02d:%02d.000000000' % generate_date(rng)
+				status = rng.choice(['MERGED', 'NEW', 'ABANDONED'])
+
+				change = {'project': rng.choice(['chromiumos/platform/ec', 'chromiumos/third_party/kernel', 'chromium/src']),
+					  'branch': 'main',
+					  'change_id': 'I%040x' % (rng.getrandbits(160)),
+					  'subject': 'subsystem: change %d of %s' % (idx, email),
+					  'status': status,
+					  'created': date,
+					  'updated': date,
+					  'insertions': rng.randint(0, 500),
+					  'deletions': rng.randint(0, 500),
+					 }
+
+				if status == 'MERGED':
+					change['submitted'] = date
+
+				changes.append(change)
+
+			# gerrit returns the most recently updated first
+			changes.sort(key = lambda change: change['updated'], reverse = True)
+			self.__changes[email] = changes
+
+		return
+
+	def route(self, path, query):
+		if path not in ['/changes/', '/a/changes/']:
+			return super().route(path, query)
+
+		owner = query.get('q', '').partition('owner:')[2]
+		start = int(query.get('start', '0'))
+
+		changes = self.__changes.get(owner, [])
+		page = [dict(change) for change in changes[start:start + self.__page_size]]
+
+		if start + self.__page_size < len(changes):
+			page[-1]['_more_changes'] = True
+
+		return self.json_response(page, prefix = b")]}'\n")
+
+class FakeGithub(FakeServer):
+	# GET /repos/<owner>/<repo>/pulls with 'Link' and rate limit headers,
+	# GET /repos/<owner>/<repo>/pulls/<number> for the diff stats, a 403
+	# once the rate limit is used up
+	def __init__(self, owner_repo, logins, count, team_ratio = 0.5, seed = 1, rate_limit = 5000, **kwargs):
+		super().__init__(**kwargs)
+
+		self.__owner_repo = owner_repo
+		self.__pulls = []
+		self.__rate_limit = rate_limit
+		self.__rate_reset = int(time.time()) + 3600
+
+		rng = random.Random(seed)
+
+		for number in range(1, count + 1):
+			if rng.random() < team_ratio:
+				login = rng.choice(logins)
+			else:
+				login = 'outsider%d' % (rng.randrange(100))
+
+			date = '%04d-%02d-%02dT%02d:%02d:%02dZ' % generate_date(rng)
+			state = rng.choice(['open', 'closed'])
+
+			self.__pulls.append({'number': number,
+					     'state': state,
+					     'title': 'pull %d' % (number),
+					     'user': {'login': login},
+					     'created_at': date,
+					     'updated_at': date,
+					     'closed_at': date if state == 'closed' else None,
+					     'merged_at': date if state == 'closed' else None,
+					     'head': {'label': '%s:branch-%d' % (login, number)},
+					     'base': {'label': 'main'},
+					     'commits': rng.randint(1, 10),
+					     'additions': rng.randint(0, 500),
+					     'deletions': rng.randint(0, 500),
+					     'changed_files': rng.randint(1, 20),
+					    })
+
+		self.__pulls.sort(key = lambda pull: pull['created_at'])
+
+		return
+
+	def __get_rate_headers(self):
+		self.__rate_limit = max(0, self.__rate_limit - 1)
+
+		return {'X-RateLimit-Limit': '5000',
+			'X-RateLimit-Remaining': str(self.__rate_limit),
+			'X-RateLimit-Reset': str(self.__rate_reset),
+		       }
+
+	def set_rate_limit(self, rate_limit):
+		# a new budget, ex. after the reset time
+		self.__rate_limit = rate_limit
+
+		return
+
+	def route(self, path, query):
+		prefix = '/repos/%s/pulls' % (self.__owner_repo)
+
+		if self.__rate_limit == 0:
+			return 403, {'Content-Type': 'application/json'}, b'{"message": "API rate limit exceeded"}'
+
+		if path == prefix:
+			per_page = int(query.get('per_page', '30'))
+			page = int(query.get('page', '1'))
+
+			start = (page - 1) * per_page
+			pulls = []
+			for pull in self.__pulls[start:start + per_page]:
+				item = dict(pull)
+				for field in ['commits', 'additions', 'deletions', 'changed_files']:
+					del item[field]
+				item['url'] = '%s%s/%d' % (self.get_url(), prefix, pull['number'])
+				pulls.append(item)
+
+			headers = self.__get_rate_headers()
+			if start + per_page < len(self.__pulls):
+				headers['Link'] = self.get_next_link(path, query, page + 1)
+
+			return self.json_response(pulls, headers)
+
+		if path.startswith(prefix + '/'):
+			number = int(path[len(prefix) + 1:])
+
+			return self.json_response(self.__pulls[number - 1], self.__get_rate_headers())
+
+		return super().route(path, query)
+
+class FakePatchwork(FakeServer):
+	# GET /api/1.2/patches?submitter=<email>&page=<n> with 'Link' headers
+	def __init__(self, emails, count, page_size = 30, seed = 1, **kwargs):
+		super().__init__(**kwargs)
+
+		self.__page_size = page_size
+		self.__patches = {}
+
+		rng = random.Random(seed)
+
+		for email in emails:
+			patches = []
+
+			for idx in range(count):
+				patches.append({'project': {'name': rng.choice(['alsa-devel', 'linux-mediatek', 'dri-devel'])},
+						'date': '%04d-%02d-%02dT%02d:%02d:%02d' % generate_date(rng),
+						'name': '[PATCH v%d] subsystem: patch %d of %s' % (rng.randint(1, 4), idx, email),
+						'state': rng.choice(['new', 'accepted', 'superseded', 'changes-requested']),
+					       })
+
+			patches.sort(key = lambda patch: patch['date'])
+			self.__patches[email] = patches
+
+		return
+
+	def route(self, path, query):
+		if path != '/api/1.2/patches' and path != '/api/1.2/patches/':
+			return super().route(path, query)
+
+		per_page = int(query.get('per_page', str(self.__page_size)))
+		page = int(query.get('page', '1'))
+
+		patches = self.__patches.get(query.get('submitter', ''), [])
+		start = (page - 1) * per_page
+
+		headers = {}
+		if start + per_page < len(patches):
+			headers['Link'] = self.get_next_link(path, query, page + 1)
+
+		return self.json_response(patches[start:start + per_page], headers)
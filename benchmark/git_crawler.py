@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+import argparse
+import configparser
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from upstream_git import GitCrawler
+
+# time the phases of GitCrawler.get_commits on repos made by
+# benchmark.git_history, run from the top directory:
+# python3 -m benchmark.git_crawler -c /tmp/history/history.cfg -o git-crawler.json
+# the first pass clones the repos, the second one fetches them, each run is
+# appended to the result file and compared with the previous run. With
+# -s 1,2,4,auto a fetch pass runs again for each log shards count, the log of
+# a cold rebuild walks the whole history whatever the pass
+
+def get_revision():
+	result = subprocess.run(['git', 'describe', '--always', '--dirty'], stdout = subprocess.PIPE, universal_newlines = True)
+
+	return result.stdout.strip()
+
+def run_pass(cfg_path, verbose):
+	output = None if verbose == True else io.StringIO()
+
+	start = time.monotonic()
+	with contextlib.redirect_stdout(output):
+		crawler = GitCrawler(cfg_path)
+		commits = crawler.get_commits()
+	elapsed = time.monotonic() - start
+
+	timings = dict(crawler.get_timings())
+	timings['total'] = elapsed
+
+	return len(commits), timings
+
+def write_shards_config(cfg_path, shards_path, shards):
+	# the same config with another 'log shards' in every git section
+	config = configparser.ConfigParser(interpolation = None)
+	config.read(cfg_path)
+
+	for key in config:
+		if key.split(' ')[0] == 'git':
+			config[key]['log shards'] = shards
+
+	with open(shards_path, 'w') as cfg_file:
+		config.write(cfg_file)
+
+	return
+
+def print_pass(name, commits, timings, previous):
+	print('%s: %d commit(s)' % (name, commits))
+
+	for phase, seconds in timings.items():
+		line = '  %-12s %8.3fs' % (phase, seconds)
+
+		if previous != None and previous.get(phase, 0) > 0:
+			line += '  (%+.1f%%)' % ((seconds / previous[phase] - 1) * 100)
+
+		print(line)
+
+	return
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-c', '--config_file', required = True, help = 'config file written by benchmark.git_history')
+	parser.add_argument('-o', '--output', default = 'git-crawler.json', help = 'result file, runs are appended')
+	parser.add_argument('-s', '--shards', default = '', help = 'log shards counts to compare, ex. 1,2,4,auto')
+	parser.add_argument('-v', '--verbose', action = 'store_true', help = 'show the crawler output')
+
+	args = parser.parse_args()
+
+	cfg_path = os.path.abspath(args.config_file)
+
+	runs = []
+	if os.path.isfile(args.output) == True:
+		with open(args.output) as result_file:
+			runs = json.load(result_file)
+
+	# the previous run on the same config
+	previous = None
+	for run in runs:
+		if run['config'] == cfg_path:
+			previous = run
+
+	run = {'revision': get_revision(),
+	       'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+	       'config': cfg_path,
+	       'passes': {},
+	      }
+
+	# the crawler clones into ./repo, keep it away from the real one
+	cwd = os.getcwd()
+
+	with tempfile.TemporaryDirectory() as directory:
+		os.chdir(directory)
+
+		try:
+			for name in ['clone', 'fetch']:
+				commits, timings = run_pass(cfg_path, args.verbose)
+
+				run['passes'][name] = {'commits': commits, 'timings': timings}
+
+				print_pass(name, commits, timings, previous['passes'][name]['timings'] if previous != None else None)
+
+			# the log phase of each shards count against the first one
+			first = None
+			for shards in [shards for shards in args.shards.split(',') if shards != '']:
+				shards_path = os.path.join(directory, 'shards-%s.cfg' % (shards))
+				write_shards_config(cfg_path, shards_path, shards)
+
+				commits, timings = run_pass(shards_path, args.verbose)
+
+				run.setdefault('shards', {})[shards] = {'commits': commits, 'timings': timings}
+
+				if first == None:
+					first = (commits, timings['log'])
+
+				if commits != first[0]:
+					print('shards %s: %d commit(s) instead of %d' % (shards, commits, first[0]))
+
+				print('shards %-4s: log %8.3fs  (x%.2f)' % (shards, timings['log'], first[1] / max(timings['log'], 1e-9)))
+		finally:
+			os.chdir(cwd)
+
+	if previous != None:
+		print('compared with %s (%s)' % (previous['revision'], previous['date']))
+
+	runs.append(run)
+
+	with open(args.output, 'w') as result_file:
+		json.dump(runs, result_file, indent = 1)
+
+	print('result saved to %s' % (args.output))
+
+	return
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,170 @@
+#!/usr/bin/python3
+import argparse
+import os
+import random
+import subprocess
+import time
+
+# generate local git repos with git fast-import for the git crawler
+# benchmark, run from the top directory:
+# python3 -m benchmark.git_history -o /tmp/history -n 1000000 -f 3
+# a config file with the users and a git section per repo is written too
+
+def pick_author(rng, args, team, outsiders):
+	# a share of the commits are from the team (the config users), the
+	# others from outsiders, uniform or skewed like a real project
+	if rng.random() < args.team_ratio:
+		return rng.choice(team)
+
+	if args.distribution == 'zipf':
+		# a few outsiders write most of the commits
+		idx = min(int(rng.paretovariate(1.2)) - 1, len(outsiders) - 1)
+		return outsiders[idx]
+
+	return rng.choice(outsiders)
+
+def write_commits(stream, rng, args, team, outsiders, ref, count, serial, date, parent = None):
+	# one commit per entry, each one changes a small file so the trees
+	# differ like a real history, team commits carry gerrit trailers
+	for idx in range(count):
+		name, email = pick_author(rng, args, team, outsiders)
+		serial += 1
+		date += rng.randint(60, 7200)
+
+		zone = rng.choice(['+0000', '+0200', '-0700', '+0800'])
+		message = 'subsystem%d: change number %d\n' % (serial % 97, serial)
+		if (name, email) in team:
+			message += '\nsome description\n\nReviewed-by: Maintainer <maintainer@example.com>\nChange-Id: I%040x\n' % (rng.getrandbits(160))
+
+		data = message.encode()
+		content = ('%d\n' % (serial)).encode()
+
+		stream.write(b'commit %s\n' % (ref.encode()))
+		stream.write(b'mark :%d\n' % (serial))
+		stream.write(('author %s <%s> %d %s\n' % (name, email, date, zone)).encode())
+		stream.write(('committer Maintainer <maintainer@example.com> %d %s\n' % (date + rng.randint(0, 86400), zone)).encode())
+		stream.write(b'data %d\n%s\n' % (len(data), data))
+
+		if idx == 0 and parent != None:
+			stream.write(b'from %s\n' % (parent.encode()))
+
+		# 32 directories of 32 files keep each tree written small
+		stream.write(b'M 100644 inline dir%02d/file%02d.txt\ndata %d\n%s\n' % (serial % 32, serial // 32 % 32, len(content), content))
+
+	return serial, date
+
+def fast_import(repo_path, writer):
+	process = subprocess.Popen(['git', '-C', repo_path, 'fast-import', '--quiet', '--force', '--export-marks=%s/marks' % (repo_path)],
+				   stdin = subprocess.PIPE)
+
+	writer(process.stdin)
+
+	process.stdin.close()
+	if process.wait() != 0:
+		raise RuntimeError('git fast-import failed in %s' % (repo_path))
+
+	marks = {}
+	with open('%s/marks' % (repo_path)) as marks_file:
+		for line in marks_file:
+			mark, sha = line.split()
+			marks[int(mark[1:])] = sha
+
+	os.remove('%s/marks' % (repo_path))
+
+	return marks
+
+def write_config(cfg_path, team, repos, log_shards):
+	with open(cfg_path, 'w') as cfg_file:
+		for idx, (name, email) in enumerate(team):
+			cfg_file.write('[user %d]\n' % (idx))
+			cfg_file.write('name = %s\n' % (name))
+			cfg_file.write('email1 = %s\n' % (email))
+			cfg_file.write('email2 =\n')
+			cfg_file.write('function = %s\n' % (['audio', 'display/graphic'][idx % 2]))
+			cfg_file.write('github username = user%d\n' % (idx))
+			cfg_file.write('disable = false\n\n')
+
+		for name, path in repos:
+			cfg_file.write('[git %s]\n' % (name))
+			cfg_file.write('name = %s\n' % (name))
+			cfg_file.write('url = file://%s\n' % (path))
+			cfg_file.write('branch = master\n')
+			cfg_file.write('log shards = %s\n' % (log_shards))
+			cfg_file.write('disable = false\n\n')
+
+	return
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-o', '--output', required = True, help = 'directory of the generated repos')
+	parser.add_argument('-n', '--commits', type = int, default = 100000, help = 'commits of the main repo')
+	parser.add_argument('-a', '--authors', type = int, default = 5000, help = 'outside authors')
+	parser.add_argument('-u', '--users', type = int, default = 20, help = 'team authors, the config users')
+	parser.add_argument('-t', '--team_ratio', type = float, default = 0.02, help = 'share of the team commits')
+	parser.add_argument('-d', '--distribution', choices = ['uniform', 'zipf'], default = 'zipf', help = 'outside author distribution')
+	parser.add_argument('-f', '--forks', type = int, default = 0, help = 'forks of the main repo')
+	parser.add_argument('-k', '--fork_commits', type = int, default = 1000, help = 'own commits of each fork')
+	parser.add_argument('-s', '--seed', type = int, default = 1, help = 'random seed')
+	parser.add_argument('-l', '--log_shards', default = '0', help = 'log shards of each repo in the config, a count or auto')
+
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+
+	team = [('User %d' % (idx), 'user%d@example.com' % (idx)) for idx in range(args.users)]
+	outsiders = [('Dev %d' % (idx), 'dev%d@example.org' % (idx)) for idx in range(args.authors)]
+
+	os.makedirs(args.output, exist_ok = True)
+	output = os.path.abspath(args.output)
+
+	# the main repo is named linux, the crawler marks its commits upstreamed
+	main_path = os.path.join(output, 'linux.git')
+	subprocess.run(['git', 'init', '-q', '--bare', main_path], check = True)
+
+	start = time.monotonic()
+	state = {}
+
+	def write_main(stream):
+		state['serial'], state['date'] = write_commits(stream, rng, args, team, outsiders, 'refs/heads/master', args.commits, 0, 1262304000)
+
+		return
+
+	marks = fast_import(main_path, write_main)
+
+	print('%s: %d commit(s) in %.2fs' % (main_path, args.commits, time.monotonic() - start))
+
+	repos = [('linux', main_path)]
+
+	# each fork shares the history up to a random point of the main repo,
+	# then has commits of its own, like a subsystem or vendor tree
+	for fork in range(args.forks):
+		fork_path = os.path.join(output, 'fork%d.git' % (fork))
+		subprocess.run(['git', 'clone', '-q', '--bare', main_path, fork_path], check = True)
+
+		base = marks[rng.randint(max(1, args.commits // 2), args.commits)]
+
+		start = time.monotonic()
+
+		def write_fork(stream):
+			write_commits(stream, rng, args, team, outsiders, 'refs/heads/master', args.fork_commits, state['serial'] + fork * args.fork_commits, state['date'], base)
+
+			return
+
+		fast_import(fork_path, write_fork)
+
+		print('%s: %d commit(s) from %s in %.2fs' % (fork_path, args.fork_commits, base[:12], time.monotonic() - start))
+
+		repos.append(('fork%d' % (fork), fork_path))
+
+	cfg_path = os.path.join(output, 'history.cfg')
+	write_config(cfg_path, team, repos, args.log_shards)
+
+	print('config saved to %s' % (cfg_path))
+
+	return
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+import argparse
+import configparser
+import os
+import re
+import subprocess
+import time
+
+# compare the author filter of the git log step, run from the top directory:
+# python3 -m benchmark.git_log -c <cfg file> -r ./repo/linux
+
+pretty_param = '--pretty=format:%H%x09%ae%x09%aI%x09%ce%x09%cI%x09%s'
+
+def read_emails(config_file):
+	config = configparser.ConfigParser()
+	config.read(config_file)
+
+	emails = []
+
+	for key in config:
+		if key.split(' ')[0] != 'user':
+			continue
+
+		if config[key]['disable'].lower() != 'false':
+			continue
+
+		for field in ['email1', 'email2']:
+			email = config[key][field]
+			if email != '' and email not in emails:
+				emails.append(email)
+
+	return emails
+
+def run_git_log(repo_path, config, params):
+	start = time.monotonic()
+
+	result = subprocess.run(['git', '-C', repo_path] + config + ['log'] + params, stdout = subprocess.PIPE, check = True)
+
+	return time.monotonic() - start, len(result.stdout.splitlines())
+
+def main():
+
+	# parse argument
+	parser = argparse.ArgumentParser()
+
+	parser.add_argument('-c', '--config_file', required = True, help = 'config file')
+	parser.add_argument('-r', '--repo', required = True, help = 'git repo to walk, e.g. ./repo/linux')
+	parser.add_argument('-n', '--rounds', type = int, default = 3, help = 'rounds of each variant')
+
+	args = parser.parse_args()
+
+	repo_path = os.path.abspath(args.repo)
+	emails = read_emails(args.config_file)
+
+	print('%d email(s), repo %s' % (len(emails), repo_path))
+
+	variants = []
+
+	# the original form, one regex per email
+	params = []
+	for email in emails:
+		params.append('--author=%s' % (email))
+	variants.append(('one --author per email', params))
+
+	# a single anchored alternation
+	pattern = '<(%s)>' % ('|'.join(re.sub(r'([\\.^$|?*+()\[\]{}])', r'\\\1', email) for email in emails))
+	variants.append(('single --author pattern', ['--extended-regexp', '--author=%s' % (pattern)]))
+
+	for graph in [False, True]:
+		if graph == True:
+			print('write commit-graph')
+			subprocess.run(['git', '-C', repo_path, 'commit-graph', 'write', '--reachable', '--split'], check = True)
+			config = []
+		else:
+			config = ['-c', 'core.commitGraph=false']
+
+		for name, params in variants:
+			timings = []
+
+			for _ in range(args.rounds):
+				elapsed, lines = run_git_log(repo_path, config, params + [pretty_param, '--reverse'])
+				timings.append(elapsed)
+
+			print('%-24s commit-graph %-5s: best %.2fs, %d commit(s)' % (name, graph, min(timings), lines))
+
+	return
+
+if __name__ == '__main__':
+	main()
@@ -3,7 +3,11 @@
 # found in the LICENSE file.
 
 """File to enable importing from third_party."""
+import os
 import sys
-sys.path.insert(0, './depot_tools')
-sys.path.insert(0, './depot_tools/third_party')
 
+# relative to this file rather than to the current directory
+_DEPOT_TOOLS = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, _DEPOT_TOOLS)
+sys.path.insert(0, os.path.join(_DEPOT_TOOLS, 'third_party'))
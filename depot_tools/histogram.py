@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Fixed-size latency histogram, without the dependencies of metrics.py."""
+
+
+class LatencyHistogram(object):
+    """Fixed-size log-linear histogram of durations, in the HDR style.
+
+  Durations are counted in microseconds, exactly below 2**SUB_BITS and in
+  2**(SUB_BITS - 1) linear buckets per power of two above, so a percentile is
+  within 2**(1 - SUB_BITS) of the recorded value whatever the count.
+  """
+    SUB_BITS = 6
+    # About 19 hours, longer durations are counted in the last bucket.
+    MAX_BITS = 36
+
+    def __init__(self):
+        self._half = 1 << (self.SUB_BITS - 1)
+        self._counts = [0] * (
+            (self.MAX_BITS - self.SUB_BITS + 2) * self._half)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _get_index(self, micros):
+        micros = min(micros, (1 << self.MAX_BITS) - 1)
+        if micros < 2 * self._half:
+            return micros
+        shift = micros.bit_length() - self.SUB_BITS
+        return (shift << (self.SUB_BITS - 1)) + (micros >> shift)
+
+    def _get_value(self, index):
+        # The middle of a bucket, in seconds.
+        if index < 2 * self._half:
+            return index / 1e6
+        shift = index // self._half - 1
+        sub = index - shift * self._half
+        return ((sub << shift) + (1 << shift) / 2) / 1e6
+
+    def record(self, seconds):
+        self._counts[self._get_index(max(0, int(seconds * 1e6)))] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def get_percentile(self, percent):
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(-(-percent * self.count // 100)))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._get_value(index), self.max)
+        return self.max
+
+    def get_summary(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.total, 6),
+            'p50': round(self.get_percentile(50), 6),
+            'p95': round(self.get_percentile(95), 6),
+            'p99': round(self.get_percentile(99), 6),
+            'max': round(self.max, 6),
+        }
@@ -19,6 +19,7 @@ import detect_host_arch
 import gclient_utils
 import metrics_utils
 import subprocess2
+from histogram import LatencyHistogram
 
 DEPOT_TOOLS = os.path.dirname(os.path.abspath(__file__))
 CONFIG_FILE = os.path.join(DEPOT_TOOLS, 'metrics.cfg')
@@ -169,6 +170,8 @@ class MetricsCollector(object):
         self._config = _Config()
         self._collecting_metrics = False
         self._collect_custom_metrics = True
+        # None, or the histograms replacing the repeated metrics lists.
+        self._histograms = None
 
     @property
     def config(self):
@@ -186,8 +189,39 @@ class MetricsCollector(object):
     def add_repeated(self, name, value):
         if self._collect_custom_metrics:
             with self._metrics_lock:
+                if (self._histograms is not None and isinstance(value, dict)
+                        and 'response_time' in value):
+                    self._add_to_histogram(name, value)
+                    return
                 self._reported_metrics.setdefault(name, []).append(value)
 
+    def enable_histograms(self):
+        """Aggregates the timed repeated metrics into histograms.
+
+    A repeated metric with a 'response_time', like 'http_requests', is counted
+    in a LatencyHistogram keyed by its name, host, path and status instead of
+    being appended to a list, so memory does not grow with the request count.
+    Hosts and paths unknown to metrics_utils are counted as 'other'.
+    """
+        with self._metrics_lock:
+            if self._histograms is None:
+                self._histograms = {}
+
+    def _add_to_histogram(self, name, value):
+        key = (name, value.get('host', 'other'), value.get('path', 'other'),
+               value.get('status', 0))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.record(value['response_time'])
+
+    def get_histograms(self):
+        """Returns a list of (name, host, path, status, summary) tuples."""
+        with self._metrics_lock:
+            return [key + (histogram.get_summary(), )
+                    for key, histogram in sorted(
+                        (self._histograms or {}).items(), key=str)]
+
     @contextlib.contextmanager
     def pause_metrics_collection(self):
         collect_custom_metrics = self._collect_custom_metrics
@@ -6,19 +6,14 @@ import numpy as np
 import os
 import time
 
-from upstream_crawler import GitCrawler
+from upstream_aggregate import SummaryCube
+from upstream_git import GitCrawler
 
 FUNC_AUDIO = 'audio'
 FUNC_DISPLAY_GRAPHIC = 'display/graphic'
 FUNC_OTHER = 'other'
 
-def output_jpg_file(commits):
-	x = []
-	y_audio = []
-	y_display = []
-	y_other = []
-	y_total = []
-
+def output_jpg_file(commits, date_field):
 	while True:
 		now = time.localtime()
 
@@ -34,27 +29,16 @@ def output_jpg_file(commits):
 
 	print('save plot to %s' % (jpg_path))
 
-	for commit in commits:
-		year = int(commit['date'].split('-')[0])
-
-		if year not in x:
-			x.append(year)
-			y_audio.append(0)
-			y_display.append(0)
-			y_other.append(0)
-			y_total.append(0)
-
-		idx = x.index(year)
+	# commits per function per year
+	cube = SummaryCube(['user_function', 'year'])
+	cube.add_store(commits, date_field)
 
-		y_total[idx] += 1
+	years = cube.get_labels('year')
+	_, _, (y_audio, y_display) = cube.get_table('user_function', 'year', None, [FUNC_AUDIO, FUNC_DISPLAY_GRAPHIC], years)
+	y_total = [cube.get_total({'year': year}) for year in years]
 
-		function = commit['function']
-		if function == FUNC_AUDIO:
-			y_audio[idx] += 1
-		elif function == FUNC_DISPLAY_GRAPHIC:
-			y_display[idx] += 1
-		else:
-			y_other[idx] += 1 # should not happen
+	x = [int(year) for year in years]
+	y_other = [total - audio - display for total, audio, display in zip(y_total, y_audio, y_display)] # should be 0
 
 	plt.plot(x, y_audio, label = FUNC_AUDIO)
 	plt.plot(x, y_display, label = FUNC_DISPLAY_GRAPHIC)
@@ -82,7 +66,7 @@ def main():
 		crawler.export_csv_file()
 
 	# draw a plot and save to jpg file
-	#output_jpg_file(commits)
+	#output_jpg_file(commits, 'committer_date')
 
 	return
 
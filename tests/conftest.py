@@ -0,0 +1,9 @@
+#!/usr/bin/python3
+import os
+import sys
+
+# the modules live in the top directory, run from anywhere: python3 -m pytest
+top_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if top_directory not in sys.path:
+	sys.path.insert(0, top_directory)
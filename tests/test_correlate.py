@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+import pytest
+
+from upstream_correlate import ContributionCorrelator
+from upstream_correlate import TrigramIndex
+from upstream_correlate import get_trigrams
+
+@pytest.fixture
+def correlator(tmp_path):
+	cfg_path = str(tmp_path / 'test.cfg')
+	with open(cfg_path, 'w') as cfg_file:
+		cfg_file.write('[user 0]\nname = Alice\nemail1 = alice@example.com\nfunction = audio\n')
+
+	return ContributionCorrelator(cfg_path)
+
+def git_row(subject, status, commit_hash, change_id = ''):
+	return {'user_name': 'Alice',
+		'user_function': 'audio',
+		'commit_hash': commit_hash,
+		'author_date': '2021-01-01T10:00:00+00:00',
+		'committer_date': '2021-02-01T10:00:00+00:00',
+		'subject': subject,
+		'status': status,
+		'change_id': change_id,
+		'reviewed_by': '',
+	       }
+
+def get_rows(correlator):
+	return dict((row['subject'], row) for row in correlator.get_contributions())
+
+def test_stage_of_git_status(correlator):
+	# a commit of a maintainer tree is merged, only a linux one upstreamed
+	correlator.add_git_rows([git_row('ASoC: fix a', 'upstreamed', 'a' * 40),
+				 git_row('ASoC: fix b', 'accepted', 'b' * 40),
+				])
+	rows = get_rows(correlator)
+
+	assert rows['ASoC: fix a']['stage'] == 'upstreamed'
+	assert rows['ASoC: fix a']['upstreamed'] == '2021-02-01T10:00:00+00:00'
+	assert rows['ASoC: fix a']['merged'] == ''
+
+	assert rows['ASoC: fix b']['stage'] == 'merged'
+	assert rows['ASoC: fix b']['merged'] == '2021-02-01T10:00:00+00:00'
+	assert rows['ASoC: fix b']['upstreamed'] == ''
+
+def test_join_of_sources(correlator):
+	# the commit and the change share a Change-Id, the patch a subject
+	correlator.add_git_rows([git_row('ASoC: fix a', 'upstreamed', 'a' * 40, 'I' + '1' * 40)])
+	correlator.add_gerrit_rows([{'user_name': 'Alice',
+				     'user_function': 'audio',
+				     'change_id': 'I' + '1' * 40,
+				     'subject': 'UPSTREAM: ASoC: fix a',
+				     'status': 'MERGED',
+				     'created': '2020-12-01 10:00:00.000000000',
+				     'submitted': '2021-03-01 10:00:00.000000000',
+				    }])
+	correlator.add_patchwork_rows([{'user_name': 'Alice',
+					'user_function': 'audio',
+					'name': '[PATCH v2] ASoC: fix a',
+					'date': '2020-11-01T10:00:00',
+					'state': 'accepted',
+				       }])
+	rows = list(correlator.get_contributions())
+
+	assert len(rows) == 1
+	assert rows[0]['stage'] == 'upstreamed'
+	assert rows[0]['sources'] == 'git,gerrit,patchwork'
+	assert rows[0]['posted'] == '2020-11-01T10:00:00'
+	assert rows[0]['versions'] == 2
+	assert rows[0]['patch_match'] == 'subject'
+
+def test_fuzzy_match_of_edited_subject(correlator):
+	# the maintainer reworded the subject when applying the patch
+	correlator.add_git_rows([git_row('ASoC: mediatek: fix the clock of the i2s', 'accepted', 'a' * 40)])
+	correlator.add_patchwork_rows([{'user_name': 'Alice',
+					'user_function': 'audio',
+					'name': '[PATCH] ASoC: mediatek: fix clock of the i2s',
+					'date': '2020-12-20T10:00:00',
+					'state': 'accepted',
+				       }])
+	rows = list(correlator.get_contributions())
+
+	assert len(rows) == 1
+	assert rows[0]['stage'] == 'merged'
+	assert rows[0]['patch_match'] == 'fuzzy'
+
+def test_trigram_index():
+	index = TrigramIndex(86400, 0.7)
+	index.add('alice', 'fix the clock of the i2s', 0, 'close')
+	index.add('alice', 'add a new codec driver', 0, 'other')
+	index.add('bob', 'fix the clock of the i2s', 0, 'bob')
+	index.add('alice', 'fix the clock of the i2s', 3 * 86400, 'late')
+
+	# the same block, within the window and above the threshold
+	assert [value for _, value in index.find('alice', 'fix clock of the i2s', 3600)] == ['close']
+	assert index.find('alice', 'something else entirely', 3600) == []
+	assert index.find('carol', 'fix the clock of the i2s', 0) == []
+
+	score, value = index.find('alice', 'fix the clock of the i2s', 0)[0]
+	assert (score, value) == (1.0, 'close')
+	assert len(index) == 4
+
+def test_trigram_candidates_are_exact():
+	# the prefix filter finds every subject a full scan scores above the
+	# threshold
+	subjects = ['fix the %s of the %s' % (noun, device) for noun in ['clock', 'reset', 'irq', 'dma'] for device in ['i2s', 'dsp', 'codec', 'tdm']]
+
+	index = TrigramIndex(86400, 0.6)
+	for subject in subjects:
+		index.add('alice', subject, 0, subject)
+
+	for query in ['fix the clock of i2s', 'fix irq of the dsp', 'fix dma of the codec']:
+		found = set(value for _, value in index.find('alice', query, 0))
+
+		expected = set()
+		for subject in subjects:
+			trigrams, item_trigrams = get_trigrams(query), get_trigrams(subject)
+			if 2.0 * len(trigrams & item_trigrams) / (len(trigrams) + len(item_trigrams)) >= 0.6:
+				expected.add(subject)
+
+		assert found == expected
+		assert len(found) != 0
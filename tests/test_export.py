@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from upstream_crawler import BaseCrawler
+
+fields = ['user_name', 'state', 'number', 'created_at', 'closed_at', 'serial', 'title']
+
+# an open pull has no 'closed_at', 'serial' is an integer field with a text
+# value, RecordStore keeps such a field as text
+pulls = [('Alice', 'closed', 1, '2021-01-01T10:00:00Z', '2021-01-02T10:00:00Z', 7, 'first'),
+	 ('Bob', 'open', 2, '2021-03-01T10:00:00Z', None, 'n/a', 'second, with "quotes"'),
+	 ('Alice', 'open', 3, '2021-02-01T10:00:00Z', None, 9, ''),
+	]
+
+def read_jsonl(path):
+	with open(path, encoding = 'utf-8') as jsonl_file:
+		return [json.loads(line) for line in jsonl_file]
+
+def read_csv_gz(path):
+	with gzip.open(path, 'rt', newline = '', encoding = 'utf-8') as csv_file:
+		return list(csv.reader(csv_file))
+
+def read_csv_zst(path):
+	zstandard = pytest.importorskip('zstandard')
+
+	with open(path, 'rb') as zstd_file:
+		text = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(zstd_file), newline = '', encoding = 'utf-8')
+		return list(csv.reader(text))
+
+def read_parquet(path):
+	pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+
+	table = pyarrow_parquet.read_table(path)
+	return [str(table.schema), table.to_pylist()]
+
+readers = {'jsonl': read_jsonl,
+	   'csv.gz': read_csv_gz,
+	   'csv.zst': read_csv_zst,
+	   'parquet': read_parquet,
+	  }
+
+def export(tmp_path, name, file_format, stream):
+	cfg_path = str(tmp_path / 'test.cfg')
+	with open(cfg_path, 'w') as cfg_file:
+		cfg_file.write('[user 0]\nname = Alice\nemail1 = alice@example.com\n\n[user 1]\nname = Bob\nemail1 = bob@example.com\n')
+
+	directory = tmp_path / name
+	directory.mkdir()
+
+	crawler = BaseCrawler(cfg_path)
+	if stream == True:
+		crawler.set_stream_directory(str(directory))
+
+	rows = crawler.create_store('test', fields, ['user_name', 'state'], ['number', 'serial'], ['created_at'], 'created_at')
+	for values in pulls:
+		rows.append(dict(zip(fields, values)))
+	rows.end_run()
+	rows.sort('created_at')
+
+	assert crawler.export_file(str(directory), 'test', fields, 'created_at', rows, file_format) == True
+
+	return str(directory / ('test.%s' % (file_format)))
+
+@pytest.mark.parametrize('file_format', readers.keys())
+def test_streamed_export(tmp_path, file_format):
+	# the rows read back from the csv of a --stream run give the same file
+	# as the rows kept in memory
+	if file_format == 'parquet':
+		pytest.importorskip('pyarrow')
+
+	memory = readers[file_format](export(tmp_path, 'memory', file_format, False))
+	stream = readers[file_format](export(tmp_path, 'stream', file_format, True))
+
+	assert stream == memory
+
+def test_jsonl_nulls(tmp_path):
+	rows = read_jsonl(export(tmp_path, 'stream', 'jsonl', True))
+
+	assert [row['closed_at'] for row in rows] == ['2021-01-02T10:00:00Z', None, None]
+	assert [row['title'] for row in rows] == ['first', '', 'second, with "quotes"']
+	assert [row['number'] for row in rows] == [1, 3, 2]
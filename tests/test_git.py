@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+import os
+import subprocess
+
+from upstream_git import GitCrawler
+
+users = [('Alice', 'alice@example.com'), ('Bob', 'bob@example.com')]
+
+def run_git(repo_path, *args, date = None):
+	env = dict(os.environ)
+	if date != None:
+		env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = date
+
+	return subprocess.run(['git', '-C', repo_path] + list(args), env = env, check = True,
+			      stdout = subprocess.PIPE, universal_newlines = True).stdout.strip()
+
+def create_repo(repo_path):
+	os.makedirs(repo_path)
+	run_git(repo_path, 'init', '-q', '-b', 'master')
+	run_git(repo_path, 'config', 'user.name', 'Maintainer')
+	run_git(repo_path, 'config', 'user.email', 'maintainer@example.com')
+
+	return repo_path
+
+def commit(repo_path, user, date, subject):
+	name, email = user
+	run_git(repo_path, '-c', 'user.name=%s' % (name), '-c', 'user.email=%s' % (email),
+		'commit', '-q', '--allow-empty', '-m', subject, date = date)
+
+	return run_git(repo_path, 'rev-parse', 'HEAD')
+
+def write_config(cfg_path, repos, shards = '0'):
+	# repos: (name, url, branches)
+	with open(cfg_path, 'w') as cfg_file:
+		for idx, (name, email) in enumerate(users):
+			cfg_file.write('[user %d]\nname = %s\nemail1 = %s\nemail2 =\nfunction = audio\ngithub username =\ndisable = false\n\n' % (idx, name, email))
+
+		for name, url, branches in repos:
+			cfg_file.write('[git %s]\nname = %s\nurl = file://%s\nbranch = %s\nlog shards = %s\ndisable = false\n\n' % (name, name, url, branches, shards))
+
+	return cfg_path
+
+def count_rows(rows):
+	# user name -> year -> commits, from the rows of a full crawl
+	counts = {}
+	for name, date in rows.iter_rows(['user_name', 'committer_date']):
+		years = counts.setdefault(name, {})
+		years[date[0:4]] = years.get(date[0:4], 0) + 1
+
+	return counts
+
+def test_commit_counts_of_a_fork(tmp_path, monkeypatch):
+	# the fork is cloned from upstream, then both get commits of their
+	# own: neither has the tip of the other, the shared history must be
+	# counted once
+	upstream = create_repo(str(tmp_path / 'upstream'))
+	commit(upstream, users[0], '2021-03-01T10:00:00+00:00', 'shared one')
+	commit(upstream, users[1], '2021-04-01T10:00:00+00:00', 'shared two')
+
+	fork = str(tmp_path / 'fork')
+	subprocess.run(['git', 'clone', '-q', upstream, fork], check = True)
+	commit(fork, users[0], '2021-05-01T10:00:00+00:00', 'fork only')
+
+	commit(upstream, users[0], '2022-01-01T10:00:00+00:00', 'upstream only')
+
+	cfg_path = write_config(str(tmp_path / 'test.cfg'), [('upstream', upstream, 'master'), ('fork', fork, 'master')])
+
+	# the crawler clones the repos into ./repo
+	monkeypatch.chdir(tmp_path)
+
+	crawler = GitCrawler(cfg_path)
+	counts = crawler.get_commit_counts()
+	assert crawler.get_years() == ['2021', '2022']
+	assert counts == {'Alice': [2, 1], 'Bob': [1, 0]}
+
+	# same counts as the rows of the full crawl
+	rows = GitCrawler(cfg_path).get_commits()
+	assert len(rows) == 4
+	assert count_rows(rows) == {'Alice': {'2021': 2, '2022': 1}, 'Bob': {'2021': 1}}
+
+def get_branches(rows):
+	return {subject: branch for subject, branch in rows.iter_rows(['subject', 'branch'])}
+
+def test_branch_of_shared_commits(tmp_path, monkeypatch):
+	# fixes and for-next fork from master, every commit shared by several
+	# branches belongs to the first one of the config
+	source = create_repo(str(tmp_path / 'source'))
+	commit(source, users[0], '2021-03-01T10:00:00+00:00', 'base')
+	run_git(source, 'branch', 'fixes')
+	run_git(source, 'branch', 'for-next')
+	commit(source, users[0], '2021-04-01T10:00:00+00:00', 'master only')
+
+	run_git(source, 'checkout', '-q', 'fixes')
+	commit(source, users[1], '2021-05-01T10:00:00+00:00', 'fix')
+
+	run_git(source, 'checkout', '-q', 'for-next')
+	run_git(source, 'merge', '-q', '--no-edit', 'fixes')
+	commit(source, users[1], '2021-06-01T10:00:00+00:00', 'next')
+
+	monkeypatch.chdir(tmp_path)
+
+	cfg_path = write_config(str(tmp_path / 'test.cfg'), [('source', source, 'master, fixes for-*')])
+	assert get_branches(GitCrawler(cfg_path).get_commits()) == {'base': 'master', 'master only': 'master', 'fix': 'fixes', 'next': 'for-next'}
+
+	cfg_path = write_config(str(tmp_path / 'test.cfg'), [('source', source, 'for-*, master')])
+	assert get_branches(GitCrawler(cfg_path).get_commits()) == {'base': 'for-next', 'master only': 'master', 'fix': 'for-next', 'next': 'for-next'}
+
+def test_auto_shards_without_cpu_count(tmp_path, monkeypatch):
+	# os.cpu_count() may not know, the log falls back to one process
+	source = create_repo(str(tmp_path / 'source'))
+	for idx in range(8):
+		commit(source, users[idx % 2], '2021-%02d-01T10:00:00+00:00' % (idx + 1), 'change %d' % (idx))
+
+	monkeypatch.chdir(tmp_path)
+	monkeypatch.setattr(os, 'cpu_count', lambda: None)
+
+	cfg_path = write_config(str(tmp_path / 'test.cfg'), [('source', source, 'master')], 'auto')
+	rows = GitCrawler(cfg_path).get_commits()
+
+	assert [subject for subject, in rows.iter_rows(['subject'])] == ['change %d' % (idx) for idx in range(8)]
+
+def test_sharded_log(tmp_path, monkeypatch):
+	# committer date windows give the rows of a single walk, with dates in
+	# several timezones, a commit dated before its parent and commits at
+	# both ends of the history, on two branches and a merge
+	source = create_repo(str(tmp_path / 'source'))
+	commit(source, users[0], '2019-01-01T00:00:00+00:00', 'root')
+
+	dates = ['2019-06-01T23:30:00-08:00', '2019-06-02T09:00:00+09:00', '2018-01-01T10:00:00+00:00',
+		 '2020-02-29T12:00:00+05:30', '2020-03-01T00:00:00-00:00', '2021-07-15T18:45:00+02:00']
+	for idx, date in enumerate(dates):
+		commit(source, users[idx % 2], date, 'master %d' % (idx))
+
+	run_git(source, 'checkout', '-q', '-b', 'fixes', 'HEAD~3')
+	for idx in range(5):
+		commit(source, users[1], '2020-%02d-10T08:00:00+01:00' % (idx + 4), 'fix %d' % (idx))
+
+	run_git(source, 'checkout', '-q', 'master')
+	run_git(source, 'merge', '-q', '--no-edit', 'fixes', date = '2022-01-01T00:00:00+00:00')
+	commit(source, users[0], '2030-01-01T00:00:00+00:00', 'from the future')
+
+	monkeypatch.chdir(tmp_path)
+
+	fields = ['commit_hash', 'author_date', 'committer_date', 'subject', 'branch']
+
+	write_config(str(tmp_path / 'test.cfg'), [('source', source, 'master, fixes')], '1')
+	expected = list(GitCrawler(str(tmp_path / 'test.cfg')).get_commits().iter_rows(fields))
+
+	assert len(expected) == 13
+
+	for shards in ['2', '3', '7']:
+		write_config(str(tmp_path / 'test.cfg'), [('source', source, 'master, fixes')], shards)
+
+		assert list(GitCrawler(str(tmp_path / 'test.cfg')).get_commits().iter_rows(fields)) == expected
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+import os
+import subprocess
+import sys
+
+import pytest
+
+# import time of upstream_report and of each crawler module against a
+# budget, each module imported in a fresh interpreter. The modules an
+# import must not load are checked too, ex. the report alone must not load
+# depot_tools (not even its package, its __init__ changes sys.path),
+# GitPython, requests or openpyxl. A slower machine scales the
+# budgets: IMPORT_BUDGET_SCALE=2 python3 -m pytest tests/test_import_time.py
+
+top_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+heavy_modules = ['git', 'requests', 'httplib2', 'openpyxl', 'numpy', 'metrics', 'depot_tools', 'depot_tools.gerrit_util']
+
+# module: budget in ms, heavy modules it may load
+budgets = {'upstream_report': (100, []),
+	   'upstream_crawler': (80, []),
+	   'upstream_correlate': (80, []),
+	   'upstream_gerrit': (600, ['httplib2', 'metrics', 'depot_tools', 'depot_tools.gerrit_util']),
+	   'upstream_git': (300, ['git']),
+	   'upstream_github': (300, ['requests']),
+	   'upstream_patchwork': (300, ['requests']),
+	  }
+
+# imports of each module, the median is kept
+runs = 3
+
+def measure(module):
+	# cumulative import time of the module in ms, and the heavy modules
+	# loaded
+	code = 'import sys; import %s; print(" ".join(name for name in %r if name in sys.modules))' % (module, heavy_modules)
+
+	result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd = top_directory,
+				stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True, check = True)
+
+	# 'import time: self [us] | cumulative | imported package'
+	cumulative = 0
+	for line in result.stderr.splitlines():
+		item = line.split('|')
+		if len(item) == 3 and item[2].strip() == module:
+			cumulative = int(item[1])
+
+	return cumulative / 1000, result.stdout.split()
+
+@pytest.mark.parametrize('module', budgets.keys())
+def test_import_time(module):
+	budget, allowed = budgets[module]
+	budget *= float(os.environ.get('IMPORT_BUDGET_SCALE', '1'))
+
+	times = []
+	for idx in range(runs):
+		elapsed, loaded = measure(module)
+		times.append(elapsed)
+
+	times.sort()
+	elapsed = times[len(times) // 2]
+
+	assert elapsed <= budget, '%s imports in %.1f ms, budget %.0f ms' % (module, elapsed, budget)
+	assert [name for name in loaded if name not in allowed] == []
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+import csv
+import glob
+import os
+import sys
+import upstream_report
+
+from benchmark.fake_servers import FakeGithub
+from upstream_crawler import BaseCrawler
+
+fields = ['user_name', 'date', 'subject']
+
+def test_resumed_stream_export(tmp_path):
+	# an interrupted --stream run left its runs and a partial csv, the
+	# resumed run writes the csv again and removes the runs
+	cfg_path = str(tmp_path / 'test.cfg')
+	with open(cfg_path, 'w') as cfg_file:
+		cfg_file.write('[user 0]\nname = Alice\nemail1 = alice@example.com\n')
+
+	directory = str(tmp_path)
+	os.mkdir(os.path.join(directory, 'test.runs'))
+	with open(os.path.join(directory, 'test.runs', 'run-000009.csv'), 'w') as run_file:
+		run_file.write('0,0,Alice,2021-01-01T00:00:00,stale\n')
+	with open(os.path.join(directory, 'test.csv'), 'w') as csv_file:
+		csv_file.write('user_name,date,subject\nAlice,2021-01-01T00:00:00,part')
+
+	# the journal of the interrupted run, one stream half done
+	crawler = BaseCrawler(cfg_path)
+	crawler.set_journal_directory(directory)
+	rows = crawler.create_store('test', fields, ['user_name'], [], ['date'], 'date')
+	rows.append({'user_name': 'Alice', 'date': '2021-02-01T00:00:00', 'subject': 'second'})
+	crawler.checkpoint('stream', 'page 2', flush = True)
+	crawler.close_journal()
+
+	crawler = BaseCrawler(cfg_path)
+	crawler.set_journal_directory(directory)
+	crawler.set_stream_directory(directory)
+	rows = crawler.create_store('test', fields, ['user_name'], [], ['date'], 'date')
+
+	cursor, _ = crawler.resume_stream('stream', 'page 1')
+	assert cursor == 'page 2'
+
+	rows.append({'user_name': 'Alice', 'date': '2021-01-01T00:00:00', 'subject': 'first'})
+	crawler.end_stream('stream')
+	rows.end_run()
+	crawler.close_journal()
+
+	crawler.export_csv_file(directory, 'test', fields, rows)
+	crawler.export_csv_file(directory, 'test', fields, rows)
+
+	with open(os.path.join(directory, 'test.csv'), newline = '') as csv_file:
+		assert [values[2] for values in csv.reader(csv_file)] == ['subject', 'first', 'second']
+
+	assert os.path.exists(os.path.join(directory, 'test.runs')) == False
+
+def write_github_config(cfg_path, server):
+	with open(cfg_path, 'w') as cfg_file:
+		for idx in range(4):
+			cfg_file.write('[user %d]\nname = user %d\nemail1 = user%d@example.com\n' % (idx, idx, idx))
+			cfg_file.write('github username = user%d\n\n' % (idx))
+
+		cfg_file.write('[github fake]\nname = fake\nowner/repo = fake/repo\n')
+		cfg_file.write('api url = %s\n' % (server.get_url()))
+
+	return
+
+def run_report(monkeypatch, *args):
+	monkeypatch.setattr(sys, 'argv', ['upstream_report.py'] + list(args))
+	upstream_report.main()
+
+	return
+
+def read_rows(csv_path):
+	with open(csv_path, newline = '') as csv_file:
+		return list(csv.reader(csv_file))
+
+def test_resume_after_http_error(tmp_path, monkeypatch):
+	# a 403 of an exhausted rate limit stops the crawl half way, the
+	# journal is kept and the resumed run gives the rows of a full run
+	monkeypatch.chdir(tmp_path)
+
+	server = FakeGithub('fake/repo', ['user%d' % (idx) for idx in range(4)], 250, rate_limit = 1000).start()
+
+	try:
+		write_github_config(str(tmp_path / 'full.cfg'), server)
+		run_report(monkeypatch, 'github', '-c', 'full.cfg', '-u', 'user', '-t', 'token', '-f', 'csv')
+
+		server.set_rate_limit(60)
+		write_github_config(str(tmp_path / 'part.cfg'), server)
+		run_report(monkeypatch, 'github', '-c', 'part.cfg', '-u', 'user', '-t', 'token', '-f', 'csv')
+
+		full_directory = glob.glob(str(tmp_path / 'full-*'))[0]
+		part_directory = glob.glob(str(tmp_path / 'part-*'))[0]
+
+		assert os.path.isfile(os.path.join(part_directory, 'github-pulls.journal')) == True
+		assert len(read_rows(os.path.join(part_directory, 'github-pulls.csv'))) < len(read_rows(os.path.join(full_directory, 'github-pulls.csv')))
+
+		server.set_rate_limit(1000)
+		run_report(monkeypatch, 'github', '-c', 'part.cfg', '-u', 'user', '-t', 'token', '-f', 'csv', '--resume', part_directory)
+	finally:
+		server.stop()
+
+	assert os.path.isfile(os.path.join(part_directory, 'github-pulls.journal')) == False
+	assert read_rows(os.path.join(part_directory, 'github-pulls.csv')) == read_rows(os.path.join(full_directory, 'github-pulls.csv'))
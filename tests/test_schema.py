@@ -0,0 +1,19 @@
+#!/usr/bin/python3
+import pytest
+
+from upstream_gerrit import GerritCrawler
+from upstream_git import GitCrawler
+from upstream_github import GithubCrawler
+from upstream_patchwork import PatchworkCrawler
+
+@pytest.mark.parametrize('crawler_class', [GerritCrawler, GitCrawler, GithubCrawler, PatchworkCrawler])
+def test_schema(crawler_class):
+	# every field the schema refers to is a field of the rows
+	schema = crawler_class.get_schema()
+	fields = schema['fields']
+
+	for key in ['categories', 'integers', 'timestamps', 'dimensions', 'measures']:
+		assert set(schema[key]) <= set(fields), key
+
+	assert schema['date_field'] in schema['timestamps']
+	assert 'user_name' in fields
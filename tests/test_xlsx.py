@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+import openpyxl
+
+from upstream_xlsx import XlsxUpdater
+from upstream_xlsx import XlsxWorkbook
+
+def read_sheets(path):
+	book = openpyxl.load_workbook(path, read_only = True)
+	sheets = {sheet.title: [list(row) for row in sheet.iter_rows(values_only = True)] for sheet in book.worksheets}
+	book.close()
+
+	return sheets
+
+def test_chained_updates(tmp_path):
+	path = str(tmp_path / 'report.xlsx')
+
+	book = XlsxWorkbook()
+	book.create_sheet('summary').append(['name', 'count'])
+	book.create_sheet('2021').append(['change 2021'])
+	book.save(path)
+
+	# each update adds the sheet of a new year
+	book = XlsxUpdater(path)
+	book.append_rows('2022', [['change 2022']], '2021')
+	book.save(path)
+
+	book = XlsxUpdater(path)
+	book.append_rows('2023', [['change 2023']], '2022')
+	book.append_rows('2021', [['late 2021']])
+	book.save(path)
+
+	sheets = read_sheets(path)
+
+	assert list(sheets.keys()) == ['summary', '2021', '2022', '2023']
+	assert sheets['2021'] == [['change 2021'], ['late 2021']]
+	assert sheets['2022'] == [['change 2022']]
+	assert sheets['2023'] == [['change 2023']]
+
+def test_sheet_titles_of_user_names(tmp_path):
+	# a long user name, two names equal once cut to 31 characters and
+	# characters excel refuses in a title
+	from upstream_crawler import BaseCrawler
+	from upstream_record import RecordStore
+
+	names = ['Bartholomew Maximilian Montgomery-Smith',
+		 'Bartholomew Maximilian Montgomery-Jones',
+		 'Eve [contractor]: audio/video']
+
+	cfg_path = str(tmp_path / 'test.cfg')
+	with open(cfg_path, 'w') as cfg_file:
+		for idx, name in enumerate(names):
+			cfg_file.write('[user %d]\nname = %s\nemail1 = user%d@example.com\n\n' % (idx, name, idx))
+
+	fields = ['user_name', 'date', 'subject']
+
+	def get_rows(subjects):
+		rows = RecordStore(fields, ['user_name'], [], ['date'])
+		for name, date, subject in subjects:
+			rows.append({'user_name': name, 'date': date, 'subject': subject})
+		rows.end_run()
+
+		return rows
+
+	crawler = BaseCrawler(cfg_path)
+	first = [(name, '2021-0%d-01T10:00:00' % (idx + 1), 'first %d' % (idx)) for idx, name in enumerate(names)]
+
+	directory = tmp_path / 'first'
+	directory.mkdir()
+	crawler.export_excel_file(str(directory), 'test', fields, 'date', get_rows(first))
+
+	sheets = read_sheets(str(directory / 'test.xlsx'))
+	titles = list(sheets.keys())
+
+	assert titles == ['summary', 'all', '2021', 'Bartholomew Maximilian Montgome', 'Bartholomew Maximilian Montgom1', 'Eve _contractor__ audio_video']
+	assert sheets[titles[3]][1][2] == 'first 0'
+	assert sheets[titles[4]][1][2] == 'first 1'
+	assert sheets[titles[5]][1][2] == 'first 2'
+
+	# the csv of the previous report tells the rows already exported
+	crawler.export_csv_file(str(directory), 'test', fields, get_rows(first))
+
+	second = first + [(name, '2022-0%d-01T10:00:00' % (idx + 1), 'second %d' % (idx)) for idx, name in enumerate(names)]
+
+	update = tmp_path / 'second'
+	update.mkdir()
+	crawler.update_excel_file(str(update), str(directory), 'test', fields, 'date', ['subject'], get_rows(second))
+
+	sheets = read_sheets(str(update / 'test.xlsx'))
+
+	assert list(sheets.keys()) == titles[:3] + ['2022'] + titles[3:]
+	for idx, title in enumerate(titles[3:]):
+		assert [row[2] for row in sheets[title][1:]] == ['first %d' % (idx), 'second %d' % (idx)]
+
+def test_shared_strings_of_categories(tmp_path):
+	# only the strings of the shared columns go to the shared strings, the
+	# unique ones are inline strings
+	import zipfile
+
+	path = str(tmp_path / 'report.xlsx')
+
+	book = XlsxWorkbook([0])
+	sheet = book.create_sheet('all')
+	sheet.append(['user_name', 'subject', 'count'])
+	for idx in range(100):
+		sheet.append(['Alice' if idx % 2 == 0 else 'Bob', ' subject %d & more' % (idx), idx])
+	book.save(path)
+
+	with zipfile.ZipFile(path) as excel_file:
+		shared_strings = excel_file.read('xl/sharedStrings.xml').decode()
+
+	assert 'uniqueCount="3"' in shared_strings
+	assert 'subject' not in shared_strings
+
+	rows = read_sheets(path)['all']
+	assert rows[0] == ['user_name', 'subject', 'count']
+	assert rows[1] == ['Alice', ' subject 0 & more', 0]
+	assert rows[100] == ['Bob', ' subject 99 & more', 99]
+
+def test_update_of_changed_rows(tmp_path):
+	# a change merged since the previous report is not left as new in the
+	# sheets while the summary counts it as merged
+	from upstream_crawler import BaseCrawler
+	from upstream_record import RecordStore
+
+	cfg_path = str(tmp_path / 'test.cfg')
+	with open(cfg_path, 'w') as cfg_file:
+		cfg_file.write('[user 0]\nname = Alice\nemail1 = alice@example.com\n')
+
+	fields = ['user_name', 'status', 'date', 'change_id']
+
+	def get_rows(changes):
+		rows = RecordStore(fields, ['user_name', 'status'], [], ['date'])
+		for status, date, change_id in changes:
+			rows.append({'user_name': 'Alice', 'status': status, 'date': date, 'change_id': change_id})
+		rows.end_run()
+
+		return rows
+
+	crawler = BaseCrawler(cfg_path)
+	crawler.set_summary(['status'])
+
+	first = [('NEW', '2021-01-01T10:00:00', 'I1'), ('MERGED', '2021-02-01T10:00:00', 'I2')]
+
+	directory = tmp_path / 'first'
+	directory.mkdir()
+	crawler.export_excel_file(str(directory), 'test', fields, 'date', get_rows(first))
+	crawler.export_csv_file(str(directory), 'test', fields, get_rows(first))
+
+	second = [('MERGED', '2021-01-01T10:00:00', 'I1'), ('MERGED', '2021-02-01T10:00:00', 'I2'), ('NEW', '2022-01-01T10:00:00', 'I3')]
+
+	update = tmp_path / 'second'
+	update.mkdir()
+	crawler.update_excel_file(str(update), str(directory), 'test', fields, 'date', ['change_id'], get_rows(second))
+
+	sheets = read_sheets(str(update / 'test.xlsx'))
+
+	assert [row[1] for row in sheets['all'][1:]] == ['MERGED', 'MERGED', 'NEW']
+	assert [row[1] for row in sheets['2021'][1:]] == ['MERGED', 'MERGED']
+	assert [row[1] for row in sheets['Alice'][1:]] == ['MERGED', 'MERGED', 'NEW']
+
+	# the summary counts the same rows
+	assert ['MERGED', '2', '0'] in sheets['summary']
+	assert ['NEW', '0', '1'] in sheets['summary']
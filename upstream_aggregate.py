@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+from array import array
+
+def get_period(date, period):
+	# date string of any source to its 'year' ('2021') or 'quarter'
+	# ('2021-Q4'), the date is read as it is written, in its own time zone
+	if date == None or date == '':
+		return ''
+
+	if period == 'quarter':
+		return '%s-Q%d' % (date[0:4], (int(date[5:7]) + 2) // 3)
+
+	return date[0:4]
+
+class SummaryCube:
+	# counts and sums of the report rows grouped by several dimensions at
+	# once, ex. user x quarter x function x status x source. A dimension is
+	# a field of the rows, a period of the date field ('year' or 'quarter')
+	# or 'source' (the report name). Only the cells that occur are kept.
+	def __init__(self, dimensions, measures = []):
+		self.__dimensions = list(dimensions)
+		self.__measures = list(measures)
+
+		# label tuple -> [count, sum of each measure]
+		self.__cells = {}
+
+		return
+
+	def get_dimensions(self):
+		return self.__dimensions
+
+	def get_measures(self):
+		return self.__measures
+
+	def __len__(self):
+		return len(self.__cells)
+
+	def __intern(self, values):
+		codes = array('I')
+		labels = []
+		index = {}
+
+		for value in values:
+			code = index.get(value)
+			if code == None:
+				code = index[value] = len(labels)
+				labels.append(value)
+
+			codes.append(code)
+
+		return codes, labels
+
+	def __period_codes(self, months, dimension):
+		# the periods are mapped from the months, not from every date
+		month_codes, month_labels = months
+
+		period_codes, labels = self.__intern([get_period(month, dimension) for month in month_labels])
+
+		return array('I', map(period_codes.__getitem__, month_codes)), labels
+
+	def __store_codes(self, rows, date_field, dimension, source, months):
+		# codes of one dimension for every row and the label of each code
+		if dimension == 'year' or dimension == 'quarter':
+			return self.__period_codes(months, dimension)
+
+		if dimension == 'source':
+			return array('I', [0]) * len(rows), [source]
+
+		if rows.get_kind(dimension) == 'category':
+			# already interned by the store
+			return rows.get_codes(dimension)
+
+		return self.__intern(rows.get_column(dimension))
+
+	def add_store(self, rows, date_field, source = ''):
+		# aggregate every row of a RecordStore in one pass, with numpy when
+		# it is installed
+		if len(rows) == 0:
+			return
+
+		# 'YYYY-MM' of each row, the only pass over the date strings
+		months = None
+		if 'year' in self.__dimensions or 'quarter' in self.__dimensions:
+			months = self.__intern([date[0:7] if date != None else '' for date in rows.get_column(date_field)])
+
+		codes = []
+		labels = []
+		for dimension in self.__dimensions:
+			dimension_codes, dimension_labels = self.__store_codes(rows, date_field, dimension, source, months)
+			codes.append(dimension_codes)
+			labels.append(dimension_labels)
+
+		measures = []
+		for measure in self.__measures:
+			if measure in rows.get_fields() and rows.get_kind(measure) == 'integer':
+				measures.append(rows.get_column(measure))
+			else:
+				# not a number in these rows, ex. a github row without diff
+				measures.append(None)
+
+		try:
+			import numpy
+		except ImportError:
+			numpy = None
+
+		if numpy != None:
+			cells = self.__aggregate_numpy(numpy, codes, labels, measures)
+		else:
+			cells = self.__aggregate(codes, measures)
+
+		for key, values in cells:
+			self.__add_cell(tuple(dimension_labels[code] for dimension_labels, code in zip(labels, key)), values)
+
+		return
+
+	def __aggregate_numpy(self, numpy, codes, labels, measures):
+		# one flat cell index per row, then a bincount per measure
+		shape = [len(dimension_labels) for dimension_labels in labels]
+
+		flat = numpy.ravel_multi_index([numpy.frombuffer(dimension_codes, dtype = numpy.uintc) for dimension_codes in codes], shape)
+		cells, inverse = numpy.unique(flat, return_inverse = True)
+
+		columns = [numpy.bincount(inverse, minlength = len(cells))]
+		for measure in measures:
+			if measure == None:
+				columns.append(numpy.zeros(len(cells), dtype = numpy.int64))
+			else:
+				weights = numpy.frombuffer(measure, dtype = numpy.int64)
+				columns.append(numpy.bincount(inverse, weights = weights, minlength = len(cells)).astype(numpy.int64))
+
+		keys = zip(*[dimension_codes.tolist() for dimension_codes in numpy.unravel_index(cells, shape)])
+		values = zip(*[column.tolist() for column in columns])
+
+		return zip(keys, values)
+
+	def __aggregate(self, codes, measures):
+		cells = {}
+
+		for idx, key in enumerate(zip(*codes)):
+			cell = cells.get(key)
+			if cell == None:
+				cell = cells[key] = [0] * (1 + len(measures))
+
+			cell[0] += 1
+
+			for measure_idx, measure in enumerate(measures):
+				if measure != None:
+					cell[measure_idx + 1] += measure[idx]
+
+		return cells.items()
+
+	def add_rows(self, fields, date_field, rows, source = ''):
+		# aggregate rows given as value lists, ex. read back from a csv file
+		date_idx = fields.index(date_field)
+
+		getters = []
+		for dimension in self.__dimensions:
+			if dimension == 'year' or dimension == 'quarter':
+				getters.append(lambda values, period = dimension: get_period(values[date_idx], period))
+			elif dimension == 'source':
+				getters.append(lambda values: source)
+			else:
+				getters.append(lambda values, idx = fields.index(dimension): values[idx])
+
+		measure_indices = [fields.index(measure) if measure in fields else None for measure in self.__measures]
+
+		for values in rows:
+			sums = []
+			for idx in measure_indices:
+				if idx != None and values[idx].__class__ is int:
+					sums.append(values[idx])
+				else:
+					sums.append(0)
+
+			self.__add_cell(tuple(getter(values) for getter in getters), [1] + sums)
+
+		return
+
+	def __add_cell(self, key, values):
+		cell = self.__cells.get(key)
+
+		if cell == None:
+			self.__cells[key] = list(values)
+			return
+
+		for idx, value in enumerate(values):
+			cell[idx] += value
+
+		return
+
+	def __match(self, filters):
+		# (key, cell) of the cells matching {dimension: label}
+		checks = [(self.__dimensions.index(dimension), label) for dimension, label in filters.items()]
+
+		for key, cell in self.__cells.items():
+			if all(key[idx] == label for idx, label in checks):
+				yield key, cell
+
+		return
+
+	def __column(self, measure):
+		if measure == None:
+			return 0
+
+		return self.__measures.index(measure) + 1
+
+	def get_labels(self, dimension):
+		# labels of a dimension that occur, sorted
+		idx = self.__dimensions.index(dimension)
+
+		return sorted(set(key[idx] for key in self.__cells), key = str)
+
+	def get_total(self, filters = {}, measure = None):
+		# row count (or the sum of a measure) over the matching cells
+		column = self.__column(measure)
+
+		return sum(cell[column] for _, cell in self.__match(filters))
+
+	def get_table(self, row_dimension, column_dimension, measure = None, row_labels = None, column_labels = None, filters = {}):
+		# roll the cube up to two dimensions: the row labels, the column
+		# labels and one list of counts (or sums) per row label
+		if row_labels == None:
+			row_labels = self.get_labels(row_dimension)
+		if column_labels == None:
+			column_labels = self.get_labels(column_dimension)
+
+		row_idx = self.__dimensions.index(row_dimension)
+		column_idx = self.__dimensions.index(column_dimension)
+		value_idx = self.__column(measure)
+
+		row_positions = {label: idx for idx, label in enumerate(row_labels)}
+		column_positions = {label: idx for idx, label in enumerate(column_labels)}
+
+		table = [[0] * len(column_labels) for _ in row_labels]
+
+		for key, cell in self.__match(filters):
+			row = row_positions.get(key[row_idx])
+			column = column_positions.get(key[column_idx])
+
+			if row != None and column != None:
+				table[row][column] += cell[value_idx]
+
+		return row_labels, column_labels, table
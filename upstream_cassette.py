@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+class Cassette:
+	# records the http requests of a crawl and replays them offline. Both
+	# transports are hooked: httplib2.Http.request under gerrit_util and
+	# requests.Session.send under BaseCrawler.http_get.
+	#
+	# file: magic, records, index, trailer. A record is a (key, payload)
+	# frame, the payload is the zlib of the response json, a newline and
+	# the body. The index maps each key to its frames in request order, a
+	# file without one (a crashed recording) is scanned instead.
+
+	__magic = b'UPCASS1\n'
+	__index_magic = b'UPCASSIX'
+
+	# record frame: payload length, key length
+	__frame = struct.Struct('<II')
+	# trailer: index offset, index length, index magic
+	__trailer = struct.Struct('<QQ8s')
+
+	# status of a request missing from the cassette: final for both
+	# transports, no retry
+	__miss_status = 410
+
+	def __init__(self, path, mode, latency = 0.0):
+		self.__path = path
+		self.__mode = mode
+		# replay sleeps the recorded response time times latency
+		self.__latency = latency
+		self.__lock = threading.Lock()
+		self.__index = {}
+		self.__cursors = {}
+		self.__requests = 0
+		self.__misses = 0
+		self.__originals = {}
+
+		if mode == 'record':
+			self.__file = open(path, 'wb')
+			self.__file.write(self.__magic)
+		elif mode == 'replay':
+			self.__file = open(path, 'rb')
+			self.__read_index()
+		else:
+			raise ValueError('invalid cassette mode \'%s\'' % (mode))
+
+		return
+
+	def get_counts(self):
+		return self.__requests, self.__misses
+
+	def install(self):
+		# the transports imported so far, each action imports its own so
+		# install again after the import
+		httplib2 = sys.modules.get('httplib2')
+		if httplib2 != None and 'httplib2' not in self.__originals:
+			self.__originals['httplib2'] = httplib2.Http.request
+			httplib2.Http.request = self.__hook_httplib2(httplib2, httplib2.Http.request)
+
+		requests = sys.modules.get('requests')
+		if requests != None and 'requests' not in self.__originals:
+			self.__originals['requests'] = requests.Session.send
+			requests.Session.send = self.__hook_requests(requests, requests.Session.send)
+
+		return
+
+	def uninstall(self):
+		if 'httplib2' in self.__originals:
+			sys.modules['httplib2'].Http.request = self.__originals.pop('httplib2')
+
+		if 'requests' in self.__originals:
+			sys.modules['requests'].Session.send = self.__originals.pop('requests')
+
+		return
+
+	def close(self):
+		self.uninstall()
+
+		if self.__file.closed == True:
+			return
+
+		if self.__mode == 'record':
+			index = zlib.compress(json.dumps(self.__index).encode())
+			offset = self.__file.tell()
+
+			self.__file.write(index)
+			self.__file.write(self.__trailer.pack(offset, len(index), self.__index_magic))
+
+		self.__file.close()
+
+		return
+
+	def __read_index(self):
+		if self.__file.read(len(self.__magic)) != self.__magic:
+			raise ValueError('%s is not a cassette file' % (self.__path))
+
+		size = os.fstat(self.__file.fileno()).st_size
+
+		if size >= len(self.__magic) + self.__trailer.size:
+			self.__file.seek(size - self.__trailer.size)
+			offset, length, magic = self.__trailer.unpack(self.__file.read(self.__trailer.size))
+
+			if magic == self.__index_magic:
+				self.__file.seek(offset)
+				self.__index = json.loads(zlib.decompress(self.__file.read(length)))
+				return
+
+		# no index, walk the frames
+		offset = len(self.__magic)
+		while offset + self.__frame.size <= size:
+			self.__file.seek(offset)
+			length, key_length = self.__frame.unpack(self.__file.read(self.__frame.size))
+
+			if offset + self.__frame.size + key_length + length > size:
+				# a frame cut by the crash
+				break
+
+			key = self.__file.read(key_length).decode()
+			self.__index.setdefault(key, []).append([offset + self.__frame.size + key_length, length])
+
+			offset += self.__frame.size + key_length + length
+
+		return
+
+	def __get_key(self, method, url, body):
+		key = '%s %s' % (method, url)
+
+		if body:
+			if isinstance(body, str):
+				body = body.encode()
+			key += ' %s' % (hashlib.sha1(body).hexdigest())
+
+		return key
+
+	def __record(self, key, status, reason, headers, body, elapsed):
+		response = {'status': status, 'reason': reason, 'headers': headers, 'elapsed': round(elapsed, 4)}
+		payload = zlib.compress(json.dumps(response).encode() + b'\n' + body)
+		key_bytes = key.encode()
+
+		with self.__lock:
+			self.__requests += 1
+
+			offset = self.__file.tell()
+			self.__file.write(self.__frame.pack(len(payload), len(key_bytes)))
+			self.__file.write(key_bytes)
+			self.__file.write(payload)
+			self.__file.flush()
+
+			self.__index.setdefault(key, []).append([offset + self.__frame.size + len(key_bytes), len(payload)])
+
+		return
+
+	def __replay(self, key):
+		# the recorded responses of a key in order, the last one repeats
+		with self.__lock:
+			self.__requests += 1
+
+			frames = self.__index.get(key)
+			if frames == None:
+				self.__misses += 1
+				print('- not in cassette: %s' % (key))
+				return self.__miss_status, 'Not In Cassette', {}, b''
+
+			cursor = self.__cursors.get(key, 0)
+			self.__cursors[key] = cursor + 1
+
+			offset, length = frames[min(cursor, len(frames) - 1)]
+			self.__file.seek(offset)
+			payload = zlib.decompress(self.__file.read(length))
+
+		head, _, body = payload.partition(b'\n')
+		response = json.loads(head)
+
+		if self.__latency > 0:
+			time.sleep(response['elapsed'] * self.__latency)
+
+		return response['status'], response['reason'], response['headers'], body
+
+	def __hook_httplib2(self, httplib2, original):
+		cassette = self
+
+		def request(http, uri, method = 'GET', body = None, headers = None, *args, **kwargs):
+			# an authenticated gerrit request gets an '/a' prefix, the
+			# key must not depend on the credentials of the recorder
+			scheme, _, rest = uri.partition('://')
+			host, slash, path = rest.partition('/')
+			if path.startswith('a/'):
+				path = path[2:]
+			key = cassette.__get_key(method, '%s://%s%s%s' % (scheme, host, slash, path), body)
+
+			if cassette.__mode == 'replay':
+				status, reason, response_headers, content = cassette.__replay(key)
+
+				response = httplib2.Response(dict(response_headers, status = str(status)))
+				response.reason = reason
+
+				return response, content
+
+			start = time.monotonic()
+			response, content = original(http, uri, method, body, headers, *args, **kwargs)
+			cassette.__record(key, response.status, response.reason, dict(response), content, time.monotonic() - start)
+
+			return response, content
+
+		return request
+
+	def __hook_requests(self, requests, original):
+		cassette = self
+
+		def send(session, request, **kwargs):
+			key = cassette.__get_key(request.method, request.url, request.body)
+
+			if cassette.__mode == 'replay':
+				status, reason, response_headers, content = cassette.__replay(key)
+
+				response = requests.Response()
+				response.status_code = status
+				response.reason = reason
+				response.headers = requests.structures.CaseInsensitiveDict(response_headers)
+				response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+				response.url = request.url
+				response.request = request
+				response._content = content
+
+				return response
+
+			start = time.monotonic()
+			response = original(session, request, **kwargs)
+			cassette.__record(key, response.status_code, response.reason, dict(response.headers), response.content, time.monotonic() - start)
+
+			return response
+
+		return send
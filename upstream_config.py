@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+import configparser
+
+class UserRecord:
+	__slots__ = ['name', 'emails', 'function', 'github_username']
+
+	def __init__(self, name, emails, function, github_username):
+		self.name = name
+		# email1 and email2, email2 may be ''
+		self.emails = emails
+		self.function = function
+		self.github_username = github_username
+
+		return
+
+class SectionRecord:
+	# a gerrit, git, github or patchwork section, the options beside the
+	# name and the url are read with get()
+	__slots__ = ['kind', 'title', 'name', 'url', 'options']
+
+	def __init__(self, kind, title, name, url, options):
+		self.kind = kind
+		self.title = title
+		self.name = name
+		self.url = url
+		self.options = options
+
+		return
+
+	def get(self, option, default = None):
+		return self.options.get(option, default)
+
+class ReportConfig:
+	# the config file parsed and validated once, shared by every crawler of
+	# a run, with the users indexed by email and by github username
+
+	# options each kind of section must have
+	__required_options = {'user': ['name', 'email1'],
+			      'gerrit': ['name', 'url'],
+			      'git': ['name', 'url', 'branch'],
+			      'github': ['name', 'owner/repo'],
+			      'patchwork': ['name', 'url'],
+			     }
+
+	def __init__(self, cfg_path):
+		self.__cfg_path = cfg_path
+		self.__users = []
+		self.__sections = {'gerrit': [], 'git': [], 'github': [], 'patchwork': []}
+		self.__users_by_email = {}
+		self.__users_by_github_username = {}
+		self.__emails = []
+		self.__initialized = False
+
+		parser = configparser.ConfigParser(interpolation = None)
+
+		try:
+			parser.read(cfg_path)
+		except configparser.Error:
+			print('fail to parse config file %s' % (cfg_path))
+			return
+
+		for title in parser.sections():
+			kind = title.split(' ')[0]
+
+			if kind not in self.__required_options:
+				print('invalid section name "%s"' % (title))
+				return
+
+			options = dict(parser.items(title))
+
+			for option in self.__required_options[kind]:
+				if option not in options:
+					print('missing "%s" in section "%s"' % (option, title))
+					return
+
+			if options.get('disable', 'false').lower() != 'false':
+				continue
+
+			if kind == 'user':
+				self.__add_user(options)
+			else:
+				self.__sections[kind].append(SectionRecord(kind, title, options['name'], options.get('url', ''), options))
+
+		self.__initialized = True
+
+		return
+
+	def __add_user(self, options):
+		user = UserRecord(options['name'], [options['email1'], options.get('email2', '')], options.get('function', ''), options.get('github username', ''))
+
+		self.__users.append(user)
+
+		# the first user of an email or a username wins, like a linear search
+		for email in user.emails:
+			if email != '' and email not in self.__users_by_email:
+				self.__users_by_email[email] = user
+				self.__emails.append(email)
+
+		if user.github_username != '':
+			self.__users_by_github_username.setdefault(user.github_username, user)
+
+		return
+
+	def get_initialized(self):
+		return self.__initialized
+
+	def get_path(self):
+		return self.__cfg_path
+
+	def get_users(self):
+		return self.__users
+
+	def get_user(self, github_username = '', email = ''):
+		if github_username != '' and github_username in self.__users_by_github_username:
+			return self.__users_by_github_username[github_username]
+
+		if email != '' and email in self.__users_by_email:
+			return self.__users_by_email[email]
+
+		return None
+
+	def get_emails(self):
+		# every email of the users once, in the config order
+		return self.__emails
+
+	def get_sections(self, kind):
+		# the enabled sections of a kind, in the config order
+		return self.__sections[kind]
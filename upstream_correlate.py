@@ -0,0 +1,342 @@
+#!/usr/bin/python3
+import math
+import re
+
+from upstream_crawler import BaseCrawler
+from upstream_record import parse_timestamp
+
+# '[PATCH v3 2/5]', '[RFC PATCH]', '[alsa-devel]' ...
+_subject_tags = re.compile(r'^\s*(\[[^\]]*\]\s*)+')
+
+# chromeos kernel prefixes of a change picked from upstream, 'Re:' of a reply
+_subject_prefixes = re.compile(r'^\s*((UPSTREAM|BACKPORT|FROMGIT|FROMLIST|CHROMIUM|Re)\s*:\s*)+', re.I)
+
+_patch_version = re.compile(r'\[[^\]]*\bv(\d+)\b[^\]]*\]', re.I)
+
+def strip_subject(subject):
+	# the subject of the work itself, tags and prefixes stripped
+	subject = _subject_tags.sub('', subject or '')
+
+	return _subject_prefixes.sub('', subject).strip()
+
+def normalize_subject(subject):
+	# stripped subject in lower case with single spaces, the index key
+	return ' '.join(strip_subject(subject).lower().split()).rstrip('.')
+
+def get_patch_version(name):
+	# '[PATCH v3 2/5] ...' is version 3, a patch without one is version 1
+	match = _patch_version.search(name or '')
+	if match == None:
+		return 1
+
+	return int(match.group(1))
+
+def get_trigrams(text):
+	# trigrams of the normalized text, words padded so short words count
+	padded = '  %s ' % (text)
+
+	return set(padded[idx:idx + 3] for idx in range(len(padded) - 2))
+
+class TrigramIndex:
+	# fuzzy subject lookup: an inverted index from (block, period, trigram)
+	# to the subjects holding it. The block (ex. the user) and the period of
+	# the date bound the postings, and only the rarest trigrams of a query
+	# are walked for candidates (prefix filtering): a subject sharing none
+	# of them can't reach the threshold, the candidates are scored exactly
+	def __init__(self, window, threshold):
+		self.__window = window
+		self.__threshold = threshold
+		self.__postings = {}
+		self.__items = []
+
+		return
+
+	def __len__(self):
+		return len(self.__items)
+
+	def add(self, block, text, epoch, value):
+		trigrams = frozenset(get_trigrams(text))
+
+		item = len(self.__items)
+		self.__items.append((trigrams, epoch, value))
+
+		period = epoch // self.__window
+		for trigram in trigrams:
+			self.__postings.setdefault((block, period, trigram), []).append(item)
+
+		return
+
+	def find(self, block, text, epoch):
+		# (score, value) of the candidates within the window of the epoch,
+		# best first, the score is the dice coefficient of the trigrams
+		trigrams = get_trigrams(text)
+		if len(trigrams) == 0:
+			return []
+
+		period = epoch // self.__window
+
+		keys = [(block, near) for near in [period - 1, period, period + 1]]
+		empty = []
+
+		def get_count(trigram):
+			return sum(len(self.__postings.get(key + (trigram,), empty)) for key in keys)
+
+		# a match shares at least threshold * n / (2 - threshold) trigrams,
+		# so it holds one of the n - that + 1 rarest
+		overlap = math.ceil(self.__threshold * len(trigrams) / (2 - self.__threshold))
+		rarest = sorted(trigrams, key = get_count)
+
+		candidates = set()
+		for trigram in rarest[:max(1, len(trigrams) - overlap + 1)]:
+			for key in keys:
+				candidates.update(self.__postings.get(key + (trigram,), empty))
+
+		matches = []
+		for item in candidates:
+			item_trigrams, item_epoch, value = self.__items[item]
+
+			if abs(item_epoch - epoch) > self.__window:
+				continue
+
+			score = 2.0 * len(trigrams & item_trigrams) / (len(trigrams) + len(item_trigrams))
+			if score >= self.__threshold:
+				matches.append((score, value))
+
+		matches.sort(key = lambda match: match[0], reverse = True)
+
+		return matches
+
+class ContributionCorrelator(BaseCrawler):
+	# joins the gerrit changes, git commits and patchwork patches of the same
+	# piece of work in linear time: every row is looked up in a hash index
+	# on the Change-Id and one on (user, normalized subject), rows that
+	# match neither start a new contribution. Patches that still match
+	# nothing are looked up in a trigram index of the commit subjects of the
+	# same user, maintainers often edit a subject when they apply a patch
+	__csv_fields = ['user_name', 'user_function', 'subject', 'change_id', 'stage', 'posted', 'versions', 'patchwork_state', 'gerrit_changes', 'gerrit_status', 'merged', 'upstreamed', 'commit_hash', 'reviewed_by', 'patch_match', 'patch_score', 'sources']
+	__csv_categories = ['user_name', 'user_function', 'stage', 'patchwork_state', 'gerrit_status', 'patch_match', 'sources']
+	__csv_integers = ['versions', 'gerrit_changes']
+	__csv_timestamps = ['posted']
+	__csv_dimensions = ['user_function', 'stage']
+	__csv_measures = []
+	__report_name = 'contributions'
+
+	# the furthest stage reached
+	__stages = ['posted', 'reviewed', 'merged', 'upstreamed']
+
+	def __init__(self, config):
+		self.__contributions = []
+		self.__change_index = {}
+		self.__subject_index = {}
+		self.__commit_index = TrigramIndex(365 * 86400, 0.7)
+		self.__rows = None
+		self.__initialized = False
+
+		# call parent's init
+		super().__init__(config)
+		super().set_summary(self.__csv_dimensions, self.__csv_measures)
+
+		if super().get_initialized() == False:
+			return
+
+		self.__initialized = True
+
+		return
+
+	def set_fuzzy_match(self, threshold, window_days):
+		# minimal dice score of the subject trigrams, and the most days
+		# between a patch and the author date of its commit (git am keeps the
+		# date of the mail), call before adding the git rows
+		self.__commit_index = TrigramIndex(window_days * 86400, threshold)
+
+		return
+
+	def __new_contribution(self, row):
+		contribution = {'user_name': row['user_name'],
+				'user_function': row['user_function'],
+				'subject': '',
+				'change_id': '',
+				'posted': '',
+				'versions': 0,
+				'patchwork_state': '',
+				'gerrit_changes': 0,
+				'gerrit_status': '',
+				'merged': '',
+				'upstreamed': '',
+				'commit_hash': '',
+				'reviewed_by': '',
+				'patch_match': '',
+				'patch_score': '',
+				'sources': [],
+			       }
+
+		self.__contributions.append(contribution)
+
+		return contribution
+
+	def __find(self, row, change_id, subject, patch_date = None):
+		# look up by the Change-Id first, then by the subject of the user,
+		# and index the row under both keys, a patch also tries the fuzzy
+		# index
+		subject_key = (row['user_name'], normalize_subject(subject))
+
+		contribution = None
+		if change_id != '':
+			contribution = self.__change_index.get(change_id)
+
+		if contribution == None and subject_key[1] != '':
+			contribution = self.__subject_index.get(subject_key)
+
+			if contribution != None and patch_date != None and contribution['patch_match'] == '' and contribution['sources'] != ['patchwork']:
+				contribution['patch_match'] = 'subject'
+				contribution['patch_score'] = '1.00'
+
+		if contribution == None and patch_date != None and subject_key[1] != '':
+			# no exact match, try the commits with a similar subject
+			matches = self.__commit_index.find(row['user_name'], subject_key[1], parse_timestamp(patch_date))
+
+			if len(matches) != 0:
+				score, contribution = matches[0]
+
+				if contribution['patch_match'] != 'subject' and (contribution['patch_score'] == '' or score > float(contribution['patch_score'])):
+					contribution['patch_match'] = 'fuzzy'
+					contribution['patch_score'] = '%.2f' % (score)
+
+		if contribution == None:
+			contribution = self.__new_contribution(row)
+
+		if change_id != '':
+			self.__change_index.setdefault(change_id, contribution)
+			if contribution['change_id'] == '':
+				contribution['change_id'] = change_id
+
+		if subject_key[1] != '':
+			self.__subject_index.setdefault(subject_key, contribution)
+
+		return contribution
+
+	def __set_earliest(self, contribution, field, date):
+		if date == None or date == '':
+			return
+
+		if contribution[field] == '' or parse_timestamp(date) < parse_timestamp(contribution[field]):
+			contribution[field] = date
+
+		return
+
+	def __add_source(self, contribution, source):
+		if source not in contribution['sources']:
+			contribution['sources'].append(source)
+
+		return
+
+	def add_git_rows(self, rows):
+		# commits carry both keys, so they go in first
+		for row in rows:
+			contribution = self.__find(row, row['change_id'], row['subject'])
+
+			contribution['subject'] = row['subject']
+			self.__set_earliest(contribution, 'posted', row['author_date'])
+
+			# a commit of linux is upstreamed, one of a downstream or a
+			# maintainer tree is 'accepted', merged until the next window
+			if row['status'] == 'upstreamed':
+				self.__set_earliest(contribution, 'upstreamed', row['committer_date'])
+			else:
+				self.__set_earliest(contribution, 'merged', row['committer_date'])
+
+			if contribution['commit_hash'] == '':
+				contribution['commit_hash'] = row['commit_hash']
+				contribution['reviewed_by'] = row['reviewed_by']
+
+				self.__commit_index.add(row['user_name'], normalize_subject(row['subject']), parse_timestamp(row['author_date']), contribution)
+
+			self.__add_source(contribution, 'git')
+
+		return
+
+	def add_gerrit_rows(self, rows):
+		# one piece of work may be several changes, ex. picked to branches
+		for row in rows:
+			contribution = self.__find(row, row['change_id'], row['subject'])
+
+			if contribution['subject'] == '':
+				contribution['subject'] = strip_subject(row['subject'])
+
+			self.__set_earliest(contribution, 'posted', row['created'])
+
+			contribution['gerrit_changes'] += 1
+
+			if row['status'] == 'MERGED':
+				contribution['gerrit_status'] = 'MERGED'
+				self.__set_earliest(contribution, 'merged', row['submitted'])
+			elif contribution['gerrit_status'] != 'MERGED':
+				contribution['gerrit_status'] = row['status']
+
+			self.__add_source(contribution, 'gerrit')
+
+		return
+
+	def add_patchwork_rows(self, rows):
+		# patches have no Change-Id, every version of a patch is one row
+		for row in rows:
+			contribution = self.__find(row, '', row['name'], row['date'])
+
+			if contribution['subject'] == '':
+				contribution['subject'] = strip_subject(row['name'])
+
+			self.__set_earliest(contribution, 'posted', row['date'])
+
+			version = get_patch_version(row['name'])
+			if version >= contribution['versions']:
+				contribution['versions'] = version
+				contribution['patchwork_state'] = row['state']
+
+			self.__add_source(contribution, 'patchwork')
+
+		return
+
+	def __get_stage(self, contribution):
+		if contribution['upstreamed'] != '':
+			return 'upstreamed'
+
+		if contribution['merged'] != '' or contribution['gerrit_status'] == 'MERGED' or contribution['patchwork_state'] == 'accepted':
+			return 'merged'
+
+		if contribution['versions'] > 1 or contribution['patchwork_state'] not in ['', 'new']:
+			return 'reviewed'
+
+		return 'posted'
+
+	def get_contributions(self):
+		# the lifecycle table, one row per contribution
+		self.__rows = self.create_store(self.__report_name, self.__csv_fields, self.__csv_categories, self.__csv_integers, self.__csv_timestamps, 'posted')
+
+		if self.__initialized == False:
+			return self.__rows
+
+		print('correlate %d contribution(s)' % (len(self.__contributions)))
+
+		for contribution in self.__contributions:
+			row = dict(contribution)
+			row['stage'] = self.__get_stage(contribution)
+			row['sources'] = ','.join(contribution['sources'])
+
+			self.__rows.append(row)
+
+		self.__rows.end_run()
+
+		for stage in self.__stages:
+			print('- %d %s' % (sum(1 for contribution in self.__contributions if self.__get_stage(contribution) == stage), stage))
+
+		self.__rows.sort('posted')
+
+		return self.__rows
+
+	def export_file(self, report_directory, file_format):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_file(report_directory, self.__report_name, self.__csv_fields, 'posted', self.__rows, file_format)
+
+		return ret
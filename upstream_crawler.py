@@ -1,47 +1,55 @@
 #!/usr/bin/python3
-import configparser
 import csv
-import git
-import depot_tools
+import importlib
 import os
-import requests
-import shutil
 import time
 
-from depot_tools.gerrit_util import CreateHttpConn
-from depot_tools.gerrit_util import GerritError
-from depot_tools.gerrit_util import ReadHttpJsonResponse
+from array import array
 
-from openpyxl import Workbook
+from upstream_aggregate import SummaryCube
+from upstream_aggregate import get_period
+from upstream_config import ReportConfig
+from upstream_export import exporters
+from upstream_journal import CrawlJournal
+from upstream_profile import profile
+from upstream_record import RecordStore
+from upstream_spill import SpillWriter
+from upstream_xlsx import XlsxUpdater
+from upstream_xlsx import XlsxWorkbook
+
+# the crawlers live in a module of their own, each one imports its own
+# dependencies: upstream_gerrit (depot_tools), upstream_git (GitPython),
+# upstream_github and upstream_patchwork (requests)
+
+# retries of a transient http error (5xx or 429) of github and patchwork, the
+# sleep time doubles after each try
+HTTP_TRY_LIMIT = 4
+HTTP_SLEEP_TIME = 1.0
 
 class BaseCrawler:
-	def __init__(self, cfg_path):
+	def __init__(self, config):
 		self.__users = []
+		self.__excel_engine = 'native'
+		self.__stream_directory = None
+		self.__journal_directory = None
+		self.__journal = None
+		self.__journal_store = None
+		self.__open_streams = set()
+		self.__summary_dimensions = []
+		self.__summary_measures = []
 		self.__initialized = False
 
-		self.__config = configparser.ConfigParser()
+		# a ReportConfig shared by the crawlers of a run, or the path of a
+		# config file parsed for this crawler alone
+		if isinstance(config, str):
+			config = ReportConfig(config)
 
-		try:
-			self.__config.read(cfg_path)
-		except configparser.Error:
-			print('fail to parse config file %s' % (cfg_path))
-			return
+		self.__config = config
 
-		for key in self.__config:
-			if key.split(' ')[0] not in ['user', 'gerrit', 'git', 'github', 'patchwork', 'DEFAULT']:
-				print('invalid section name "%s"' % (key))
-				return
-
-		for key in self.__config:
-			if key.split(' ')[0] == 'user':
-				if self.__config[key]['disable'].lower() != 'false':
-					continue
+		if config.get_initialized() == False:
+			return
 
-				self.__users.append({'name': self.__config[key]['name'],
-						     'emails': [self.__config[key]['email1'], self.__config[key]['email2']],
-						     'function': self.__config[key]['function'],
-						     'github username': self.__config[key]['github username'],
-						     })
+		self.__users = config.get_users()
 
 		self.__initialized = True
 
@@ -56,686 +64,533 @@ class BaseCrawler:
 	def get_users(self):
 		return self.__users
 
-	def get_user(self, github_username = '', email = ''):
-		if self.__initialized == False:
-			return None
+	def set_excel_engine(self, engine):
+		# 'native': the built-in streaming xlsx writer
+		# 'openpyxl': a write-only openpyxl workbook
+		if engine not in ['native', 'openpyxl']:
+			print('invalid excel engine "%s"' % (engine))
+			return False
 
-		for user in self.__users:
-			if github_username != '' and user['github username'] == github_username:
-				return user
-			if email != '' and email in user['emails']:
-				return user
+		self.__excel_engine = engine
 
-		return None
+		return True
 
-	def export_csv_file(self, report_directory, report_name, csv_fields, rows):
-		if self.__initialized == False:
-			return False
+	def set_stream_directory(self, report_directory):
+		# stream the crawled rows to sorted runs on disk in the report
+		# directory instead of keeping them in memory
+		self.__stream_directory = report_directory
 
-		csv_path = '%s/%s.csv' % (report_directory, report_name)
-		print('export data to %s' % (csv_path))
+		return
 
-		with open(csv_path, 'w', newline = '') as csv_file:
-			csv_writer = csv.DictWriter(csv_file, fieldnames = csv_fields)
-			csv_writer.writeheader()
+	def set_journal_directory(self, report_directory):
+		# checkpoint the crawl into a journal in the report directory, a
+		# crawl in a directory with a journal resumes from it
+		self.__journal_directory = report_directory
 
-			for row in rows:
-				csv_writer.writerow(row)
+		return
 
-		print('- %d row(s) saved' % (len(rows)))
+	def set_summary(self, dimensions, measures = []):
+		# fields counted in the summary beside the user, ex. the function or
+		# the status, and the integer fields summed for each user
+		self.__summary_dimensions = dimensions
+		self.__summary_measures = measures
 
-		return True
+		return
 
-	def export_excel_file(self, report_directory, report_name, csv_fields, date_field, rows):
-		if self.__initialized == False:
-			return False
+	def create_store(self, report_name, csv_fields, categories, integers, timestamps, sort_field):
+		store = RecordStore(csv_fields, categories, integers, timestamps)
 
-		excel_path = '%s/%s.xlsx' % (report_directory, report_name)
-		print('export data to %s' % (excel_path))
+		if self.__stream_directory != None:
+			store.set_spill(SpillWriter(self.__stream_directory, report_name, csv_fields), sort_field)
 
-		book = Workbook()
-		sheet = book.active
+		if self.__journal_directory != None:
+			self.__journal = CrawlJournal(self.__journal_directory, report_name)
+			self.__journal_store = store
+			store.set_journal(self.__journal)
 
-		# add one sheet for counts of each user
-		sheet.title = 'summary'
-		counts = {}
-		for user in self.__users:
-			counts[user['name']] = []
+		return store
 
-		years = []
+	def resume_stream(self, stream, cursor):
+		# a stream starts, ex. a user email on a server: the rows journaled
+		# by an interrupted run go back into the store, returns the cursor
+		# to continue from (None if the stream was finished) and the rows
+		if self.__journal == None:
+			return cursor, []
 
-		for row in rows:
-			year = row[date_field].split('-')[0]
+		state = self.__journal.resume(stream)
+		rows = []
 
-			if year not in years:
-				for user in self.__users:
-					counts[user['name']].append(0)
-				years.append('%s' % (year))
+		if state != None:
+			fields = self.__journal_store.get_fields()
 
-			idx = years.index(year)
+			for values in state['rows']:
+				row = dict(zip(fields, values))
+				self.__journal_store.append(row)
+				rows.append(row)
 
-			counts[row['user_name']][idx] += 1
+			if state['done'] == True:
+				print('- %d row(s) from the journal' % (len(rows)))
+				cursor = None
+			else:
+				print('- %d row(s) from the journal, continue from %s' % (len(rows), state['cursor']))
+				cursor = state['cursor']
 
-		now = time.localtime()
-		timestamp = time.strftime('%Y-%m%d', now)
+		# open until end_stream, a stream stopped by an error stays open
+		if cursor != None:
+			self.__open_streams.add(stream)
 
-		sheet.append(['summary of %s (%s)' % (report_name, timestamp)])
+		self.__journal.begin()
 
-		data = ['']
-		for year in years:
-			data.append(year)
-		sheet.append(data)
+		return cursor, rows
 
-		for user in self.__users:
-			data = [user['name']]
-			for count in counts[user['name']]:
-				data.append('%s' % (count))
-			sheet.append(data)
+	def checkpoint(self, stream, cursor, flush = False):
+		# the rows appended so far are all before the cursor
+		if self.__journal != None:
+			self.__journal.checkpoint(stream, cursor, flush = flush)
 
-		# add one sheet for all data
-		sheet = book.create_sheet('all')
-		sheet.append(csv_fields)
+		return
 
-		for row in rows:
-			data = []
-			for field in csv_fields:
-				data.append(row[field])
+	def end_stream(self, stream):
+		if self.__journal != None:
+			self.__journal.checkpoint(stream, None, done = True)
 
-			sheet.append(data)
+		self.__open_streams.discard(stream)
 
-		print('- sheet "%s" added' % (sheet.title))
+		return
 
-		# add one sheet for each year
-		year = ''
-		for row in rows:
-			this_year = row[date_field].split('-')[0]
-			if year != this_year:
-				if year != '':
-					print('- sheet "%s" added' % (sheet.title))
+	def get_journal_complete(self):
+		# every stream of the crawl reached its end, nothing to resume
+		return len(self.__open_streams) == 0
 
-				year = this_year
+	def close_journal(self):
+		if self.__journal != None:
+			self.__journal.close()
 
-				# create new sheet
-				sheet = book.create_sheet(year)
-				sheet.append(csv_fields)
+		return
 
-			data = []
-			for field in csv_fields:
-				data.append(row[field])
+	def __create_workbook(self, shared_columns = []):
+		if self.__excel_engine == 'openpyxl':
+			# imported when chosen, the native writer is the default
+			from openpyxl import Workbook
 
-			sheet.append(data)
+			return Workbook(write_only = True)
 
-		if year != '':
-			print('- sheet "%s" added' % (sheet.title))
+		# only the strings of these columns are deduplicated
+		return XlsxWorkbook(shared_columns)
 
-		# add one sheet for each user
-		for user in self.__users:
-			# create new sheet
-			sheet = book.create_sheet(user['name'])
-			sheet.append(csv_fields)
+	def http_get(self, url, auth = None):
+		# the last response is returned when every try failed
+		# imported by the first request, only github and patchwork need it
+		import requests
 
-			for row in rows:
-				if row['user_name'] != user['name']:
-					continue
+		sleep_time = HTTP_SLEEP_TIME
 
-				data = []
-				for field in csv_fields:
-					data.append(row[field])
+		with profile.span('http'):
+			for idx in range(HTTP_TRY_LIMIT):
+				r = requests.get(url = url, auth = auth)
 
-				sheet.append(data)
+				if r.status_code < 500 and r.status_code != 429:
+					break
 
-			print('- sheet "%s" added' % (sheet.title))
+				if idx < HTTP_TRY_LIMIT - 1:
+					time.sleep(sleep_time)
+					sleep_time *= 2
 
-		book.save(excel_path)
+		return r
 
-		return True
+	def get_user(self, github_username = '', email = ''):
+		if self.__initialized == False:
+			return None
 
-class GerritCrawler(BaseCrawler):
-	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'branch', 'change_id', 'subject', 'status', 'created', 'updated', 'submitted', 'insertions', 'deletions', 'owner']
-	__report_name = 'gerrit-changes'
+		return self.__config.get_user(github_username, email)
 
-	def __init__(self, cfg_path):
-		self.__servers = []
-		self.__initialized = False
+	def export_csv_file(self, report_directory, report_name, csv_fields, rows):
+		if self.__initialized == False:
+			return False
 
-		# call parent's init
-		super().__init__(cfg_path)
+		csv_path = '%s/%s.csv' % (report_directory, report_name)
+		print('export data to %s' % (csv_path))
 
-		if super().get_initialized() == False:
-			return
+		if rows.get_spill() != None:
+			# merge the sorted runs on disk, unless another export did, a
+			# csv left by an interrupted run is written again
+			if rows.get_spill().get_csv_path() != csv_path:
+				rows.get_spill().finish(csv_path)
+		else:
+			with open(csv_path, 'w', newline = '') as csv_file:
+				csv_writer = csv.writer(csv_file)
+				csv_writer.writerow(csv_fields)
+				csv_writer.writerows(rows.iter_rows(csv_fields))
 
-		config = super().get_config()
+		print('- %d row(s) saved' % (len(rows)))
 
-		for key in config:
-			if key.split(' ')[0] == 'gerrit':
-				if config[key]['disable'].lower() != 'false':
-					continue
+		return True
 
-				self.__servers.append({'name': config[key]['name'],
-						       'url': config[key]['url'],
-						      })
+	def __append_summary(self, sheet, report_name, years, counts, cube = None):
+		now = time.localtime()
+		timestamp = time.strftime('%Y-%m%d', now)
 
-		self.__initialized = True
+		sheet.append(['summary of %s (%s)' % (report_name, timestamp)])
 
-		return
+		data = ['']
+		for year in years:
+			data.append(year)
+		sheet.append(data)
+
+		for user in self.__users:
+			data = [user.name]
+			for count in counts[user.name]:
+				data.append('%s' % (count))
+			sheet.append(data)
 
-	def get_changes(self):
-		# gerrit REST API doc:
-		# https://gerrit-review.googlesource.com/Documentation/rest-api.html
+		if cube == None:
+			return
 
-		def useDateTime(element):
-			# 'created': '2021-11-02 07:16:18.000000000'
-			return element['created']
+		# the other dimensions and the measures of the cube, per year
+		tables = []
+		for dimension in self.__summary_dimensions:
+			tables.append(('count by %s' % (dimension), dimension, None))
+		for measure in self.__summary_measures:
+			tables.append(('%s of each user' % (measure), 'user_name', measure))
 
-		self.__changes = []
+		for title, dimension, measure in tables:
+			labels = None
+			if dimension == 'user_name':
+				labels = [user.name for user in self.__users]
 
-		if self.__initialized == False:
-			return self.__changes
-
-		for server in self.__servers:
-			print('query changes from gerrit server "%s"' % (server['name']))
-
-			for user in self.get_users():
-				for email in user['emails']:
-					print('query changes for "%s <%s>"' % (user['name'], email))
-
-					start = 0
-
-					while True:
-						more_changes = False
-
-						try:
-							changes = ReadHttpJsonResponse(CreateHttpConn(server['url'], 'changes/?q=owner:' + email + '&start=' + str(start)))
-						except GerritError as error:
-							print('- gerrit error: %s' % (error.message))
-							break
-
-						print('- %d change(s) found' % (len(changes)))
-
-						for change in changes:
-							# optional field, and not every merged change has this field set
-							if 'submitted' not in change.keys():
-								change['submitted'] = ''
-
-							# ChangeInfo
-							# https://gerrit-review.googlesource.com/Documentation/rest-api-changes.html#change-info
-							self.__changes.append({'user_name': user['name'],
-										   'user_function': user['function'],
-										   'repo_name': server['name'],
-										   'repo_url': server['url'],
-										   'project': change['project'],
-										   'branch': change['branch'],
-										   'change_id': change['change_id'],
-										   'subject': change['subject'],
-										   'status': change['status'],
-										   'created': change['created'],
-										   'updated': change['updated'],
-										   'submitted': change['submitted'],
-										   'insertions': change['insertions'],
-										   'deletions': change['deletions'],
-										   'owner': email,
-										  })
-
-							if '_more_changes' in change.keys() and change['_more_changes'] == True:
-								start += len(changes)
-								more_changes = True
-
-						if more_changes == False:
-							break
-
-
-		# sort the changes by date
-		self.__changes.sort(key = useDateTime)
-
-		return self.__changes
-
-	def export_csv_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+			labels, _, table = cube.get_table(dimension, 'year', measure, labels, years)
 
-		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__changes)
+			sheet.append([])
+			sheet.append([title])
+			sheet.append([''] + years)
 
-		return ret
+			for label, values in zip(labels, table):
+				sheet.append([label] + ['%s' % (value) for value in values])
 
-	def export_excel_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+		# counts of each user per quarter
+		quarters = cube.get_labels('quarter')
+		users, _, table = cube.get_table('user_name', 'quarter', None, [user.name for user in self.__users], quarters)
 
-		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'created', self.__changes)
+		sheet.append([])
+		sheet.append(['count by quarter'])
+		sheet.append([''] + quarters)
 
-		return ret
+		for user, values in zip(users, table):
+			sheet.append([user] + ['%s' % (value) for value in values])
 
-class GitCrawler(BaseCrawler):
-	__csv_fields = ['user_name', 'user_function', 'commit_hash', 'author_email', 'author_date', 'committer_email', 'committer_date', 'subject', 'status']
-	__report_name = 'git-commits'
+		return
 
-	def __init__(self, cfg_path):
-		self.__repos = []
-		self.__initialized = False
+	def export_summary_file(self, report_directory, report_name, years, counts):
+		# counts of each user, one count per year
+		if self.__initialized == False:
+			return False
 
-		# call parent's init
-		super().__init__(cfg_path)
+		excel_path = '%s/%s-summary.xlsx' % (report_directory, report_name)
+		print('export data to %s' % (excel_path))
 
-		if super().get_initialized() == False:
-			return
+		book = self.__create_workbook()
 
-		config = super().get_config()
+		sheet = book.create_sheet('summary')
+		self.__append_summary(sheet, report_name, years, counts)
 
-		for key in config:
-			if key.split(' ')[0] == 'git':
-				if config[key]['disable'].lower() != 'false':
-					continue
+		print('- sheet "%s" added' % (sheet.title))
 
-				self.__repos.append({'name': config[key]['name'],
-						     'url': config[key]['url'],
-						     'branch': config[key]['branch'],
-						    })
+		book.save(excel_path)
 
-		# prepare the parameter for git log command
-		self.__log_param = []
+		return True
 
-		for user in self.get_users():
-			for email in user['emails']:
-				self.__log_param.append('--author=%s' % (email))
+	def __create_cube(self):
+		return SummaryCube(['user_name', 'year', 'quarter'] + self.__summary_dimensions, self.__summary_measures)
 
-		# %H: commit hash
-		# %ae: author email
-		# %aI: author date, strict ISO 8601 format
-		# %ce: committer email
-		# %cI: committer date, strict ISO 8601 format
-		# %s: subject
-		self.__log_param.append('--pretty=format:%H%x09%ae%x09%aI%x09%ce%x09%cI%x09%s')
-		self.__log_param.append('--reverse')
+	def __count_users(self, cube):
+		# counts of each user, one count per year
+		years = cube.get_labels('year')
+		users, _, table = cube.get_table('user_name', 'year', None, [user.name for user in self.__users], years)
 
-		# create the root directory for repos
-		self.__repo_root = os.path.abspath('./repo')
+		return years, dict(zip(users, table))
 
-		if os.path.isdir(self.__repo_root) == False:
-			os.mkdir(self.__repo_root)
+	def __bucket_rows(self, report_name, csv_fields, date_field, rows):
+		# aggregate the rows and bucket the row indices by year and by user
+		cube = self.__create_cube()
+		cube.add_store(rows, date_field, report_name)
 
-		self.__initialized = True
+		year_rows = {}
+		for idx, date in enumerate(rows.get_column(date_field)):
+			year = get_period(date, 'year')
 
-		return
+			if year not in year_rows:
+				year_rows[year] = array('I')
 
-	def __open_repo(self, repo):
-		repo_path = os.path.abspath(self.__repo_root + '/' + repo['name'])
+			year_rows[year].append(idx)
 
-		if os.path.isdir(repo_path) == False:
-			# repo directory not exist
-			print('- clone git repo from %s' % (repo['url']))
-			repository = git.Repo.clone_from(repo['url'], repo_path)
-		else:
-			print('- open git repo at %s' % (repo_path))
-			repository = git.Repo(repo_path)
+		user_rows = rows.group_by('user_name')
 
-		if repository.__class__ is git.Repo:
-			# check if repo is healthy
-			if repository.is_dirty(untracked_files = True):
-				print('- warning, repo is dirty')
+		sheets = [('all', rows.iter_rows(csv_fields))]
+		sheets += [(year, rows.iter_rows(csv_fields, year_rows[year])) for year in cube.get_labels('year')]
+		sheets += [(user.name, rows.iter_rows(csv_fields, user_rows.get(user.name, []))) for user in self.__users]
 
-			if repository.remotes.origin.exists() == False:
-				print('- warning, remote origin does not exist')
+		return cube, sheets
 
-			return repository
+	def __read_csv_file(self, csv_path, csv_fields, rows, keep = None):
+		# rows of an exported csv file, integer fields converted back and
+		# the empty cells of a field crawled as None are None again
+		integers = [idx for idx, field in enumerate(csv_fields) if rows.get_kind(field) == 'integer']
+		nullables = [idx for idx, field in enumerate(csv_fields) if rows.get_nullable(field) == True]
 
-		# repo may be corrupted...
-		print('- repo corrupted, delete entire repo')
-		try:
-			shutil.rmtree(repo_path)
-		except OSError as error:
-			pass
+		with open(csv_path, newline = '') as csv_file:
+			csv_reader = csv.reader(csv_file)
+			next(csv_reader)
 
-		return None
+			for values in csv_reader:
+				if keep != None and keep(values) == False:
+					continue
 
-	def get_commits(self):
-		def useDateTime(element):
-			# 'created': '2021-08-10T11:47:55+02:00'
-			return element['committer_date']
+				for idx in integers:
+					if values[idx] != '':
+						values[idx] = int(values[idx])
 
-		self.__commits = []
+				for idx in nullables:
+					if values[idx] == '':
+						values[idx] = None
 
-		if self.__initialized == False:
-			return self.__commits
+				yield values
 
-		hash_cache = []
+		return
 
-		for repo in self.__repos:
-			print('query commits from git repo "%s"' % (repo['name']))
+	def __bucket_csv_file(self, report_directory, report_name, csv_fields, date_field, rows):
+		# streamed rows are not in memory, each sheet is another pass over
+		# the merged csv file
+		csv_path = '%s/%s.csv' % (report_directory, report_name)
 
-			repository = self.__open_repo(repo)
+		if rows.get_spill().get_csv_path() != csv_path:
+			BaseCrawler.export_csv_file(self, report_directory, report_name, csv_fields, rows)
 
-			if repository == None:
-				# a second shot
-				repository = self.__open_repo(repo)
+		date_idx = csv_fields.index(date_field)
+		user_idx = csv_fields.index('user_name')
 
-			if repository == None:
-				continue
+		cube = self.__create_cube()
+		cube.add_rows(csv_fields, date_field, self.__read_csv_file(csv_path, csv_fields, rows), report_name)
 
-			# git fetch origin
-			#repository.remotes.origin.fetch('+refs/heads/*:refs/remotes/origin/*')
-			repository.remotes.origin.fetch()
+		sheets = [('all', self.__read_csv_file(csv_path, csv_fields, rows))]
 
-			# git checkout
-			repository.git.checkout(repo['branch'])
+		for year in cube.get_labels('year'):
+			sheets.append((year, self.__read_csv_file(csv_path, csv_fields, rows, lambda values, year = year: get_period(values[date_idx], 'year') == year)))
 
-			# git log
-			log = repository.git.log(self.__log_param)
+		for user in self.__users:
+			sheets.append((user.name, self.__read_csv_file(csv_path, csv_fields, rows, lambda values, name = user.name: values[user_idx] == name)))
 
-			# split the log into lines
-			commits = log.splitlines()
+		return cube, sheets
 
-			print('- %d commit(s) found' % (len(commits)))
+	def get_report_rows(self, report_directory, report_name, csv_fields, rows):
+		# rows as dicts, streamed rows are read back from the merged csv
+		if rows.get_spill() == None:
+			yield from rows
+			return
 
-			for commit in commits:
-				item = commit.split('\t')
-				if len(item) != 6:
-					continue
+		csv_path = '%s/%s.csv' % (report_directory, report_name)
 
-				# already found in other repo
-				commit_hash = item[0]
+		if rows.get_spill().get_csv_path() != csv_path:
+			BaseCrawler.export_csv_file(self, report_directory, report_name, csv_fields, rows)
 
-				if commit_hash in hash_cache:
-					continue
+		for values in self.__read_csv_file(csv_path, csv_fields, rows):
+			yield dict(zip(csv_fields, values))
 
-				hash_cache.append(commit_hash)
-
-				author_email = item[1]
-				author_date = item[2]
-				committer_email = item[3]
-				committer_date = item[4]
-				subject = item[5]
-				if repo['name'] == 'linux':
-					status = 'upstreamed'
-				else:
-					status = 'accepted' # waiting next merge window
-
-				user = self.get_user(email = author_email)
-
-				if user == None:
-					# should not happen
-					user['name'] = 'John Doe'
-					user['function'] = 'Dead man'
-
-				self.__commits.append({'user_name': user['name'],
-						       'user_function': user['function'],
-						       'commit_hash': commit_hash,
-						       'author_email': author_email,
-						       'author_date': author_date,
-						       'committer_email': committer_email,
-						       'committer_date': committer_date,
-						       'subject': subject,
-						       'status': status,
-						      })
-
-		# sort the commits by date
-		self.__commits.sort(key = useDateTime)
-
-		return self.__commits
-
-	def export_csv_file(self, report_directory):
+		return
+
+	def export_file(self, report_directory, report_name, csv_fields, date_field, rows, file_format):
+		# 'csv', 'xlsx' or one of the exporters, ex. 'jsonl' or 'parquet'
 		if self.__initialized == False:
 			return False
 
-		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__commits)
+		if file_format == 'csv':
+			return BaseCrawler.export_csv_file(self, report_directory, report_name, csv_fields, rows)
 
-		return ret
+		if file_format == 'xlsx':
+			return BaseCrawler.export_excel_file(self, report_directory, report_name, csv_fields, date_field, rows)
 
-	def export_excel_file(self, report_directory):
-		if self.__initialized == False:
+		if file_format not in exporters:
+			print('invalid file format "%s"' % (file_format))
 			return False
 
-		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'committer_date', self.__commits)
+		path = '%s/%s.%s' % (report_directory, report_name, file_format)
+		print('export data to %s' % (path))
 
-		return ret
+		if rows.get_spill() != None:
+			# streamed rows are read back from the merged csv file
+			csv_path = '%s/%s.csv' % (report_directory, report_name)
 
-class GithubCrawler(BaseCrawler):
-	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'number', 'state', 'title', 'user', 'created_at', 'updated_at', 'closed_at', 'merged_at', 'head', 'base', 'commits', 'additions', 'deletions', 'changed_files']
-	__report_name = 'github-pulls'
+			if rows.get_spill().get_csv_path() != csv_path:
+				BaseCrawler.export_csv_file(self, report_directory, report_name, csv_fields, rows)
 
-	def __init__(self, cfg_path, auth):
-		self.__repos = []
-		self.__initialized = False
+			values = self.__read_csv_file(csv_path, csv_fields, rows)
+		else:
+			values = rows.iter_rows(csv_fields)
 
-		# call parent's init
-		super().__init__(cfg_path)
+		kinds = {}
+		for field in csv_fields:
+			kinds[field] = rows.get_kind(field)
 
-		if super().get_initialized() == False:
-			return
+		if exporters[file_format](path, csv_fields, values, kinds) == False:
+			return False
 
-		config = super().get_config()
+		print('- %d row(s) saved' % (len(rows)))
 
-		for key in config:
-			if key.split(' ')[0] == 'github':
-				if config[key]['disable'].lower() != 'false':
-					continue
+		return True
 
-				self.__repos.append({'name': config[key]['name'],
-						     'owner/repo': config[key]['owner/repo'],
-						    })
+	def export_excel_file(self, report_directory, report_name, csv_fields, date_field, rows):
+		if self.__initialized == False:
+			return False
 
-		# save the github (username, token) pair
-		self.__auth = auth
+		excel_path = '%s/%s.xlsx' % (report_directory, report_name)
+		print('export data to %s' % (excel_path))
 
-		self.__initialized = True
+		if rows.get_spill() == None:
+			cube, sheets = self.__bucket_rows(report_name, csv_fields, date_field, rows)
+		else:
+			cube, sheets = self.__bucket_csv_file(report_directory, report_name, csv_fields, date_field, rows)
 
-		return
+		years, counts = self.__count_users(cube)
 
-	def get_pulls(self):
-		# github REST API doc:
-		# https://docs.github.com/en/rest
+		# both engines stream every sheet to disk as it is appended, the
+		# categories of the rows are shared strings
+		book = self.__create_workbook([idx for idx, field in enumerate(csv_fields) if rows.get_kind(field) == 'category'])
 
-		def useDateTime(element):
-			# 'created_at': '2019-06-11T09:10:12Z'
-			return element['created_at']
+		# add one sheet for counts of each user
+		sheet = book.create_sheet('summary')
 
-		self.__pulls = []
+		self.__append_summary(sheet, report_name, years, counts, cube)
 
-		if self.__initialized == False:
-			return self.__pulls
+		# add one sheet for all data, one sheet for each year and one sheet
+		# for each user
+		for title, sheet_rows in sheets:
+			sheet = book.create_sheet(title)
+			sheet.append(csv_fields)
 
-		# there is no filter for submitter
-		usernames = []
-		for user in self.get_users():
-			usernames.append(user['github username'])
+			for values in sheet_rows:
+				sheet.append(values)
 
-		for repo in self.__repos:
-			print('query pulls from github repo "%s"' % (repo['name']))
+			print('- sheet "%s" added' % (sheet.title))
 
-			found = checked = 0
+		book.save(excel_path)
 
-			# get the page one result
-			url = 'https://api.github.com/repos/%s/pulls?state=all&per_page=100&direction=asc' % (repo['owner/repo'])
+		return True
 
-			while True:
-				try:
-					r = requests.get(url = url, auth = self.__auth)
-				except requests.exceptions.RequestException as error:
-					print('- github error: %s' % (error.message))
-					break
+	def update_excel_file(self, report_directory, previous_directory, report_name, csv_fields, date_field, key_fields, rows):
+		# append the rows not in the previous report to a copy of its excel
+		# file instead of writing every sheet again, a row is identified by
+		# the key fields and the previous rows come from its csv file. A row
+		# of the previous report with other values now exports all data
+		if self.__initialized == False:
+			return False
 
-				pulls = r.json()
-
-				invalid_pulls = False
-
-				for pull in pulls:
-					if type(pull) is not dict:
-						print('- fail to get pulls from repo')
-						invalid_pulls = True
-						break
-
-					if pull['user']['login'] not in usernames:
-						continue
-
-					# one valid pull is found but don't know who's the submitter
-					found += 1
-					user = self.get_user(github_username = pull['user']['login'])
-
-					if user == None:
-						# should not happen
-						user['name'] = 'John Doe'
-						user['function'] = 'Dead man'
-
-					detail = requests.get(url = pull['url'], auth = self.__auth).json()
-
-					# check the response of 'GET /repos/{owner}/{repo}/pulls'
-					# https://docs.github.com/en/rest/reference/pulls
-					self.__pulls.append({'user_name': user['name'],
-							     'user_function': user['function'],
-							     'repo_name': repo['name'],
-							     'repo_url': 'github.com/%s' % (repo['owner/repo']),
-							     'number': pull['number'],
-							     'state': pull['state'],
-							     'title': pull['title'],
-							     'user': pull['user']['login'],
-							     'created_at': pull['created_at'],
-							     'updated_at': pull['updated_at'],
-							     'closed_at': pull['closed_at'],
-							     'merged_at': pull['merged_at'],
-							     'head': pull['head']['label'],
-							     'base': pull['base']['label'],
-							     'commits': detail['commits'],
-							     'additions': detail['additions'],
-							     'deletions': detail['deletions'],
-							     'changed_files': detail['changed_files'],
-							    })
-
-				if invalid_pulls != False:
-					# try next repo
-					break
+		previous_excel_path = '%s/%s.xlsx' % (previous_directory, report_name)
+		previous_csv_path = '%s/%s.csv' % (previous_directory, report_name)
 
-				checked += len(pulls)
+		if os.path.isfile(previous_excel_path) == False or os.path.isfile(previous_csv_path) == False:
+			print('- no previous report in %s, export all data' % (previous_directory))
+			return BaseCrawler.export_excel_file(self, report_directory, report_name, csv_fields, date_field, rows)
 
-				print('- %d pull(s) found / total %d pull(s) checked' % (found, checked))
+		excel_path = '%s/%s.xlsx' % (report_directory, report_name)
+		print('update data from %s to %s' % (previous_excel_path, excel_path))
 
-				# read url to next page
-				links = r.links
-				if 'next' in links.keys():
-					url = links['next']['url']
-				else:
-					break
+		key_indices = [csv_fields.index(field) for field in key_fields]
 
-		# sort the pulls by date
-		self.__pulls.sort(key = useDateTime)
+		def get_key(values):
+			# compare as text, None is saved as an empty cell
+			return tuple('' if values[idx] == None else str(values[idx]) for idx in key_indices)
 
-		return self.__pulls
+		def get_digest(values):
+			return hash(tuple('' if value == None else str(value) for value in values))
 
-	def export_csv_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+		# key -> digest of the values of each previous row, a row changed
+		# since, ex. a change merged or a pull closed, has another digest
+		with open(previous_csv_path, newline = '') as csv_file:
+			csv_reader = csv.reader(csv_file)
+			next(csv_reader)
 
-		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__pulls)
+			previous_rows = dict((get_key(values), get_digest(values)) for values in csv_reader)
 
-		return ret
+		# the summary is counted over all rows again, it's small
+		if rows.get_spill() == None:
+			cube, _ = self.__bucket_rows(report_name, csv_fields, date_field, rows)
+			values = rows.iter_rows(csv_fields)
+		else:
+			cube, _ = self.__bucket_csv_file(report_directory, report_name, csv_fields, date_field, rows)
+			values = self.__read_csv_file('%s/%s.csv' % (report_directory, report_name), csv_fields, rows)
 
-	def export_excel_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+		new_rows = []
+		changed = 0
 
-		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'created_at', self.__pulls)
+		for row in values:
+			digest = previous_rows.get(get_key(row))
 
-		return ret
+			if digest == None:
+				new_rows.append(row)
+			elif digest != get_digest(row):
+				changed += 1
 
-class PatchworkCrawler(BaseCrawler):
-	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'date', 'name', 'state', 'submitter']
-	__report_name = 'patchwork-patches'
+		if changed != 0:
+			# the sheets would keep the previous values of these rows while
+			# the summary counts the current ones
+			print('- %d row(s) changed since the previous report, export all data' % (changed))
+			return BaseCrawler.export_excel_file(self, report_directory, report_name, csv_fields, date_field, rows)
 
-	def __init__(self, cfg_path):
-		self.__servers = []
-		self.__initialized = False
+		book = XlsxUpdater(previous_excel_path)
 
-		# call parent's init
-		super().__init__(cfg_path)
+		years, counts = self.__count_users(cube)
 
-		if super().get_initialized() == False:
-			return
+		summary = []
+		self.__append_summary(summary, report_name, years, counts, cube)
+		book.replace_rows(book.get_title('summary'), summary)
 
-		config = super().get_config()
+		date_idx = csv_fields.index(date_field)
+		user_idx = csv_fields.index('user_name')
 
-		for key in config:
-			if key.split(' ')[0] == 'patchwork':
-				if config[key]['disable'].lower() != 'false':
-					continue
+		# a new year sheet goes behind the last year sheet, a new user sheet
+		# goes to the end
+		last_year = 'all'
+		for title in book.get_titles():
+			if title.isdigit() == True:
+				last_year = title
 
-				self.__servers.append({'name': config[key]['name'],
-						       'url': config[key]['url'],
-						      })
+		sheets = [('all', new_rows, None)]
 
-		self.__initialized = True
+		for year in sorted(set(get_period(row[date_idx], 'year') for row in new_rows)):
+			sheets.append((year, [row for row in new_rows if get_period(row[date_idx], 'year') == year], last_year))
 
-		return
+			if year not in book.get_titles():
+				last_year = year
 
-	def get_patches(self):
-		# patchwork REST API doc:
-		# https://patchwork.readthedocs.io/en/latest/api/rest/
+		for user in self.__users:
+			sheets.append((user.name, [row for row in new_rows if row[user_idx] == user.name], None))
 
-		def useDateTime(element):
-			# 'date': '2018-04-24T11:15:52'
-			return element['date']
+		for title, sheet_rows, after in sheets:
+			# the sheet title excel accepts, ex. a long user name is cut
+			title = book.get_title(title)
 
-		self.__patches = []
+			if title not in book.get_titles():
+				sheet_rows = [csv_fields] + sheet_rows
+				print('- sheet "%s" added' % (title))
+			elif len(sheet_rows) == 0:
+				continue
+			else:
+				print('- %d row(s) appended to sheet "%s"' % (len(sheet_rows), title))
 
-		if self.__initialized == False:
-			return self.__patches
-
-		for server in self.__servers:
-			print('query patches from patchwork server "%s"' % (server['name']))
-
-			for user in self.get_users():
-				for email in user['emails']:
-					print('query patches for "%s <%s>"' % (user['name'], email))
-
-					# get the page one result
-					url = 'https://%s/api/1.2/patches?submitter=%s' % (server['url'], email)
-
-					while True:
-						try:
-							r = requests.get(url = url)
-						except requests.exceptions.RequestException as error:
-							print('- patchwork error: %s' % (error.message))
-							break
-
-						patches = r.json()
-
-						print('- %d patche(s) found' % (len(patches)))
-
-						for patch in patches:
-							# check the response of 'GET /api/1.2/patches/'
-							# https://patchwork.readthedocs.io/en/latest/api/rest/schemas/v1.2/
-							self.__patches.append({'user_name': user['name'],
-									       'user_function': user['function'],
-									       'repo_name': server['name'],
-									       'repo_url': server['url'],
-									       'project': patch['project']['name'],
-									       'date': patch['date'],
-									       'name': patch['name'],
-									       'state': patch['state'],
-									       'submitter': email,
-									      })
-
-						# read url to next page
-						links = r.links
-						if 'next' in links.keys():
-							url = links['next']['url']
-						else:
-							break
-
-		# sort the patches by date
-		self.__patches.sort(key = useDateTime)
-
-		return self.__patches
-
-	def export_csv_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+			book.append_rows(title, sheet_rows, after)
 
-		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__patches)
+		book.save(excel_path)
 
-		return ret
+		return True
 
-	def export_excel_file(self, report_directory):
-		if self.__initialized == False:
-			return False
+# the crawlers used to be defined here, import them on first use
+crawler_modules = {'GerritCrawler': 'upstream_gerrit',
+		   'GitCrawler': 'upstream_git',
+		   'GithubCrawler': 'upstream_github',
+		   'PatchworkCrawler': 'upstream_patchwork',
+		  }
 
-		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'date', self.__patches)
+def __getattr__(name):
+	if name not in crawler_modules:
+		raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
-		return ret
+	return getattr(importlib.import_module(crawler_modules[name]), name)
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+import csv
+import gzip
+import io
+import json
+
+# exporters beside the csv and xlsx files of BaseCrawler, each one takes the
+# file path, the fields, an iterator of value lists and the kind of each
+# field ('category', 'integer' or 'text')
+
+def get_texts(fields, kinds):
+	# the fields written as strings, a text field may hold integers of a
+	# field RecordStore turned into text, the csv read back holds strings
+	return [idx for idx, field in enumerate(fields) if kinds[field] != 'integer']
+
+def export_jsonl_file(path, fields, rows, kinds):
+	# one json object per line
+	texts = get_texts(fields, kinds)
+
+	with open(path, 'w', encoding = 'utf-8') as jsonl_file:
+		for values in rows:
+			for idx in texts:
+				if values[idx].__class__ is not str and values[idx] != None:
+					values[idx] = str(values[idx])
+
+			jsonl_file.write(json.dumps(dict(zip(fields, values)), ensure_ascii = False))
+			jsonl_file.write('\n')
+
+	return True
+
+def write_csv(text_file, fields, rows):
+	csv_writer = csv.writer(text_file)
+	csv_writer.writerow(fields)
+	csv_writer.writerows(rows)
+
+	return
+
+def export_gzip_file(path, fields, rows, kinds):
+	with gzip.open(path, 'wt', newline = '', encoding = 'utf-8') as csv_file:
+		write_csv(csv_file, fields, rows)
+
+	return True
+
+def export_zstd_file(path, fields, rows, kinds):
+	try:
+		import zstandard
+	except ImportError:
+		print('- zstandard is not installed, try "pip install zstandard"')
+		return False
+
+	with open(path, 'wb') as zstd_file:
+		# closing the text wrapper ends the zstd frame
+		stream = zstandard.ZstdCompressor().stream_writer(zstd_file)
+
+		with io.TextIOWrapper(stream, newline = '', encoding = 'utf-8') as csv_file:
+			write_csv(csv_file, fields, rows)
+
+	return True
+
+def export_parquet_file(path, fields, rows, kinds):
+	try:
+		import pyarrow
+		import pyarrow.parquet
+	except ImportError:
+		print('- pyarrow is not installed, try "pip install pyarrow"')
+		return False
+
+	# categories become dictionary encoded columns
+	types = []
+	for field in fields:
+		if kinds[field] == 'integer':
+			types.append(pyarrow.int64())
+		elif kinds[field] == 'category':
+			types.append(pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+		else:
+			types.append(pyarrow.string())
+
+	schema = pyarrow.schema(list(zip(fields, types)))
+
+	def write_group(writer, columns):
+		arrays = []
+		for column, field_type in zip(columns, types):
+			if pyarrow.types.is_dictionary(field_type):
+				arrays.append(pyarrow.array(column, pyarrow.string()).dictionary_encode())
+			else:
+				arrays.append(pyarrow.array(column, field_type))
+
+		writer.write_table(pyarrow.Table.from_arrays(arrays, schema = schema))
+
+		return
+
+	# one row group per block of rows keeps the memory bounded
+	with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+		columns = [[] for _ in fields]
+
+		texts = get_texts(fields, kinds)
+
+		for values in rows:
+			for idx in texts:
+				if values[idx].__class__ is not str and values[idx] != None:
+					values[idx] = str(values[idx])
+
+			for column, value in zip(columns, values):
+				column.append(value)
+
+			if len(columns[0]) >= 65536:
+				write_group(writer, columns)
+				columns = [[] for _ in fields]
+
+		if len(columns[0]) != 0:
+			write_group(writer, columns)
+
+	return True
+
+# format: the extension and the exporter
+exporters = {'jsonl': export_jsonl_file,
+	     'csv.gz': export_gzip_file,
+	     'csv.zst': export_zstd_file,
+	     'parquet': export_parquet_file,
+	    }
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+import depot_tools
+
+from upstream_crawler import BaseCrawler
+from upstream_profile import profile
+
+from depot_tools import gerrit_util
+from depot_tools.gerrit_util import CreateHttpConn
+from depot_tools.gerrit_util import GerritError
+from depot_tools.gerrit_util import ReadHttpJsonResponse
+
+class GerritCrawler(BaseCrawler):
+	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'branch', 'change_id', 'subject', 'status', 'created', 'updated', 'submitted', 'insertions', 'deletions', 'owner']
+	__csv_categories = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'branch', 'status', 'owner']
+	__csv_integers = ['insertions', 'deletions']
+	__csv_timestamps = ['created', 'updated']
+	__csv_keys = ['repo_url', 'project', 'branch', 'change_id']
+	__csv_dimensions = ['user_function', 'status', 'repo_name']
+	__csv_measures = ['insertions', 'deletions']
+	__report_name = 'gerrit-changes'
+
+	@classmethod
+	def get_schema(cls):
+		# fields of the rows and how they are stored and summarized
+		return {'fields': cls.__csv_fields,
+			'categories': cls.__csv_categories,
+			'integers': cls.__csv_integers,
+			'timestamps': cls.__csv_timestamps,
+			'dimensions': cls.__csv_dimensions,
+			'measures': cls.__csv_measures,
+			'report_name': cls.__report_name,
+			'date_field': 'created',
+		       }
+
+	def __init__(self, config):
+		self.__servers = []
+		self.__initialized = False
+
+		# call parent's init
+		super().__init__(config)
+		super().set_summary(self.__csv_dimensions, self.__csv_measures)
+
+		if super().get_initialized() == False:
+			return
+
+		for section in super().get_config().get_sections('gerrit'):
+
+			# the url may start with a scheme, ex. 'http://127.0.0.1:8080'
+			# of a local server, https by default
+			protocol, _, host = section.url.rpartition('://')
+
+			self.__servers.append({'name': section.name,
+					       'url': section.url,
+					       'protocol': protocol or 'https',
+					       'host': host,
+					      })
+
+		self.__initialized = True
+
+		return
+
+	def get_changes(self):
+		# gerrit REST API doc:
+		# https://gerrit-review.googlesource.com/Documentation/rest-api.html
+
+		self.__changes = self.create_store(self.__report_name, self.__csv_fields, self.__csv_categories, self.__csv_integers, self.__csv_timestamps, 'created')
+
+		if self.__initialized == False:
+			return self.__changes
+
+		for server in self.__servers:
+			print('query changes from gerrit server "%s"' % (server['name']))
+
+			gerrit_util.GERRIT_PROTOCOL = server['protocol']
+
+			for user in self.get_users():
+				for email in user.emails:
+					print('query changes for "%s <%s>"' % (user.name, email))
+
+					# the cursor is the start offset of the next page
+					stream = '%s %s <%s>' % (server['name'], user.name, email)
+					start, _ = self.resume_stream(stream, 0)
+
+					if start == None:
+						# finished by the interrupted run
+						self.__changes.end_run()
+						continue
+
+					while True:
+						more_changes = False
+
+						try:
+							# the credentials are looked up for each connection
+							with profile.span('auth'):
+								conn = CreateHttpConn(server['host'], 'changes/?q=owner:' + email + '&start=' + str(start))
+
+							with profile.span('http'):
+								changes = ReadHttpJsonResponse(conn)
+						except GerritError as error:
+							print('- gerrit error: %s' % (str(error)))
+							break
+
+						print('- %d change(s) found' % (len(changes)))
+
+						for change in changes:
+							# optional field, and not every merged change has this field set
+							if 'submitted' not in change.keys():
+								change['submitted'] = ''
+
+							# ChangeInfo
+							# https://gerrit-review.googlesource.com/Documentation/rest-api-changes.html#change-info
+							self.__changes.append({'user_name': user.name,
+										   'user_function': user.function,
+										   'repo_name': server['name'],
+										   'repo_url': server['url'],
+										   'project': change['project'],
+										   'branch': change['branch'],
+										   'change_id': change['change_id'],
+										   'subject': change['subject'],
+										   'status': change['status'],
+										   'created': change['created'],
+										   'updated': change['updated'],
+										   'submitted': change['submitted'],
+										   'insertions': change['insertions'],
+										   'deletions': change['deletions'],
+										   'owner': email,
+										  })
+
+							if '_more_changes' in change.keys() and change['_more_changes'] == True:
+								start += len(changes)
+								more_changes = True
+
+						if more_changes == False:
+							self.end_stream(stream)
+							break
+
+						self.checkpoint(stream, start)
+
+					# changes of one user from one server
+					self.__changes.end_run()
+
+		self.close_journal()
+
+		# sort the changes by date
+		# 'created': '2021-11-02 07:16:18.000000000'
+		with profile.span('sort'):
+			self.__changes.sort('created')
+
+		return self.__changes
+
+	def export_csv_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__changes)
+
+		return ret
+
+	def export_excel_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'created', self.__changes)
+
+		return ret
+
+	def export_file(self, report_directory, file_format):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_file(report_directory, self.__report_name, self.__csv_fields, 'created', self.__changes, file_format)
+
+		return ret
+
+	def update_excel_file(self, report_directory, previous_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().update_excel_file(report_directory, previous_directory, self.__report_name, self.__csv_fields, 'created', self.__csv_keys, self.__changes)
+
+		return ret
+
+	def get_report_rows(self, report_directory):
+		if self.__initialized == False:
+			return []
+
+		return super().get_report_rows(report_directory, self.__report_name, self.__csv_fields, self.__changes)
@@ -0,0 +1,681 @@
+#!/usr/bin/python3
+import git
+import os
+import shutil
+import subprocess
+import time
+
+from multiprocessing.pool import ThreadPool
+
+from upstream_crawler import BaseCrawler
+from upstream_profile import profile
+
+class CatFile:
+	# a long-lived 'git cat-file --batch' (and '--batch-check') co-process,
+	# object ids are streamed in and objects are read back in chunks so no
+	# process is spawned per lookup
+
+	# keep the ids written per chunk well below the pipe buffer size, git
+	# answers (and flushes) each id before it reads the next one
+	__chunk_size = 1000
+
+	def __init__(self, repo_path):
+		self.__repo_path = repo_path
+		self.__batch = None
+		self.__batch_check = None
+
+		return
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+		return False
+
+	def __start(self, option):
+		return subprocess.Popen(['git', '-C', self.__repo_path, 'cat-file', option],
+					stdin = subprocess.PIPE, stdout = subprocess.PIPE)
+
+	def __query(self, process, oids, read_data):
+		oids = list(oids)
+
+		for start in range(0, len(oids), self.__chunk_size):
+			chunk = oids[start:start + self.__chunk_size]
+
+			process.stdin.write(''.join('%s\n' % (oid) for oid in chunk).encode())
+			process.stdin.flush()
+
+			for oid in chunk:
+				# '<oid> <type> <size>' or '<oid> missing'
+				header = process.stdout.readline().decode().split()
+
+				if len(header) != 3:
+					yield oid, None, 0, None
+					continue
+
+				size = int(header[2])
+
+				data = None
+				if read_data == True:
+					# object content is followed by a line feed
+					data = process.stdout.read(size + 1)[:size]
+
+				yield oid, header[1], size, data
+
+		return
+
+	def read(self, oids):
+		# yield (oid, type, data) of each object, type is None if missing
+		if self.__batch == None:
+			self.__batch = self.__start('--batch')
+
+		for oid, object_type, _, data in self.__query(self.__batch, oids, True):
+			yield oid, object_type, data
+
+		return
+
+	def check(self, oids):
+		# yield (oid, type, size) of each object, type is None if missing
+		if self.__batch_check == None:
+			self.__batch_check = self.__start('--batch-check')
+
+		for oid, object_type, size, _ in self.__query(self.__batch_check, oids, False):
+			yield oid, object_type, size
+
+		return
+
+	def read_commits(self, oids):
+		# yield (oid, commit) with the parsed commit object, None if missing
+		for oid, object_type, data in self.read(oids):
+			if object_type != 'commit':
+				yield oid, None
+				continue
+
+			yield oid, parse_commit(data.decode('utf-8', 'replace'))
+
+		return
+
+	def close(self):
+		for process in [self.__batch, self.__batch_check]:
+			if process == None:
+				continue
+
+			process.stdin.close()
+			process.wait()
+
+		self.__batch = self.__batch_check = None
+
+		return
+
+def parse_commit(text):
+	# commit object: header lines, an empty line and the message
+	headers, _, message = text.partition('\n\n')
+
+	commit = {'tree': '',
+		  'parents': [],
+		  'author': '',
+		  'committer': '',
+		  'message': message,
+		  'trailers': [],
+		 }
+
+	for line in headers.splitlines():
+		key, _, value = line.partition(' ')
+
+		if key == 'parent':
+			commit['parents'].append(value)
+		elif key in ['tree', 'author', 'committer']:
+			commit[key] = value
+
+	# trailers are the 'Key: value' lines of the last paragraph
+	paragraphs = message.strip().split('\n\n')
+
+	if len(paragraphs) > 1:
+		for line in paragraphs[-1].splitlines():
+			key, separator, value = line.partition(':')
+
+			if separator == '' or key == '' or ' ' in key.strip():
+				continue
+
+			commit['trailers'].append((key.strip(), value.strip()))
+
+	return commit
+
+def get_trailers(commit, key):
+	# trailer keys are case insensitive
+	values = []
+
+	for trailer_key, value in commit['trailers']:
+		if trailer_key.lower() == key.lower():
+			values.append(value)
+
+	return values
+
+class GitCrawler(BaseCrawler):
+	__csv_fields = ['user_name', 'user_function', 'commit_hash', 'author_email', 'author_date', 'committer_email', 'committer_date', 'subject', 'status', 'branch', 'change_id', 'reviewed_by']
+	__csv_categories = ['user_name', 'user_function', 'author_email', 'committer_email', 'status', 'branch']
+	__csv_integers = []
+	__csv_timestamps = ['author_date', 'committer_date']
+	__csv_keys = ['commit_hash']
+	__csv_dimensions = ['user_function', 'status', 'branch']
+	__csv_measures = []
+	__report_name = 'git-commits'
+
+	@classmethod
+	def get_schema(cls):
+		# fields of the rows and how they are stored and summarized
+		return {'fields': cls.__csv_fields,
+			'categories': cls.__csv_categories,
+			'integers': cls.__csv_integers,
+			'timestamps': cls.__csv_timestamps,
+			'dimensions': cls.__csv_dimensions,
+			'measures': cls.__csv_measures,
+			'report_name': cls.__report_name,
+			'date_field': 'committer_date',
+		       }
+
+	def __init__(self, config):
+		self.__repos = []
+		self.__timings = {}
+		self.__initialized = False
+
+		# call parent's init
+		super().__init__(config)
+		super().set_summary(self.__csv_dimensions, self.__csv_measures)
+
+		if super().get_initialized() == False:
+			return
+
+		for section in super().get_config().get_sections('git'):
+
+			# optional, split the git log into time windows walked in parallel
+			shards = section.get('log shards', '0')
+			if shards.lower() == 'auto':
+				# the count may be unknown
+				shards = os.cpu_count() or 1
+
+			# one or more branches (or globs like 'for-*') of the remote,
+			# separated by spaces or commas
+			branches = section.get('branch').replace(',', ' ').split()
+
+			self.__repos.append({'name': section.name,
+					     'url': section.url,
+					     'branches': branches,
+					     'shards': int(shards),
+					    })
+
+		# prepare the parameter for git log command
+		self.__author_param = []
+
+		# one anchored alternation instead of one --author per email, git
+		# evaluates every --author pattern against every commit it walks
+		emails = self.get_config().get_emails()
+
+		self.__author_param.append('--extended-regexp')
+		self.__author_param.append('--author=<(%s)>' % ('|'.join(map(self.__escape_regex, emails))))
+
+		self.__log_param = list(self.__author_param)
+
+		# %H: commit hash
+		# %ae: author email
+		# %aI: author date, strict ISO 8601 format
+		# %ce: committer email
+		# %cI: committer date, strict ISO 8601 format
+		# %s: subject
+		self.__log_param.append('--pretty=format:%H%x09%ae%x09%aI%x09%ce%x09%cI%x09%s')
+		self.__log_param.append('--reverse')
+
+		# create the root directory for repos
+		self.__repo_root = os.path.abspath('./repo')
+
+		if os.path.isdir(self.__repo_root) == False:
+			os.mkdir(self.__repo_root)
+
+		self.__initialized = True
+
+		return
+
+	def __add_timing(self, phase, start):
+		# seconds spent in each phase, summed over the repos
+		seconds = time.monotonic() - start
+
+		self.__timings[phase] = self.__timings.get(phase, 0.0) + seconds
+		profile.add_span(phase, seconds)
+
+		return
+
+	def get_timings(self):
+		# phases of the last get_commits(): clone or open, fetch,
+		# commit_graph, log, dedup (rows of new commits), trailers, sort
+		return self.__timings
+
+	def get_years(self):
+		# years of the last get_commit_counts(), each user has a count per year
+		return self.__years
+
+	def __escape_regex(self, text):
+		# escape the POSIX extended regex metacharacters
+		escaped = ''
+
+		for char in text:
+			if char in '\\.^$|?*+()[]{}':
+				escaped += '\\'
+			escaped += char
+
+		return escaped
+
+	def __write_commit_graph(self, repository):
+		# keep the commit-graph (with generation numbers) up to date so the
+		# history walk doesn't need to parse every commit object
+		try:
+			repository.git.commit_graph('write', '--reachable', '--split')
+		except git.exc.GitCommandError as error:
+			print('- warning, fail to write commit-graph: %s' % (error.stderr.strip()))
+
+	def __get_revisions(self, repo):
+		# remote-tracking branches, updated by every fetch
+		revisions = []
+
+		for branch in repo['branches']:
+			if any(char in branch for char in '*?['):
+				revisions.append('--glob=refs/remotes/origin/%s' % (branch))
+			else:
+				revisions.append('refs/remotes/origin/%s' % (branch))
+
+		return revisions
+
+	def __get_refs(self, repository, repo):
+		# remote-tracking branches in the config order, a glob expands to
+		# its branches sorted by name
+		refs = []
+
+		for branch in repo['branches']:
+			if any(char in branch for char in '*?['):
+				matches = repository.git.for_each_ref('--format=%(refname)', 'refs/remotes/origin/%s' % (branch)).split()
+			else:
+				matches = ['refs/remotes/origin/%s' % (branch)]
+
+			for ref in matches:
+				if ref not in refs:
+					refs.append(ref)
+
+		return refs
+
+	def __get_range(self, refs, exclusions):
+		# the commits of refs that none of the exclusions has
+		if len(exclusions) == 0:
+			return list(refs)
+
+		return refs + ['--not'] + exclusions
+
+	def __log_sharded(self, repository, refs, exclusions, shards):
+		revisions = self.__get_range(refs, exclusions)
+
+		# --since-as-filter doesn't stop the walk at the first old commit, so
+		# the windows are exact even with skewed committer dates (git 2.37+)
+		if repository.git.version_info < (2, 37):
+			print('- warning, git is too old to shard the log')
+			return repository.git.log(self.__log_param + revisions).splitlines()
+
+		# committer date range of the whole history of refs, the commits of
+		# the exclusions fall in it too
+		roots = repository.git.log('--max-parents=0', '--format=%ct', *refs).split()
+		tips = repository.git.log('-1', '--format=%ct', *refs).split()
+
+		if len(roots) == 0 or len(tips) == 0:
+			# no commit to walk, ex. an empty repo
+			return []
+
+		first = min(map(int, roots))
+		last = int(tips[0])
+
+		# more windows than workers, commits are not evenly spread in time
+		count = shards * 4
+		step = max(1, (last - first) // count + 1)
+
+		windows = []
+		for idx in range(count):
+			param = []
+
+			# leave both ends open for commits dated out of the range
+			if idx != 0:
+				param.append('--since-as-filter=@%d' % (first + idx * step))
+			if idx != count - 1:
+				param.append('--until=@%d' % (first + (idx + 1) * step - 1))
+
+			windows.append(param + revisions)
+
+		print('- walk %d window(s) with %d process(es)' % (count, shards))
+
+		with ThreadPool(shards) as pool:
+			logs = pool.map(lambda param: repository.git.log(self.__log_param + param), windows)
+
+		# windows are disjoint and in ascending order, same as --reverse
+		commits = []
+		for log in logs:
+			commits += log.splitlines()
+
+		return commits
+
+	def __add_trailers(self, repository, commits):
+		# one cat-file process for all commits instead of one spawn per commit
+		with CatFile(repository.git_dir) as cat_file:
+			hashes = [commit['commit_hash'] for commit in commits]
+
+			for commit, (_, detail) in zip(commits, cat_file.read_commits(hashes)):
+				if detail == None:
+					continue
+
+				change_ids = get_trailers(detail, 'Change-Id')
+				if len(change_ids) != 0:
+					commit['change_id'] = change_ids[-1]
+
+				commit['reviewed_by'] = '; '.join(get_trailers(detail, 'Reviewed-by'))
+
+		return
+
+	def __open_repo(self, repo):
+		repo_path = os.path.abspath(self.__repo_root + '/' + repo['name'])
+
+		start = time.monotonic()
+
+		if os.path.isdir(repo_path) == False:
+			# repo directory not exist
+			print('- clone git repo from %s' % (repo['url']))
+			repository = git.Repo.clone_from(repo['url'], repo_path)
+			self.__add_timing('clone', start)
+		else:
+			print('- open git repo at %s' % (repo_path))
+			repository = git.Repo(repo_path)
+			self.__add_timing('open', start)
+
+		if repository.__class__ is git.Repo:
+			# check if repo is healthy
+			if repository.is_dirty(untracked_files = True):
+				print('- warning, repo is dirty')
+
+			if repository.remotes.origin.exists() == False:
+				print('- warning, remote origin does not exist')
+
+			return repository
+
+		# repo may be corrupted...
+		print('- repo corrupted, delete entire repo')
+		try:
+			shutil.rmtree(repo_path)
+		except OSError as error:
+			pass
+
+		return None
+
+	def __update_repo(self, repo, tips = []):
+		repository = self.__open_repo(repo)
+
+		if repository == None:
+			# a second shot
+			repository = self.__open_repo(repo)
+
+		if repository == None:
+			return None
+
+		# fetched by an interrupted run, the walk resumes at the same tips
+		if len(tips) != 0 and repository.git.rev_parse(self.__get_revisions(repo)).split() == tips:
+			print('- skip fetch, the branches are at the tips of the journal')
+			return repository
+
+		# git fetch origin
+		#repository.remotes.origin.fetch('+refs/heads/*:refs/remotes/origin/*')
+		start = time.monotonic()
+		repository.remotes.origin.fetch()
+		self.__add_timing('fetch', start)
+
+		start = time.monotonic()
+		self.__write_commit_graph(repository)
+		self.__add_timing('commit_graph', start)
+
+		return repository
+
+	def get_commit_counts(self):
+		# count-only fast path for the summary, the commits of each author
+		# per year are counted from the log without building any row
+		self.__years = []
+		self.__counts = {}
+
+		if self.__initialized == False:
+			return self.__counts
+
+		for user in self.get_users():
+			self.__counts[user.name] = {}
+
+		self.__log_counts()
+
+		# same layout as the summary sheet, only years with commits
+		years = set()
+		for counts in self.__counts.values():
+			years.update(counts.keys())
+
+		self.__years = ['%d' % (year) for year in sorted(years)]
+
+		for name in self.__counts:
+			self.__counts[name] = [self.__counts[name].get(int(year), 0) for year in self.__years]
+
+		return self.__counts
+
+	def __log_counts(self):
+		# %H: commit hash, a commit in several repos (ex. a fork and its
+		# upstream, whatever tips each one has) is counted once, like the
+		# rows of get_commits()
+		# %ae: author email, not mapped by .mailmap
+		# %cd: committer date, the year in committer's time zone
+		param = self.__author_param + ['--format=%H%x09%ae%x09%cd', '--date=format:%Y']
+
+		hash_cache = set()
+
+		for repo in self.__repos:
+			print('count commits from git repo "%s"' % (repo['name']))
+
+			repository = self.__update_repo(repo)
+
+			if repository == None:
+				continue
+
+			revisions = self.__get_revisions(repo)
+
+			found = 0
+
+			# '<hash>\tjohn.doe@example.com\t2021'
+			for line in repository.git.log(param + revisions).splitlines():
+				item = line.split('\t')
+				if len(item) != 3:
+					continue
+
+				# already counted in other repo
+				if item[0] in hash_cache:
+					continue
+
+				hash_cache.add(item[0])
+
+				user = self.get_user(email = item[1])
+
+				if user == None:
+					continue
+
+				counts = self.__counts[user.name]
+				counts[int(item[2])] = counts.get(int(item[2]), 0) + 1
+				found += 1
+
+			print('- %d commit(s) counted' % (found))
+
+		return
+
+	def get_commits(self):
+		self.__commits = self.create_store(self.__report_name, self.__csv_fields, self.__csv_categories, self.__csv_integers, self.__csv_timestamps, 'committer_date')
+
+		if self.__initialized == False:
+			return self.__commits
+
+		hash_cache = set()
+		self.__timings = {}
+
+		for repo in self.__repos:
+			print('query commits from git repo "%s"' % (repo['name']))
+
+			# the cursor is the tips of the branches after the fetch
+			stream = repo['name']
+			tips, rows = self.resume_stream(stream, [])
+
+			if tips == None:
+				# finished by the interrupted run
+				hash_cache.update(row['commit_hash'] for row in rows)
+				self.__commits.end_run()
+				continue
+
+			repository = self.__update_repo(repo, tips)
+
+			if repository == None:
+				continue
+
+			revisions = self.__get_revisions(repo)
+
+			# the log of a big repo takes minutes, write the tips at once
+			self.checkpoint(stream, repository.git.rev_parse(revisions).split(), flush = True)
+
+			# git log
+			start = time.monotonic()
+
+			# each branch in the config order walks the commits none of the
+			# branches before it has, a commit on several branches belongs
+			# to the first one
+			refs = self.__get_refs(repository, repo)
+			commits = []
+
+			for idx, ref in enumerate(refs):
+				if repo['shards'] > 1:
+					lines = self.__log_sharded(repository, [ref], refs[:idx], repo['shards'])
+				else:
+					# split the log into lines
+					lines = repository.git.log(self.__log_param + self.__get_range([ref], refs[:idx])).splitlines()
+
+				branch = ref.replace('refs/remotes/origin/', '', 1)
+				commits += [(line, branch) for line in lines]
+
+			self.__add_timing('log', start)
+
+			print('- %d commit(s) found' % (len(commits)))
+
+			# rows of this repo, completed with the trailers below
+			start = time.monotonic()
+			rows = []
+
+			for commit, branch in commits:
+				item = commit.split('\t')
+				if len(item) != 6:
+					continue
+
+				# already found in other repo
+				commit_hash = item[0]
+
+				if commit_hash in hash_cache:
+					continue
+
+				hash_cache.add(commit_hash)
+
+				author_email = item[1]
+				author_date = item[2]
+				committer_email = item[3]
+				committer_date = item[4]
+				subject = item[5]
+				if repo['name'] == 'linux':
+					status = 'upstreamed'
+				else:
+					status = 'accepted' # waiting next merge window
+
+				user = self.get_user(email = author_email)
+
+				if user == None:
+					# should not happen
+					user.name = 'John Doe'
+					user.function = 'Dead man'
+
+				rows.append({'user_name': user.name,
+					     'user_function': user.function,
+					     'commit_hash': commit_hash,
+					     'author_email': author_email,
+					     'author_date': author_date,
+					     'committer_email': committer_email,
+					     'committer_date': committer_date,
+					     'subject': subject,
+					     'status': status,
+					     'branch': branch,
+					     'change_id': '',
+					     'reviewed_by': '',
+					    })
+
+			self.__add_timing('dedup', start)
+
+			# read the commit messages for the trailers
+			start = time.monotonic()
+			self.__add_trailers(repository, rows)
+			self.__add_timing('trailers', start)
+
+			self.__commits.extend(rows)
+			self.end_stream(stream)
+			self.__commits.end_run()
+
+		self.close_journal()
+
+		# sort the commits by date, in UTC rather than by the text
+		# 'committer_date': '2021-08-10T11:47:55+02:00'
+		start = time.monotonic()
+		self.__commits.sort('committer_date')
+		self.__add_timing('sort', start)
+
+		return self.__commits
+
+	def export_csv_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__commits)
+
+		return ret
+
+	def export_excel_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'committer_date', self.__commits)
+
+		return ret
+
+	def export_file(self, report_directory, file_format):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_file(report_directory, self.__report_name, self.__csv_fields, 'committer_date', self.__commits, file_format)
+
+		return ret
+
+	def update_excel_file(self, report_directory, previous_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().update_excel_file(report_directory, previous_directory, self.__report_name, self.__csv_fields, 'committer_date', self.__csv_keys, self.__commits)
+
+		return ret
+
+	def get_report_rows(self, report_directory):
+		if self.__initialized == False:
+			return []
+
+		return super().get_report_rows(report_directory, self.__report_name, self.__csv_fields, self.__commits)
+
+	def export_summary_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_summary_file(report_directory, self.__report_name, self.__years, self.__counts)
+
+		return ret
@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+import requests
+
+from upstream_crawler import BaseCrawler
+from upstream_profile import profile
+
+class GithubCrawler(BaseCrawler):
+	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'number', 'state', 'title', 'user', 'created_at', 'updated_at', 'closed_at', 'merged_at', 'head', 'base', 'commits', 'additions', 'deletions', 'changed_files']
+	__csv_categories = ['user_name', 'user_function', 'repo_name', 'repo_url', 'state', 'user', 'base']
+	__csv_integers = ['number', 'commits', 'additions', 'deletions', 'changed_files']
+	__csv_timestamps = ['created_at', 'updated_at']
+	__csv_keys = ['repo_url', 'number']
+	__csv_dimensions = ['user_function', 'state', 'repo_name']
+	__csv_measures = ['additions', 'deletions']
+	__report_name = 'github-pulls'
+
+	@classmethod
+	def get_schema(cls):
+		# fields of the rows and how they are stored and summarized
+		return {'fields': cls.__csv_fields,
+			'categories': cls.__csv_categories,
+			'integers': cls.__csv_integers,
+			'timestamps': cls.__csv_timestamps,
+			'dimensions': cls.__csv_dimensions,
+			'measures': cls.__csv_measures,
+			'report_name': cls.__report_name,
+			'date_field': 'created_at',
+		       }
+
+	def __init__(self, config, auth):
+		self.__repos = []
+		self.__initialized = False
+
+		# call parent's init
+		super().__init__(config)
+		super().set_summary(self.__csv_dimensions, self.__csv_measures)
+
+		if super().get_initialized() == False:
+			return
+
+		for section in super().get_config().get_sections('github'):
+
+			# 'api url' points to another server, ex. github enterprise
+			self.__repos.append({'name': section.name,
+					     'owner/repo': section.get('owner/repo'),
+					     'api url': section.get('api url', 'https://api.github.com'),
+					    })
+
+		# save the github (username, token) pair
+		self.__auth = auth
+
+		self.__initialized = True
+
+		return
+
+	def get_pulls(self):
+		# github REST API doc:
+		# https://docs.github.com/en/rest
+
+		self.__pulls = self.create_store(self.__report_name, self.__csv_fields, self.__csv_categories, self.__csv_integers, self.__csv_timestamps, 'created_at')
+
+		if self.__initialized == False:
+			return self.__pulls
+
+		# there is no filter for submitter
+		usernames = set()
+		for user in self.get_users():
+			usernames.add(user.github_username)
+
+		for repo in self.__repos:
+			print('query pulls from github repo "%s"' % (repo['name']))
+
+			# get the page one result
+			url = '%s/repos/%s/pulls?state=all&per_page=100&direction=asc' % (repo['api url'], repo['owner/repo'])
+
+			# the cursor is the url of the next page and the counts so far
+			stream = repo['name']
+			cursor, _ = self.resume_stream(stream, {'url': url, 'found': 0, 'checked': 0})
+
+			if cursor == None:
+				# finished by the interrupted run
+				self.__pulls.end_run()
+				continue
+
+			url = cursor['url']
+			found = cursor['found']
+			checked = cursor['checked']
+
+			while True:
+				try:
+					r = self.http_get(url, self.__auth)
+				except requests.exceptions.RequestException as error:
+					print('- github error: %s' % (str(error)))
+					break
+
+				if r.status_code != 200:
+					print('- github error: %d %s' % (r.status_code, r.reason))
+					break
+
+				with profile.span('json'):
+					pulls = r.json()
+
+				invalid_pulls = False
+
+				for pull in pulls:
+					if type(pull) is not dict:
+						print('- fail to get pulls from repo')
+						invalid_pulls = True
+						break
+
+					if pull['user']['login'] not in usernames:
+						continue
+
+					# one valid pull is found but don't know who's the submitter
+					found += 1
+					user = self.get_user(github_username = pull['user']['login'])
+
+					if user == None:
+						# should not happen
+						user.name = 'John Doe'
+						user.function = 'Dead man'
+
+					r_detail = self.http_get(pull['url'], self.__auth)
+
+					if r_detail.status_code != 200:
+						print('- github error: %d %s' % (r_detail.status_code, r_detail.reason))
+						invalid_pulls = True
+						break
+
+					with profile.span('json'):
+						detail = r_detail.json()
+
+					# check the response of 'GET /repos/{owner}/{repo}/pulls'
+					# https://docs.github.com/en/rest/reference/pulls
+					self.__pulls.append({'user_name': user.name,
+							     'user_function': user.function,
+							     'repo_name': repo['name'],
+							     'repo_url': 'github.com/%s' % (repo['owner/repo']),
+							     'number': pull['number'],
+							     'state': pull['state'],
+							     'title': pull['title'],
+							     'user': pull['user']['login'],
+							     'created_at': pull['created_at'],
+							     'updated_at': pull['updated_at'],
+							     'closed_at': pull['closed_at'],
+							     'merged_at': pull['merged_at'],
+							     'head': pull['head']['label'],
+							     'base': pull['base']['label'],
+							     'commits': detail['commits'],
+							     'additions': detail['additions'],
+							     'deletions': detail['deletions'],
+							     'changed_files': detail['changed_files'],
+							    })
+
+				if invalid_pulls != False:
+					# try next repo
+					break
+
+				checked += len(pulls)
+
+				print('- %d pull(s) found / total %d pull(s) checked' % (found, checked))
+
+				# read url to next page
+				links = r.links
+				if 'next' in links.keys():
+					url = links['next']['url']
+				else:
+					self.end_stream(stream)
+					break
+
+				self.checkpoint(stream, {'url': url, 'found': found, 'checked': checked})
+
+			# pulls of one repo, in created order
+			self.__pulls.end_run()
+
+		self.close_journal()
+
+		# sort the pulls by date
+		# 'created_at': '2019-06-11T09:10:12Z'
+		with profile.span('sort'):
+			self.__pulls.sort('created_at')
+
+		return self.__pulls
+
+	def export_csv_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__pulls)
+
+		return ret
+
+	def export_excel_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'created_at', self.__pulls)
+
+		return ret
+
+	def export_file(self, report_directory, file_format):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_file(report_directory, self.__report_name, self.__csv_fields, 'created_at', self.__pulls, file_format)
+
+		return ret
+
+	def update_excel_file(self, report_directory, previous_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().update_excel_file(report_directory, previous_directory, self.__report_name, self.__csv_fields, 'created_at', self.__csv_keys, self.__pulls)
+
+		return ret
+
+	def get_report_rows(self, report_directory):
+		if self.__initialized == False:
+			return []
+
+		return super().get_report_rows(report_directory, self.__report_name, self.__csv_fields, self.__pulls)
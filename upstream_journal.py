@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+import atexit
+import glob
+import json
+import os
+import time
+
+class CrawlJournal:
+	# checkpoints of a crawl in <report>.journal of the report directory. A
+	# crawl is a list of streams, each paginated on its own (a user email on
+	# a gerrit or patchwork server, a github repo, a git repo), and a
+	# checkpoint is a json line with the rows of a stream appended since the
+	# previous one and the cursor after them: the gerrit start offset, the
+	# url of the next page or the git tips. A crawl resumed in the same
+	# directory replays the journaled rows and continues from the cursors.
+
+	# seconds between two writes, a crash loses the pages of one interval
+	__interval = 5.0
+
+	def __init__(self, report_directory, report_name):
+		self.__path = os.path.join(report_directory, '%s.journal' % (report_name))
+		self.__streams = {}
+		self.__rows = []
+		self.__lines = []
+		self.__written = time.monotonic()
+
+		if os.path.isfile(self.__path) == True:
+			self.__load()
+
+		self.__file = open(self.__path, 'a')
+
+		# an interrupted crawl still writes the checkpoints it has
+		atexit.register(self.close)
+
+		return
+
+	def __load(self):
+		size = 0
+
+		with open(self.__path) as journal_file:
+			for line in journal_file:
+				try:
+					item = json.loads(line)
+				except ValueError:
+					# a line cut by the crash
+					break
+
+				state = self.__streams.setdefault(item['stream'], {'rows': [], 'cursor': None, 'done': False})
+				state['rows'] += item['rows']
+				state['cursor'] = item['cursor']
+				state['done'] = item['done']
+
+				size += len(line.encode())
+
+		# drop the cut line, the next checkpoint starts a line of its own
+		os.truncate(self.__path, size)
+
+		count = sum(len(state['rows']) for state in self.__streams.values())
+		print('- resume %d stream(s), %d row(s) from %s' % (len(self.__streams), count, self.__path))
+
+		return
+
+	def resume(self, stream):
+		# the journaled state of a stream: its rows, its last cursor and if
+		# it was finished, None for a stream the interrupted run didn't reach
+		return self.__streams.pop(stream, None)
+
+	def begin(self):
+		# a stream starts, the rows appended before are already journaled (a
+		# resumed stream) or after the last cursor of an aborted stream
+		self.__rows = []
+
+		return
+
+	def append(self, values):
+		self.__rows.append(values)
+
+		return
+
+	def checkpoint(self, stream, cursor, done = False, flush = False):
+		# every row appended since the last checkpoint is before the cursor
+		self.__lines.append(json.dumps({'stream': stream, 'rows': self.__rows, 'cursor': cursor, 'done': done}))
+		self.__rows = []
+
+		if flush == True or time.monotonic() - self.__written >= self.__interval:
+			self.flush()
+
+		return
+
+	def flush(self):
+		if len(self.__lines) != 0:
+			self.__file.write('\n'.join(self.__lines) + '\n')
+			self.__file.flush()
+			self.__lines = []
+
+		self.__written = time.monotonic()
+
+		return
+
+	def close(self):
+		if self.__file.closed == True:
+			return
+
+		self.flush()
+		self.__file.close()
+
+		return
+
+def remove_journals(report_directory):
+	# the report is complete, nothing left to resume
+	for journal_path in glob.glob(os.path.join(report_directory, '*.journal')):
+		os.remove(journal_path)
+
+	return
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+import requests
+
+from upstream_crawler import BaseCrawler
+from upstream_profile import profile
+
+class PatchworkCrawler(BaseCrawler):
+	__csv_fields = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'date', 'name', 'state', 'submitter']
+	__csv_categories = ['user_name', 'user_function', 'repo_name', 'repo_url', 'project', 'state', 'submitter']
+	__csv_integers = []
+	__csv_timestamps = ['date']
+	__csv_keys = ['repo_url', 'date', 'name', 'submitter']
+	__csv_dimensions = ['user_function', 'state', 'repo_name']
+	__csv_measures = []
+	__report_name = 'patchwork-patches'
+
+	@classmethod
+	def get_schema(cls):
+		# fields of the rows and how they are stored and summarized
+		return {'fields': cls.__csv_fields,
+			'categories': cls.__csv_categories,
+			'integers': cls.__csv_integers,
+			'timestamps': cls.__csv_timestamps,
+			'dimensions': cls.__csv_dimensions,
+			'measures': cls.__csv_measures,
+			'report_name': cls.__report_name,
+			'date_field': 'date',
+		       }
+
+	def __init__(self, config):
+		self.__servers = []
+		self.__initialized = False
+
+		# call parent's init
+		super().__init__(config)
+		super().set_summary(self.__csv_dimensions, self.__csv_measures)
+
+		if super().get_initialized() == False:
+			return
+
+		for section in super().get_config().get_sections('patchwork'):
+
+			# the url may start with a scheme, https by default
+			url = section.url
+			if '://' not in url:
+				url = 'https://' + url
+
+			self.__servers.append({'name': section.name,
+					       'url': section.url,
+					       'api url': url,
+					      })
+
+		self.__initialized = True
+
+		return
+
+	def get_patches(self):
+		# patchwork REST API doc:
+		# https://patchwork.readthedocs.io/en/latest/api/rest/
+
+		self.__patches = self.create_store(self.__report_name, self.__csv_fields, self.__csv_categories, self.__csv_integers, self.__csv_timestamps, 'date')
+
+		if self.__initialized == False:
+			return self.__patches
+
+		for server in self.__servers:
+			print('query patches from patchwork server "%s"' % (server['name']))
+
+			for user in self.get_users():
+				for email in user.emails:
+					print('query patches for "%s <%s>"' % (user.name, email))
+
+					# get the page one result
+					url = '%s/api/1.2/patches?submitter=%s' % (server['api url'], email)
+
+					# the cursor is the url of the next page
+					stream = '%s %s <%s>' % (server['name'], user.name, email)
+					url, _ = self.resume_stream(stream, url)
+
+					if url == None:
+						# finished by the interrupted run
+						self.__patches.end_run()
+						continue
+
+					while True:
+						try:
+							r = self.http_get(url)
+						except requests.exceptions.RequestException as error:
+							print('- patchwork error: %s' % (str(error)))
+							break
+
+						if r.status_code != 200:
+							print('- patchwork error: %d %s' % (r.status_code, r.reason))
+							break
+
+						with profile.span('json'):
+							patches = r.json()
+
+						print('- %d patche(s) found' % (len(patches)))
+
+						for patch in patches:
+							# check the response of 'GET /api/1.2/patches/'
+							# https://patchwork.readthedocs.io/en/latest/api/rest/schemas/v1.2/
+							self.__patches.append({'user_name': user.name,
+									       'user_function': user.function,
+									       'repo_name': server['name'],
+									       'repo_url': server['url'],
+									       'project': patch['project']['name'],
+									       'date': patch['date'],
+									       'name': patch['name'],
+									       'state': patch['state'],
+									       'submitter': email,
+									      })
+
+						# read url to next page
+						links = r.links
+						if 'next' in links.keys():
+							url = links['next']['url']
+						else:
+							self.end_stream(stream)
+							break
+
+						self.checkpoint(stream, url)
+
+					# patches of one user from one server
+					self.__patches.end_run()
+
+		self.close_journal()
+
+		# sort the patches by date
+		# 'date': '2018-04-24T11:15:52'
+		with profile.span('sort'):
+			self.__patches.sort('date')
+
+		return self.__patches
+
+	def export_csv_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_csv_file(report_directory, self.__report_name, self.__csv_fields, self.__patches)
+
+		return ret
+
+	def export_excel_file(self, report_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_excel_file(report_directory, self.__report_name, self.__csv_fields, 'date', self.__patches)
+
+		return ret
+
+	def export_file(self, report_directory, file_format):
+		if self.__initialized == False:
+			return False
+
+		ret = super().export_file(report_directory, self.__report_name, self.__csv_fields, 'date', self.__patches, file_format)
+
+		return ret
+
+	def update_excel_file(self, report_directory, previous_directory):
+		if self.__initialized == False:
+			return False
+
+		ret = super().update_excel_file(report_directory, previous_directory, self.__report_name, self.__csv_fields, 'date', self.__csv_keys, self.__patches)
+
+		return ret
+
+	def get_report_rows(self, report_directory):
+		if self.__initialized == False:
+			return []
+
+		return super().get_report_rows(report_directory, self.__report_name, self.__csv_fields, self.__patches)
@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+import cProfile
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+class SamplingProfiler:
+	# a background thread samples the stacks of the other threads at a
+	# fixed interval and counts each distinct stack, the result is the
+	# collapsed stack text of flamegraph.pl or speedscope
+
+	def __init__(self, interval = 0.01):
+		self.__interval = interval
+		self.__stacks = {}
+		self.__samples = 0
+		self.__stop = threading.Event()
+		self.__thread = None
+
+		return
+
+	def get_samples(self):
+		return self.__samples
+
+	def start(self):
+		self.__stop.clear()
+		self.__thread = threading.Thread(target = self.__run, name = 'sampler', daemon = True)
+		self.__thread.start()
+
+		return
+
+	def stop(self):
+		self.__stop.set()
+		self.__thread.join()
+
+		return
+
+	def __get_label(self, code):
+		return '%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+	def __run(self):
+		me = threading.get_ident()
+
+		while self.__stop.wait(self.__interval) == False:
+			names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+			for ident, frame in sys._current_frames().items():
+				if ident == me:
+					continue
+
+				labels = []
+				while frame != None:
+					labels.append(self.__get_label(frame.f_code))
+					frame = frame.f_back
+
+				labels.append(names.get(ident, 'thread %d' % (ident)))
+				stack = ';'.join(reversed(labels))
+
+				self.__stacks[stack] = self.__stacks.get(stack, 0) + 1
+
+			self.__samples += 1
+
+		return
+
+	def export_file(self, path):
+		with open(path, 'w') as collapsed_file:
+			for stack, count in sorted(self.__stacks.items()):
+				collapsed_file.write('%s %d\n' % (stack, count))
+
+		return True
+
+class RunProfile:
+	# wall clock spans and http requests of a run. Spans nest by thread,
+	# a span is named by the names of its parents, ex. 'gerrit/crawl/http',
+	# and repeated spans are summed. Requests are counted by host from the
+	# httplib2 (gerrit_util) and requests (BaseCrawler.http_get) transports,
+	# their latencies in fixed-size histograms, the memory doesn't grow
+	# with the number of requests.
+
+	__file_name = 'run-profile.json'
+
+	def __init__(self):
+		self.__lock = threading.Lock()
+		self.__local = threading.local()
+		self.__originals = {}
+		self.__profiler = None
+		self.__profile_directory = None
+		self.reset()
+
+		return
+
+	def reset(self):
+		self.__started = time.time()
+		self.__start = time.monotonic()
+		self.__spans = {}
+		self.__hosts = {}
+
+		return
+
+	def __get_stack(self):
+		if hasattr(self.__local, 'stack') == False:
+			self.__local.stack = []
+
+		return self.__local.stack
+
+	def add_span(self, name, seconds):
+		# a duration measured by the caller, under the current span
+		path = '/'.join(self.__get_stack() + [name])
+
+		with self.__lock:
+			span = self.__spans.setdefault(path, {'count': 0, 'seconds': 0.0})
+			span['count'] += 1
+			span['seconds'] += seconds
+
+		return
+
+	@contextlib.contextmanager
+	def span(self, name):
+		stack = self.__get_stack()
+		start = time.monotonic()
+
+		stack.append(name)
+		try:
+			yield
+		finally:
+			stack.pop()
+			self.add_span(name, time.monotonic() - start)
+
+		return
+
+	def set_profiler(self, profiler, report_directory):
+		# 'cprofile': each action writes <action>.pstats of the deterministic
+		# profiler, main thread only
+		# 'sample': each action writes <action>.collapsed of the sampling
+		# profiler, every thread, low overhead for long crawls
+		if profiler not in [None, 'cprofile', 'sample']:
+			print('invalid profiler "%s"' % (profiler))
+			return False
+
+		self.__profiler = profiler
+		self.__profile_directory = report_directory
+
+		return True
+
+	@contextlib.contextmanager
+	def action(self, name):
+		# a span under the profiler, if any
+		if self.__profiler == None:
+			with self.span(name):
+				yield
+			return
+
+		path = '%s/%s' % (self.__profile_directory, name)
+
+		if self.__profiler == 'cprofile':
+			profiler = cProfile.Profile()
+			profiler.enable()
+		else:
+			profiler = SamplingProfiler()
+			profiler.start()
+
+		try:
+			with self.span(name):
+				yield
+		finally:
+			if self.__profiler == 'cprofile':
+				profiler.disable()
+				profiler.dump_stats(path + '.pstats')
+				print('export profile to %s.pstats' % (path))
+			else:
+				profiler.stop()
+				profiler.export_file(path + '.collapsed')
+				print('export %d sample(s) to %s.collapsed' % (profiler.get_samples(), path))
+
+		return
+
+	def add_request(self, url, status, seconds, size):
+		# imported by the first request, depot_tools/__init__ changes
+		# sys.path and a git or report only run never needs it
+		from depot_tools.histogram import LatencyHistogram
+
+		host = urllib.parse.urlsplit(url).netloc
+
+		with self.__lock:
+			stats = self.__hosts.setdefault(host, {'errors': 0, 'bytes': 0, 'latency': LatencyHistogram()})
+			stats['bytes'] += size
+			stats['latency'].record(seconds)
+
+			if status >= 400:
+				stats['errors'] += 1
+
+		return
+
+	def install(self):
+		# time every request of both transports and keep the gerrit_util
+		# request metrics without their unbounded lists
+		metrics = sys.modules.get('metrics')
+		if metrics != None:
+			metrics.collector.enable_histograms()
+
+		# the transports imported so far, each action imports its own so
+		# install again after the import
+		httplib2 = sys.modules.get('httplib2')
+		if httplib2 != None and 'httplib2' not in self.__originals:
+			self.__originals['httplib2'] = httplib2.Http.request
+			httplib2.Http.request = self.__hook_httplib2(httplib2, httplib2.Http.request)
+
+		requests = sys.modules.get('requests')
+		if requests != None and 'requests' not in self.__originals:
+			self.__originals['requests'] = requests.Session.send
+			requests.Session.send = self.__hook_requests(requests, requests.Session.send)
+
+		return
+
+	def uninstall(self):
+		if 'httplib2' in self.__originals:
+			sys.modules['httplib2'].Http.request = self.__originals.pop('httplib2')
+
+		if 'requests' in self.__originals:
+			sys.modules['requests'].Session.send = self.__originals.pop('requests')
+
+		return
+
+	def __hook_httplib2(self, httplib2, original):
+		profile = self
+
+		def request(http, uri, *args, **kwargs):
+			start = time.monotonic()
+			response, content = original(http, uri, *args, **kwargs)
+			profile.add_request(uri, response.status, time.monotonic() - start, len(content))
+
+			return response, content
+
+		return request
+
+	def __hook_requests(self, requests, original):
+		profile = self
+
+		def send(session, request, **kwargs):
+			start = time.monotonic()
+			response = original(session, request, **kwargs)
+			profile.add_request(request.url, response.status_code, time.monotonic() - start, len(response.content))
+
+			return response
+
+		return send
+
+	def get_profile(self):
+		with self.__lock:
+			spans = [dict(name = path, count = span['count'], seconds = round(span['seconds'], 6)) for path, span in self.__spans.items()]
+
+			hosts = {}
+			for host, stats in self.__hosts.items():
+				latency = stats['latency'].get_summary()
+
+				hosts[host] = {'requests': latency.pop('count'),
+					       'errors': stats['errors'],
+					       'bytes': stats['bytes'],
+					       'seconds': latency.pop('seconds'),
+					       'latency': latency,
+					      }
+
+		# gerrit requests by host, path and status, from the metrics module
+		# of depot_tools, imported by gerrit_util by its path
+		gerrit_requests = []
+		metrics = sys.modules.get('metrics')
+		for name, host, path, status, summary in metrics.collector.get_histograms() if metrics != None else []:
+			if name == 'http_requests':
+				gerrit_requests.append(dict(host = host, path = path, status = status, **summary))
+
+		return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.__started)),
+			'seconds': round(time.monotonic() - self.__start, 6),
+			'spans': spans,
+			'hosts': hosts,
+			'gerrit_requests': gerrit_requests,
+		       }
+
+	def export_file(self, report_directory):
+		profile_path = '%s/%s' % (report_directory, self.__file_name)
+		print('export run profile to %s' % (profile_path))
+
+		with open(profile_path, 'w') as profile_file:
+			json.dump(self.get_profile(), profile_file, indent = 1)
+
+		return True
+
+# the profile of this run
+profile = RunProfile()
@@ -0,0 +1,323 @@
+#!/usr/bin/python3
+import calendar
+import heapq
+
+from array import array
+
+def parse_timestamp(text):
+	# date string of any source to UTC epoch seconds, 0 if empty
+	# gerrit: '2021-11-02 07:16:18.000000000' (UTC)
+	# git: '2021-08-10T11:47:55+02:00'
+	# github: '2019-06-11T09:10:12Z'
+	# patchwork: '2018-04-24T11:15:52' (UTC)
+	if text == None or text == '':
+		return 0
+
+	seconds = calendar.timegm((int(text[0:4]), int(text[5:7]), int(text[8:10]),
+				   int(text[11:13]), int(text[14:16]), int(text[17:19])))
+
+	# drop the fraction of second, what's left is the time zone
+	zone = text[19:]
+	if zone.startswith('.'):
+		zone = zone.lstrip('.0123456789')
+
+	if zone == '' or zone == 'Z':
+		return seconds
+
+	# '+02:00' or '+0200'
+	offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+
+	if zone[0] == '-':
+		return seconds + offset
+
+	return seconds - offset
+
+def merge_runs(runs, keys):
+	# k-way merge of runs of row indices by their keys, a run that isn't
+	# in order (ex. gerrit returns the most recently updated first) is
+	# sorted on its own first
+	ordered = []
+
+	for run in runs:
+		run_keys = [keys[idx] for idx in run]
+
+		if all(run_keys[idx] <= run_keys[idx + 1] for idx in range(len(run_keys) - 1)) == False:
+			run = sorted(run, key = keys.__getitem__)
+
+		ordered.append(run)
+
+	if len(ordered) == 1:
+		return list(ordered[0])
+
+	return list(heapq.merge(*ordered, key = keys.__getitem__))
+
+class RecordStore:
+	# columnar container of report rows, one column per field:
+	# - category: values interned once, the column holds array('I') codes
+	# - integer: array('q')
+	# - text: a plain list
+	# timestamp fields also keep their UTC epoch seconds in array('q'), and
+	# the rows are appended in runs (one per server, user or repo stream)
+	def __init__(self, fields, categories = [], integers = [], timestamps = []):
+		self.__fields = list(fields)
+		self.__kinds = {}
+		self.__columns = {}
+		self.__categories = {}
+		self.__codes = {}
+		self.__epochs = {}
+		self.__runs = []
+		self.__run_start = 0
+		self.__spill = None
+		self.__spill_field = None
+		self.__journal = None
+		# fields a spilled row left None, read back from the csv as None
+		self.__nullables = set()
+		self.__count = 0
+
+		for field in timestamps:
+			self.__epochs[field] = array('q')
+
+		for field in self.__fields:
+			if field in categories:
+				self.__kinds[field] = 'category'
+				self.__columns[field] = array('I')
+				self.__categories[field] = []
+				self.__codes[field] = {}
+			elif field in integers:
+				self.__kinds[field] = 'integer'
+				self.__columns[field] = array('q')
+			else:
+				self.__kinds[field] = 'text'
+				self.__columns[field] = []
+
+		return
+
+	def __len__(self):
+		return self.__count
+
+	def __iter__(self):
+		# rows as dicts, for callers still written against the row dicts
+		for values in self.iter_rows(self.__fields):
+			yield dict(zip(self.__fields, values))
+
+		return
+
+	def get_fields(self):
+		return self.__fields
+
+	def get_kind(self, field):
+		return self.__kinds[field]
+
+	def get_nullable(self, field):
+		# a spilled row had None in the field, an empty csv cell of it is
+		# None rather than ''
+		return field in self.__nullables
+
+	def __intern(self, field, value):
+		codes = self.__codes[field]
+
+		code = codes.get(value)
+		if code == None:
+			code = codes[value] = len(self.__categories[field])
+			self.__categories[field].append(value)
+
+		return code
+
+	def set_spill(self, writer, sort_field):
+		# stream the rows to a SpillWriter sorted by the sort field instead
+		# of keeping them, the store only counts them from now on
+		self.__spill = writer
+		self.__spill_field = sort_field
+
+		return
+
+	def get_spill(self):
+		return self.__spill
+
+	def set_journal(self, journal):
+		# also give the values of each row to a CrawlJournal, checkpointed
+		# by the crawler
+		self.__journal = journal
+
+		return
+
+	def append(self, row):
+		# row is a dict with a value for every field
+		if self.__journal != None:
+			self.__journal.append([row[field] for field in self.__fields])
+
+		if self.__spill != None:
+			values = [row[field] for field in self.__fields]
+
+			# the kinds change like the ones of the columns below, the csv
+			# keeps no type
+			for field, value in zip(self.__fields, values):
+				if value == None:
+					self.__nullables.add(field)
+
+				if value.__class__ is not int and self.__kinds[field] == 'integer':
+					self.__kinds[field] = 'text'
+
+			self.__spill.append(parse_timestamp(row[self.__spill_field]), values)
+			self.__count += 1
+			return
+
+		for field in self.__fields:
+			value = row[field]
+			kind = self.__kinds[field]
+
+			if kind == 'category':
+				self.__columns[field].append(self.__intern(field, value))
+			elif kind == 'integer':
+				if value.__class__ is not int:
+					# not an integer after all, keep the values as they are
+					self.__kinds[field] = 'text'
+					self.__columns[field] = self.__columns[field].tolist()
+
+				self.__columns[field].append(value)
+			else:
+				self.__columns[field].append(value)
+
+		for field, epochs in self.__epochs.items():
+			epochs.append(parse_timestamp(row[field]))
+
+		self.__count += 1
+
+		return
+
+	def end_run(self):
+		# the rows appended since the last run came from one ordered stream
+		if self.__spill != None:
+			self.__spill.end_run()
+			return
+
+		if self.__count != self.__run_start:
+			self.__runs.append(range(self.__run_start, self.__count))
+			self.__run_start = self.__count
+
+		return
+
+	def get_epochs(self, field):
+		return self.__epochs[field]
+
+	def extend(self, rows):
+		for row in rows:
+			self.append(row)
+
+		return
+
+	def get_value(self, idx, field):
+		if self.__kinds[field] == 'category':
+			return self.__categories[field][self.__columns[field][idx]]
+
+		return self.__columns[field][idx]
+
+	def get_row(self, idx):
+		row = {}
+
+		for field in self.__fields:
+			row[field] = self.get_value(idx, field)
+
+		return row
+
+	def get_column(self, field):
+		# the values of one field, categories decoded
+		if self.__kinds[field] == 'category':
+			categories = self.__categories[field]
+			return [categories[code] for code in self.__columns[field]]
+
+		return self.__columns[field]
+
+	def get_codes(self, field):
+		# codes of a category field and the value of each code
+		return self.__columns[field], self.__categories[field]
+
+	def iter_rows(self, fields, indices = None):
+		# yield one list of values per row, all rows or the given indices
+		columns = []
+		for field in fields:
+			if self.__kinds[field] == 'category':
+				columns.append((self.__columns[field], self.__categories[field]))
+			else:
+				columns.append((self.__columns[field], None))
+
+		if indices == None:
+			indices = range(self.__count)
+
+		for idx in indices:
+			values = []
+
+			for column, categories in columns:
+				if categories == None:
+					values.append(column[idx])
+				else:
+					values.append(categories[column[idx]])
+
+			yield values
+
+		return
+
+	def group_by(self, field):
+		# value -> row indices, in first appearance order
+		groups = {}
+
+		if self.__kinds[field] == 'category':
+			categories = self.__categories[field]
+
+			by_code = {}
+			for idx, code in enumerate(self.__columns[field]):
+				indices = by_code.get(code)
+				if indices == None:
+					indices = by_code[code] = array('I')
+				indices.append(idx)
+
+			for code, indices in by_code.items():
+				groups[categories[code]] = indices
+		else:
+			for idx, value in enumerate(self.__columns[field]):
+				indices = groups.get(value)
+				if indices == None:
+					indices = groups[value] = array('I')
+				indices.append(idx)
+
+		return groups
+
+	def reorder(self, order):
+		# rearrange every column by a permutation of the row indices
+		for field in self.__fields:
+			column = self.__columns[field]
+
+			if column.__class__ is array:
+				self.__columns[field] = array(column.typecode, [column[idx] for idx in order])
+			else:
+				self.__columns[field] = [column[idx] for idx in order]
+
+		for field, epochs in self.__epochs.items():
+			self.__epochs[field] = array('q', [epochs[idx] for idx in order])
+
+		# the rows are one run now
+		self.end_run()
+		self.__runs = [range(self.__count)]
+
+		return
+
+	def sort(self, field):
+		if self.__spill != None:
+			# the spill writer sorts when it merges its runs
+			return
+
+		column = self.__columns[field]
+
+		if field in self.__epochs:
+			# merge the runs by the time stamp instead of the text
+			self.end_run()
+			order = merge_runs(self.__runs, self.__epochs[field])
+		elif self.__kinds[field] == 'category':
+			categories = self.__categories[field]
+			order = sorted(range(self.__count), key = lambda idx: categories[column[idx]])
+		else:
+			order = sorted(range(self.__count), key = column.__getitem__)
+
+		self.reorder(order)
+
+		return
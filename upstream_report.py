@@ -1,14 +1,36 @@
 #!/usr/bin/python3
 import argparse
+import importlib
 import os
 import time
 
-from upstream_crawler import GerritCrawler
-from upstream_crawler import GitCrawler
-from upstream_crawler import GithubCrawler
-from upstream_crawler import PatchworkCrawler
+from upstream_cassette import Cassette
+from upstream_config import ReportConfig
+from upstream_correlate import ContributionCorrelator
+from upstream_export import exporters
+from upstream_journal import remove_journals
+from upstream_profile import profile
 
 support_actions = ['gerrit', 'git', 'github', 'patchwork']
+support_formats = ['csv', 'xlsx'] + list(exporters.keys())
+
+# the crawler of each action, its module (and dependencies like depot_tools,
+# GitPython or requests) is only imported when the action runs
+crawler_classes = {'gerrit': ('upstream_gerrit', 'GerritCrawler'),
+		   'git': ('upstream_git', 'GitCrawler'),
+		   'github': ('upstream_github', 'GithubCrawler'),
+		   'patchwork': ('upstream_patchwork', 'PatchworkCrawler'),
+		  }
+
+def get_crawler_class(action, hooks):
+	module_name, class_name = crawler_classes[action]
+	crawler_class = getattr(importlib.import_module(module_name), class_name)
+
+	# hook the transports the action has just imported
+	for hook in hooks:
+		hook.install()
+
+	return crawler_class
 
 def find_report_directory(config_file):
 
@@ -55,6 +77,27 @@ def validate_args(args):
 			print('missing github token')
 			return []
 
+	for file_format in args.formats.split(','):
+		if file_format not in support_formats:
+			print('invalid file format \'%s\'' % (file_format))
+			return []
+
+	if args.update != None and os.path.isdir(args.update) == False:
+		print('invalid previous report directory')
+		return []
+
+	if args.resume != None and os.path.isdir(args.resume) == False:
+		print('invalid report directory to resume')
+		return []
+
+	if args.record != None and args.replay != None:
+		print('record and replay at the same time')
+		return []
+
+	if args.replay != None and os.path.isfile(args.replay) == False:
+		print('invalid cassette file')
+		return []
+
 	if args.config_file == None:
 		print('missing config file')
 		return []
@@ -74,6 +117,17 @@ def main():
 	parser.add_argument('-c', '--config_file', help = 'config file')
 	parser.add_argument('-u', '--user_name', help = 'github username')
 	parser.add_argument('-t', '--token', help = 'github token')
+	parser.add_argument('-s', '--summary_only', action = 'store_true', help = 'only count git commits for the summary')
+	parser.add_argument('-e', '--excel_engine', choices = ['native', 'openpyxl'], default = 'native', help = 'excel writer')
+	parser.add_argument('--stream', action = 'store_true', help = 'stream crawled rows to disk, bounded memory')
+	parser.add_argument('-f', '--formats', default = 'csv,xlsx', help = 'report formats: %s' % (','.join(support_formats)))
+	parser.add_argument('--correlate', action = 'store_true', help = 'join the gerrit, git and patchwork rows into a contribution report')
+	parser.add_argument('--update', metavar = 'DIR', help = 'append new rows to the excel files of a previous report')
+	parser.add_argument('--record', metavar = 'FILE', help = 'record the http requests of the crawl into a cassette file')
+	parser.add_argument('--replay', metavar = 'FILE', help = 'answer the http requests of the crawl from a cassette file')
+	parser.add_argument('--latency', type = float, default = 0.0, help = 'with --replay, sleep the recorded response time times LATENCY')
+	parser.add_argument('--resume', metavar = 'DIR', help = 'continue the interrupted run of a report directory from its journals')
+	parser.add_argument('--profile', choices = ['cprofile', 'sample'], help = 'profile each action into the report directory')
 
 	args = parser.parse_args()
 
@@ -83,58 +137,204 @@ def main():
 		# no action to perform...
 		return
 
-	report_directory = find_report_directory(args.config_file)
-	os.mkdir(report_directory)
+	# parsed once and shared by every crawler of the run
+	config = ReportConfig(args.config_file)
 
-	if 'gerrit' in actions:
-		# gerrit
-		crawler = GerritCrawler(args.config_file)
+	if config.get_initialized() == False:
+		print('invalid config file')
+		return
 
-		changes = crawler.get_changes()
+	if args.resume != None:
+		report_directory = os.path.abspath(args.resume)
+	else:
+		report_directory = find_report_directory(args.config_file)
+		os.mkdir(report_directory)
 
-		if len(changes) != 0:
-			crawler.export_csv_file(report_directory)
-			crawler.export_excel_file(report_directory)
-		else:
-			print('fail to get changes from gerrit server')
+	formats = args.formats.split(',')
 
-	if 'git' in actions:
-		# git
-		crawler = GitCrawler(args.config_file)
+	cassette = None
+	if args.record != None:
+		cassette = Cassette(args.record, 'record')
+	elif args.replay != None:
+		cassette = Cassette(args.replay, 'replay', args.latency)
+
+	# transport hooks, the profile times the replayed requests too
+	hooks = [profile]
+	if cassette != None:
+		hooks.insert(0, cassette)
+
+	profile.set_profiler(args.profile, report_directory)
+
+	# crawled rows of each source for the correlation, only kept when
+	# correlating, the rows of an action are released after its exports
+	sources = {}
+
+	# the journals are kept until every stream of every action has ended
+	complete = True
 
-		commits = crawler.get_commits()
+	if 'gerrit' in actions:
+		# gerrit
+		with profile.action('gerrit'):
+			crawler = get_crawler_class('gerrit', hooks)(config)
+			crawler.set_excel_engine(args.excel_engine)
+			crawler.set_journal_directory(report_directory)
+
+			if args.stream == True:
+				crawler.set_stream_directory(report_directory)
+
+			with profile.span('crawl'):
+				count = len(crawler.get_changes())
+
+			if crawler.get_journal_complete() == False:
+				complete = False
+
+			if count != 0:
+				if args.correlate == True:
+					sources['gerrit'] = crawler
+				for file_format in formats:
+					with profile.span(file_format):
+						if file_format == 'xlsx' and args.update != None:
+							crawler.update_excel_file(report_directory, args.update)
+						else:
+							crawler.export_file(report_directory, file_format)
+			else:
+				print('fail to get changes from gerrit server')
 
-		if len(commits) != 0:
-			crawler.export_csv_file(report_directory)
-			crawler.export_excel_file(report_directory)
-		else:
-			print('fail to get commits from git repo')
+	if 'git' in actions:
+		# git
+		with profile.action('git'):
+			crawler = get_crawler_class('git', hooks)(config)
+			crawler.set_excel_engine(args.excel_engine)
+			crawler.set_journal_directory(report_directory)
+
+			if args.stream == True and args.summary_only == False:
+				crawler.set_stream_directory(report_directory)
+
+			if args.summary_only == True:
+				with profile.span('crawl'):
+					counts = crawler.get_commit_counts()
+
+				if len(counts) != 0:
+					with profile.span('summary'):
+						crawler.export_summary_file(report_directory)
+				else:
+					print('fail to count commits from git repo')
+			else:
+				with profile.span('crawl'):
+					count = len(crawler.get_commits())
+
+				if crawler.get_journal_complete() == False:
+					complete = False
+
+				if count != 0:
+					if args.correlate == True:
+						sources['git'] = crawler
+					for file_format in formats:
+						with profile.span(file_format):
+							if file_format == 'xlsx' and args.update != None:
+								crawler.update_excel_file(report_directory, args.update)
+							else:
+								crawler.export_file(report_directory, file_format)
+				else:
+					print('fail to get commits from git repo')
 
 	if 'github' in actions:
 		# github
-		github_auth = (args.user_name, args.token)
+		with profile.action('github'):
+			github_auth = (args.user_name, args.token)
 
-		crawler = GithubCrawler(args.config_file, github_auth)
+			crawler = get_crawler_class('github', hooks)(config, github_auth)
+			crawler.set_excel_engine(args.excel_engine)
+			crawler.set_journal_directory(report_directory)
 
-		pulls = crawler.get_pulls()
+			if args.stream == True:
+				crawler.set_stream_directory(report_directory)
 
-		if len(pulls) != 0:
-			crawler.export_csv_file(report_directory)
-			crawler.export_excel_file(report_directory)
-		else:
-			print('fail to get pulls from github repo')
+			with profile.span('crawl'):
+				count = len(crawler.get_pulls())
+
+			if crawler.get_journal_complete() == False:
+				complete = False
+
+			if count != 0:
+				for file_format in formats:
+					with profile.span(file_format):
+						if file_format == 'xlsx' and args.update != None:
+							crawler.update_excel_file(report_directory, args.update)
+						else:
+							crawler.export_file(report_directory, file_format)
+			else:
+				print('fail to get pulls from github repo')
 
 	if 'patchwork' in actions:
 		# patchwork
-		crawler = PatchworkCrawler(args.config_file)
-
-		patches = crawler.get_patches()
+		with profile.action('patchwork'):
+			crawler = get_crawler_class('patchwork', hooks)(config)
+			crawler.set_excel_engine(args.excel_engine)
+			crawler.set_journal_directory(report_directory)
+
+			if args.stream == True:
+				crawler.set_stream_directory(report_directory)
+
+			with profile.span('crawl'):
+				count = len(crawler.get_patches())
+
+			if crawler.get_journal_complete() == False:
+				complete = False
+
+			if count != 0:
+				if args.correlate == True:
+					sources['patchwork'] = crawler
+				for file_format in formats:
+					with profile.span(file_format):
+						if file_format == 'xlsx' and args.update != None:
+							crawler.update_excel_file(report_directory, args.update)
+						else:
+							crawler.export_file(report_directory, file_format)
+			else:
+				print('fail to get changes from patchwork server')
+
+	if args.correlate == True:
+		# correlate
+		with profile.action('correlate'):
+			correlator = ContributionCorrelator(config)
+			correlator.set_excel_engine(args.excel_engine)
+
+			if args.stream == True:
+				correlator.set_stream_directory(report_directory)
+
+			# git first, its commits carry both the Change-Id and the subject
+			with profile.span('match'):
+				if 'git' in sources:
+					correlator.add_git_rows(sources['git'].get_report_rows(report_directory))
+				if 'gerrit' in sources:
+					correlator.add_gerrit_rows(sources['gerrit'].get_report_rows(report_directory))
+				if 'patchwork' in sources:
+					correlator.add_patchwork_rows(sources['patchwork'].get_report_rows(report_directory))
+
+			contributions = correlator.get_contributions()
+
+			if len(contributions) != 0:
+				for file_format in formats:
+					with profile.span(file_format):
+						correlator.export_file(report_directory, file_format)
+			else:
+				print('no contribution to correlate')
+
+	if cassette != None:
+		cassette.close()
+
+		requests, misses = cassette.get_counts()
+		print('cassette: %d request(s), %d miss(es)' % (requests, misses))
+
+	if complete == True:
+		# every action ran to the end
+		remove_journals(report_directory)
+	else:
+		print('the crawl stopped early, continue it with --resume %s' % (report_directory))
 
-		if len(patches) != 0:
-			crawler.export_csv_file(report_directory)
-			crawler.export_excel_file(report_directory)
-		else:
-			print('fail to get changes from patchwork server')
+	profile.uninstall()
+	profile.export_file(report_directory)
 
 	return
 
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+import csv
+import heapq
+import os
+import shutil
+
+class SpillWriter:
+	# sorted csv writer with bounded memory: rows are buffered, each full
+	# buffer (or each finished stream) is sorted and written to a run file,
+	# the final csv is an external k-way merge of the runs. The run files
+	# are plain csv, so a crashed crawl leaves its rows on disk.
+
+	# runs merged at once, keeps the number of open files bounded
+	__merge_width = 64
+
+	def __init__(self, directory, name, fields, run_size = 10000):
+		self.__fields = fields
+		self.__run_size = run_size
+		self.__run_directory = os.path.join(directory, '%s.runs' % (name))
+		self.__runs = []
+		self.__run_serial = 0
+		self.__buffer = []
+		self.__count = 0
+		self.__csv_path = None
+
+		# runs left by an interrupted run, a resumed crawl streams its rows
+		# again from the journal
+		if os.path.isdir(self.__run_directory) == True:
+			shutil.rmtree(self.__run_directory)
+
+		os.makedirs(self.__run_directory)
+
+		return
+
+	def __len__(self):
+		return self.__count
+
+	def get_fields(self):
+		return self.__fields
+
+	def get_csv_path(self):
+		# the csv merged by finish(), None before
+		return self.__csv_path
+
+	def append(self, key, values):
+		# the sequence number keeps rows of the same key in append order
+		self.__buffer.append((key, self.__count, values))
+		self.__count += 1
+
+		if len(self.__buffer) >= self.__run_size:
+			self.__flush()
+
+		return
+
+	def end_run(self):
+		# a stream is finished, make its rows survive a crash
+		self.__flush()
+
+		return
+
+	def __new_run_path(self):
+		self.__run_serial += 1
+
+		return os.path.join(self.__run_directory, 'run-%06d.csv' % (self.__run_serial))
+
+	def __flush(self):
+		if len(self.__buffer) == 0:
+			return
+
+		self.__buffer.sort(key = lambda item: (item[0], item[1]))
+
+		run_path = self.__new_run_path()
+		with open(run_path, 'w', newline = '') as run_file:
+			csv_writer = csv.writer(run_file)
+
+			for key, seq, values in self.__buffer:
+				csv_writer.writerow([key, seq] + list(values))
+
+		self.__runs.append(run_path)
+		self.__buffer = []
+
+		return
+
+	def __read_run(self, run_path):
+		with open(run_path, newline = '') as run_file:
+			for item in csv.reader(run_file):
+				yield int(item[0]), int(item[1]), item[2:]
+
+		return
+
+	def __merge(self, run_paths):
+		return heapq.merge(*[self.__read_run(run_path) for run_path in run_paths],
+				   key = lambda item: (item[0], item[1]))
+
+	def finish(self, csv_path):
+		# merge all runs into the final csv, then delete them
+		self.__flush()
+
+		# merge the runs in passes when there are too many to open at once
+		while len(self.__runs) > self.__merge_width:
+			runs = self.__runs
+			self.__runs = []
+
+			for start in range(0, len(runs), self.__merge_width):
+				run_path = self.__new_run_path()
+				with open(run_path, 'w', newline = '') as run_file:
+					csv_writer = csv.writer(run_file)
+
+					for key, seq, values in self.__merge(runs[start:start + self.__merge_width]):
+						csv_writer.writerow([key, seq] + values)
+
+				for merged_path in runs[start:start + self.__merge_width]:
+					os.remove(merged_path)
+
+				self.__runs.append(run_path)
+
+		with open(csv_path, 'w', newline = '') as csv_file:
+			csv_writer = csv.writer(csv_file)
+			csv_writer.writerow(self.__fields)
+
+			for _, _, values in self.__merge(self.__runs):
+				csv_writer.writerow(values)
+
+		shutil.rmtree(self.__run_directory)
+		self.__runs = []
+		self.__csv_path = csv_path
+
+		return
@@ -0,0 +1,515 @@
+#!/usr/bin/python3
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+# a minimal xlsx writer, each sheet is streamed as xml straight into the zip
+# container, the strings of the shared columns (the categories, ex. the user
+# name or the status) refer to one deduplicated shared string, any other
+# string is an inline string so the writer doesn't keep it
+
+_content_types = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>
+%s
+</Types>'''
+
+_sheet_content_type = '<Override PartName="/xl/worksheets/sheet%d.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+
+_root_rels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_workbook = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>%s</sheets>
+</workbook>'''
+
+_workbook_sheet = '<sheet name=%s sheetId="%d" r:id="rId%d"/>'
+
+_workbook_rels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+%s
+<Relationship Id="rId%d" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+<Relationship Id="rId%d" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>
+</Relationships>'''
+
+_workbook_sheet_rel = '<Relationship Id="rId%d" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet%d.xml"/>'
+
+_styles = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="1"><fill><patternFill patternType="none"/></fill></fills>
+<borders count="1"><border/></borders>
+<cellStyleXfs count="1"><xf/></cellStyleXfs>
+<cellXfs count="1"><xf xfId="0"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>'''
+
+_sheet_head = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'''
+
+_sheet_tail = '</sheetData></worksheet>'
+
+# parts of the sheets added to an existing workbook by XlsxUpdater
+_update_sheet = '<sheet name=%s sheetId="%d" r:id="rIdUpdate%d"/>'
+
+_update_sheet_rel = '<Relationship Id="rIdUpdate%d" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="/%s"/>'
+
+_update_content_type = '<Override PartName="/%s" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+
+# characters not allowed in xml 1.0
+_illegal_chars = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# characters excel doesn't allow in a sheet title
+_illegal_title_chars = re.compile(r'[\\*?:/\[\]]')
+
+# longest sheet title excel opens
+_title_length = 31
+
+# xml.sax.saxutils would import urllib and http at startup for these
+def escape(text):
+	return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def quoteattr(text):
+	return '"%s"' % (escape(text).replace('"', '&quot;').replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;'))
+
+def unescape(text):
+	return text.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'").replace('&amp;', '&')
+
+def escape_text(text):
+	return escape(_illegal_chars.sub('', text))
+
+def get_title_candidates(title):
+	# titles excel accepts for a sheet, in order: the title without the
+	# illegal characters and cut to 31 characters, then numbered like
+	# openpyxl numbers a duplicate, ex. 'John Doe1'
+	base = _illegal_title_chars.sub('_', _illegal_chars.sub('', title))[:_title_length].strip("'")
+	if base == '':
+		base = 'Sheet'
+
+	yield base
+
+	serial = 0
+	while True:
+		serial += 1
+		suffix = '%d' % (serial)
+		yield base[:_title_length - len(suffix)] + suffix
+
+def get_sheet_title(title, titles):
+	# the first candidate not in titles, excel compares them regardless of
+	# the case
+	taken = set(taken_title.lower() for taken_title in titles)
+
+	for candidate in get_title_candidates(title):
+		if candidate.lower() not in taken:
+			return candidate
+
+class XlsxSheet:
+	# rows are buffered and written to the zip entry in blocks
+	__block_size = 1000
+
+	def __init__(self, title, stream, strings, shared_columns):
+		self.title = title
+
+		self.__stream = stream
+		self.__strings = strings
+		self.__shared_columns = shared_columns
+		self.__rows = 0
+		self.__block = []
+
+		self.__stream.write(_sheet_head.encode())
+
+		return
+
+	def append(self, values):
+		self.__rows += 1
+
+		strings = self.__strings
+		shared_columns = self.__shared_columns
+
+		# cells carry no reference, an empty cell keeps the column position
+		cells = []
+		for column, value in enumerate(values):
+			if value.__class__ is not str:
+				if value == None:
+					cells.append('<c/>')
+				elif value is True or value is False:
+					cells.append('<c t="b"><v>%d</v></c>' % (value))
+				elif isinstance(value, (int, float)):
+					cells.append('<c><v>%s</v></c>' % (value))
+				else:
+					value = str(value)
+
+			if value.__class__ is str:
+				if value == '':
+					cells.append('<c/>')
+					continue
+
+				if column not in shared_columns:
+					if value != value.strip():
+						cells.append('<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (escape_text(value)))
+					else:
+						cells.append('<c t="inlineStr"><is><t>%s</t></is></c>' % (escape_text(value)))
+					continue
+
+				idx = strings.get(value)
+				if idx == None:
+					idx = strings[value] = len(strings)
+
+				cells.append('<c t="s"><v>%d</v></c>' % (idx))
+
+		self.__block.append('<row r="%d">%s</row>' % (self.__rows, ''.join(cells)))
+
+		if len(self.__block) >= self.__block_size:
+			self.__flush()
+
+		return
+
+	def __flush(self):
+		self.__stream.write(''.join(self.__block).encode())
+		self.__block = []
+
+		return
+
+	def close(self):
+		self.__flush()
+		self.__stream.write(_sheet_tail.encode())
+		self.__stream.close()
+
+		return
+
+class XlsxWorkbook:
+	# same calls as a write-only openpyxl workbook: create_sheet() then
+	# append() rows to it, sheets are written one after another. The shared
+	# columns are the indices of the columns with few distinct strings, ex.
+	# the categories of the rows, their strings are kept until save()
+	def __init__(self, shared_columns = []):
+		self.__file = tempfile.TemporaryFile()
+		self.__zip = zipfile.ZipFile(self.__file, 'w', compression = zipfile.ZIP_DEFLATED)
+		self.__titles = []
+		self.__sheet = None
+		self.__shared_columns = frozenset(shared_columns)
+		# text -> index of the shared string
+		self.__strings = {}
+
+		return
+
+	def create_sheet(self, title):
+		if self.__sheet != None:
+			self.__sheet.close()
+
+		title = get_sheet_title(title, self.__titles)
+		self.__titles.append(title)
+
+		stream = self.__zip.open('xl/worksheets/sheet%d.xml' % (len(self.__titles)), 'w', force_zip64 = True)
+		self.__sheet = XlsxSheet(title, stream, self.__strings, self.__shared_columns)
+
+		return self.__sheet
+
+	def __write_shared_strings(self):
+		with self.__zip.open('xl/sharedStrings.xml', 'w', force_zip64 = True) as stream:
+			stream.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+				      '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="%d">' % (len(self.__strings))).encode())
+
+			block = []
+			# dict keeps the insertion order, which is the string index
+			for text in self.__strings:
+				if text != text.strip():
+					block.append('<si><t xml:space="preserve">%s</t></si>' % (escape_text(text)))
+				else:
+					block.append('<si><t>%s</t></si>' % (escape_text(text)))
+
+				if len(block) >= 1000:
+					stream.write(''.join(block).encode())
+					block = []
+
+			stream.write(''.join(block).encode())
+			stream.write(b'</sst>')
+
+		return
+
+	def save(self, path):
+		if self.__sheet != None:
+			self.__sheet.close()
+			self.__sheet = None
+
+		self.__write_shared_strings()
+
+		count = len(self.__titles)
+
+		self.__zip.writestr('[Content_Types].xml', _content_types % ('\n'.join(_sheet_content_type % (idx + 1) for idx in range(count))))
+		self.__zip.writestr('_rels/.rels', _root_rels)
+		self.__zip.writestr('xl/workbook.xml', _workbook % (''.join(_workbook_sheet % (quoteattr(_illegal_chars.sub('', title)), idx + 1, idx + 1) for idx, title in enumerate(self.__titles))))
+		self.__zip.writestr('xl/_rels/workbook.xml.rels', _workbook_rels % ('\n'.join(_workbook_sheet_rel % (idx + 1, idx + 1) for idx in range(count)), count + 1, count + 2))
+		self.__zip.writestr('xl/styles.xml', _styles)
+		self.__zip.close()
+
+		self.__file.seek(0)
+		with open(path, 'wb') as excel_file:
+			shutil.copyfileobj(self.__file, excel_file)
+
+		self.__file.close()
+
+		return
+
+class XlsxUpdater:
+	# update an existing xlsx file: rows are appended to existing sheets,
+	# sheets are added or replaced, and only the sheet xml parts touched are
+	# rewritten, every other part of the zip is copied as it is. Strings
+	# appended are inline strings, so the shared strings stay untouched.
+	__namespaces = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+			'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+			'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+		       }
+
+	def __init__(self, path):
+		self.__zip = zipfile.ZipFile(path)
+
+		# sheet title -> part name in the zip, in workbook order
+		self.__parts = {}
+		self.__titles = []
+
+		# only an update reads a workbook
+		from xml.etree import ElementTree
+
+		workbook = ElementTree.fromstring(self.__zip.read('xl/workbook.xml'))
+		rels = ElementTree.fromstring(self.__zip.read('xl/_rels/workbook.xml.rels'))
+
+		targets = {}
+		# the relationships added are numbered above every existing id, ex.
+		# the 'rIdUpdate1' of an earlier update
+		self.__rel_serial = 0
+		for rel in rels.findall('rel:Relationship', self.__namespaces):
+			target = rel.get('Target')
+
+			serial = re.search(r'(\d+)$', rel.get('Id'))
+			if serial != None:
+				self.__rel_serial = max(self.__rel_serial, int(serial.group(1)))
+
+			# openpyxl writes absolute targets, others relative to xl/
+			if target.startswith('/'):
+				targets[rel.get('Id')] = target[1:]
+			else:
+				targets[rel.get('Id')] = 'xl/' + target
+
+		self.__sheet_ids = [0]
+		for sheet in workbook.find('main:sheets', self.__namespaces):
+			title = sheet.get('name')
+			self.__titles.append(title)
+			self.__parts[title] = targets[sheet.get('{%s}id' % (self.__namespaces['r']))]
+			self.__sheet_ids.append(int(sheet.get('sheetId')))
+
+		self.__appends = {}
+		self.__replaces = {}
+		self.__new_sheets = []
+		# requested title -> sheet title
+		self.__aliases = {}
+
+		return
+
+	def get_titles(self):
+		return self.__titles
+
+	def get_title(self, title):
+		# the sheet title of a requested title, ex. a user name, the same
+		# one the workbook got when the titles are requested in the same
+		# order: each request claims its sheet, a claimed or missing title
+		# goes on with the next candidate
+		if title in self.__aliases:
+			return self.__aliases[title]
+
+		existing = set(sheet_title.lower() for sheet_title in self.__titles)
+		claimed = set(sheet_title.lower() for sheet_title in self.__aliases.values())
+
+		for candidate in get_title_candidates(title):
+			if candidate.lower() in claimed:
+				continue
+
+			if candidate.lower() in existing:
+				# same case as the existing sheet
+				candidate = [sheet_title for sheet_title in self.__titles if sheet_title.lower() == candidate.lower()][0]
+
+			self.__aliases[title] = candidate
+
+			return candidate
+
+	def append_rows(self, title, rows, after = None):
+		# append to a sheet, a missing sheet is added behind sheet 'after'
+		# (or at the end) with these rows, titles from get_title()
+		if title not in self.__parts:
+			self.__add_sheet(title, after)
+
+		self.__appends.setdefault(title, []).extend(rows)
+
+		return
+
+	def replace_rows(self, title, rows):
+		# rewrite the whole content of a sheet
+		if title not in self.__parts:
+			self.__add_sheet(title, None)
+
+		self.__replaces[title] = list(rows)
+
+		return
+
+	def __add_sheet(self, title, after):
+		serial = 1
+		while 'xl/worksheets/sheet%d.xml' % (serial) in self.__zip.namelist() or 'xl/worksheets/sheet%d.xml' % (serial) in self.__parts.values():
+			serial += 1
+
+		self.__parts[title] = 'xl/worksheets/sheet%d.xml' % (serial)
+		self.__new_sheets.append(title)
+
+		if after in self.__titles:
+			self.__titles.insert(self.__titles.index(after) + 1, title)
+		else:
+			self.__titles.append(title)
+
+		return
+
+	def __row_xml(self, row_number, values):
+		cells = []
+		for value in values:
+			if value == None or value == '':
+				cells.append('<c/>')
+			elif value is True or value is False:
+				cells.append('<c t="b"><v>%d</v></c>' % (value))
+			elif isinstance(value, (int, float)):
+				cells.append('<c><v>%s</v></c>' % (value))
+			else:
+				text = str(value)
+				if text != text.strip():
+					cells.append('<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (escape_text(text)))
+				else:
+					cells.append('<c t="inlineStr"><is><t>%s</t></is></c>' % (escape_text(text)))
+
+		return '<row r="%d">%s</row>' % (row_number, ''.join(cells))
+
+	def __rows_xml(self, first_row, rows):
+		return ''.join(self.__row_xml(first_row + idx, values) for idx, values in enumerate(rows))
+
+	def __write_new_sheet(self, zip_out, title):
+		rows = self.__replaces.get(title, self.__appends.get(title, []))
+
+		with zip_out.open(self.__parts[title], 'w', force_zip64 = True) as stream:
+			stream.write(_sheet_head.encode())
+			stream.write(self.__rows_xml(1, rows).encode())
+			stream.write(_sheet_tail.encode())
+
+		return
+
+	def __write_appended_sheet(self, zip_out, title, info):
+		# copy the sheet xml up to the end of its sheet data, keeping track of
+		# the last row number, then add the new rows
+		row_pattern = re.compile(rb'<row r="(\d+)"')
+
+		last_row = 0
+		tail = b''
+
+		with self.__zip.open(info) as stream_in, zip_out.open(info.filename, 'w', force_zip64 = True) as stream_out:
+			while True:
+				chunk = stream_in.read(1 << 20)
+
+				data = tail + chunk
+
+				for match in row_pattern.finditer(data):
+					last_row = max(last_row, int(match.group(1)))
+
+				end = data.find(b'</sheetData>')
+				empty = data.find(b'<sheetData/>')
+				if empty == -1:
+					empty = data.find(b'<sheetData />')
+
+				if end != -1 or empty != -1 or chunk == b'':
+					break
+
+				# keep enough bytes to find a tag split between chunks, the
+				# dimension is dropped as it no longer matches the data
+				data = re.sub(rb'<dimension ref="[^"]*"\s*/>', b'', data)
+				stream_out.write(data[:-64])
+				tail = data[-64:]
+
+			data = re.sub(rb'<dimension ref="[^"]*"\s*/>', b'', data)
+			rows = self.__rows_xml(last_row + 1, self.__appends[title]).encode()
+
+			if end != -1:
+				end = data.find(b'</sheetData>')
+				stream_out.write(data[:end] + rows + data[end:])
+			elif empty != -1:
+				empty_tag = re.search(rb'<sheetData\s*/>', data)
+				stream_out.write(data[:empty_tag.start()] + b'<sheetData>' + rows + b'</sheetData>' + data[empty_tag.end():])
+			else:
+				stream_out.write(data)
+
+			shutil.copyfileobj(stream_in, stream_out)
+
+		return
+
+	def __patch_workbook(self, name, data):
+		# register the added sheets in the workbook, its rels and the types
+		if len(self.__new_sheets) == 0:
+			return data
+
+		text = data.decode('utf-8')
+
+		if name == 'xl/workbook.xml':
+			# rebuild the sheet list in the new order
+			sheets = re.search(r'<sheets>(.*)</sheets>', text, re.S)
+			entries = {}
+			for entry in re.findall(r'<sheet\s[^>]*/>', sheets.group(1)):
+				title = unescape(re.search(r'name="([^"]*)"', entry).group(1))
+				entries[title] = entry
+
+			for idx, title in enumerate(self.__new_sheets):
+				entries[title] = _update_sheet % (quoteattr(_illegal_chars.sub('', title)), max(self.__sheet_ids) + idx + 1, self.__rel_serial + idx + 1)
+
+			text = text[:sheets.start(1)] + ''.join(entries[title] for title in self.__titles) + text[sheets.end(1):]
+		elif name == 'xl/_rels/workbook.xml.rels':
+			# absolute targets work whatever wrote the workbook
+			rels = ''.join(_update_sheet_rel % (self.__rel_serial + idx + 1, self.__parts[title]) for idx, title in enumerate(self.__new_sheets))
+			text = text.replace('</Relationships>', rels + '</Relationships>')
+		elif name == '[Content_Types].xml':
+			types = ''.join(_update_content_type % (self.__parts[title]) for title in self.__new_sheets)
+			text = text.replace('</Types>', types + '</Types>')
+
+		return text.encode('utf-8')
+
+	def save(self, path):
+		parts = {}
+		for title in list(self.__appends) + list(self.__replaces):
+			parts[self.__parts[title]] = title
+
+		# write beside the target first, the target may be the file read
+		with zipfile.ZipFile(path + '.tmp', 'w', compression = zipfile.ZIP_DEFLATED) as zip_out:
+			for info in self.__zip.infolist():
+				title = parts.get(info.filename)
+
+				if title == None:
+					if info.filename in ['xl/workbook.xml', 'xl/_rels/workbook.xml.rels', '[Content_Types].xml']:
+						zip_out.writestr(info, self.__patch_workbook(info.filename, self.__zip.read(info)))
+						continue
+
+					# untouched part
+					with self.__zip.open(info) as stream_in, zip_out.open(info, 'w', force_zip64 = True) as stream_out:
+						shutil.copyfileobj(stream_in, stream_out)
+				elif title in self.__replaces:
+					self.__write_new_sheet(zip_out, title)
+				else:
+					self.__write_appended_sheet(zip_out, title, info)
+
+			for title in self.__new_sheets:
+				self.__write_new_sheet(zip_out, title)
+
+		self.__zip.close()
+
+		os.replace(path + '.tmp', path)
+
+		return